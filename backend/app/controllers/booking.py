@@ -1,30 +1,45 @@
 import asyncio
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from fastapi import HTTPException, status
 from typing import List, Optional
 from datetime import datetime, timedelta, timezone
 
 from app.models.booking import Booking, BookingStatus
+from app.models.provider import Provider
 from app.schemas.booking import BookingCreate, BookingUpdate
 from app.services.notifications import notification_service
+from app.core.pagination import Page, paginate_async
 
 
 class BookingController:
     # create new booking
     @staticmethod
-    def create_booking(
-        db: Session, booking_data: BookingCreate, customer_id: str
+    async def create_booking(
+        db: AsyncSession, booking_data: BookingCreate, customer_id: str
     ) -> Booking:
         booking = Booking(**booking_data.model_dump(), customer_id=customer_id)
         db.add(booking)
-        db.commit()
-        db.refresh(booking)
+        await db.commit()
+        await db.refresh(booking)
         return booking
 
     # get booking using booking id
+    #
+    # with_parties also loads the customer and the provider's user, for
+    # notifications, since nothing can be lazy loaded on an AsyncSession
     @staticmethod
-    def get_booking(db: Session, booking_id: str) -> Booking:
-        booking = db.query(Booking).filter(Booking.booking_id == booking_id).first()
+    async def get_booking(
+        db: AsyncSession, booking_id: str, with_parties: bool = False
+    ) -> Booking:
+        statement = select(Booking).where(Booking.booking_id == booking_id)
+        if with_parties:
+            statement = statement.options(
+                joinedload(Booking.customer),
+                joinedload(Booking.provider).joinedload(Provider.user),
+            )
+        booking = await db.scalar(statement)
         if not booking:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Booking not found"
@@ -33,47 +48,70 @@ class BookingController:
 
     # update booking status
     @staticmethod
-    def update_booking_status(
-        db: Session, booking_id: str, status: BookingStatus
+    async def update_booking_status(
+        db: AsyncSession, booking_id: str, status: BookingStatus
     ) -> Booking:
-        booking = BookingController.get_booking(db, booking_id)
+        booking = await BookingController.get_booking(db, booking_id)
         booking.status = status
-        db.commit()
-        db.refresh(booking)
+        await db.commit()
+        await db.refresh(booking)
         return booking
 
     # get customer bookings
     @staticmethod
-    def get_customer_bookings(db: Session, customer_id: str) -> List[Booking]:
-        return db.query(Booking).filter(Booking.customer_id == customer_id).all()
+    async def get_customer_bookings(
+        db: AsyncSession,
+        customer_id: str,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Page:
+        return await paginate_async(
+            db,
+            select(Booking).where(Booking.customer_id == customer_id),
+            [Booking.date_time, Booking.booking_id],
+            cursor=cursor,
+            limit=limit,
+        )
 
     # get provider bookings
     @staticmethod
-    def get_provider_bookings(db: Session, provider_id: str) -> List[Booking]:
-        return db.query(Booking).filter(Booking.provider_id == provider_id).all()
+    async def get_provider_bookings(
+        db: AsyncSession,
+        provider_id: str,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Page:
+        return await paginate_async(
+            db,
+            select(Booking).where(Booking.provider_id == provider_id),
+            [Booking.date_time, Booking.booking_id],
+            cursor=cursor,
+            limit=limit,
+        )
 
     # get pending bookings
     @staticmethod
-    def get_pending_bookings(db: Session, provider_id: str) -> List[Booking]:
-        return (
-            db.query(Booking)
-            .filter(
+    async def get_pending_bookings(db: AsyncSession, provider_id: str) -> List[Booking]:
+        result = await db.execute(
+            select(Booking)
+            .where(
                 Booking.provider_id == provider_id,
                 Booking.status == BookingStatus.PENDING,
             )
-            .all()
+            .order_by(Booking.date_time)
         )
+        return result.scalars().all()
 
     # cancel a booking with reason
     @staticmethod
-    def cancel_booking(
-        db: Session,
+    async def cancel_booking(
+        db: AsyncSession,
         booking_id: str,
         user_id: str,
         reason: str,
         canceled_by: str = "customer",
     ) -> Booking:
-        booking = BookingController.get_booking(db, booking_id)
+        booking = await BookingController.get_booking(db, booking_id, with_parties=True)
 
         if canceled_by == "customer":
             if str(booking.customer_id) != user_id:
@@ -83,15 +121,11 @@ class BookingController:
                 )
 
         elif canceled_by == "provider":
-            from app.models.provider import Provider
-
-            provider = (
-                db.query(Provider)
-                .filter(
+            provider = await db.scalar(
+                select(Provider).where(
                     Provider.user_id == user_id,
                     Provider.provider_id == booking.provider_id,
                 )
-                .first()
             )
 
             if not provider:
@@ -121,8 +155,8 @@ class BookingController:
         booking.canceled_by = canceled_by
         booking.canceled_at = datetime.now(timezone.utc)
 
-        db.commit()
-        db.refresh(booking)
+        # not refreshed, that would unload the parties needed below
+        await db.commit()
 
         # sending notification
         try:
@@ -152,15 +186,15 @@ class BookingController:
 
     # reshedule booking to new date/time
     @staticmethod
-    def reschedule_booking(
-        db: Session,
+    async def reschedule_booking(
+        db: AsyncSession,
         booking_id: str,
         customer_id: str,
         new_date_time: datetime,
         reason: Optional[str] = None,
     ) -> Booking:
         """Reschedule a booking to new date/time"""
-        booking = BookingController.get_booking(db, booking_id)
+        booking = await BookingController.get_booking(db, booking_id, with_parties=True)
 
         # Verify customer owns this booking
         if str(booking.customer_id) != customer_id:
@@ -197,8 +231,7 @@ class BookingController:
         else:
             booking.special_instructions = reschedule_note
 
-        db.commit()
-        db.refresh(booking)
+        await db.commit()
 
         # Notify provider about reschedule (optional)
         try:
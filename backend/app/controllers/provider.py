@@ -1,26 +1,69 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, func, or_
+from sqlalchemy import Float, func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from fastapi import HTTPException, status
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
-from app.models.provider import Provider
-from app.models.user import User
+from app.models.provider import Provider, DEFAULT_SERVICE_RADIUS_KM
+from app.models.provider_search_doc import ProviderSearchDoc, coverage_box
+from app.models.user import User, normalize_location
 from app.schemas.provider import ProviderCreate, ProviderUpdate
-from app.services.geolocation import geo_service
+from app.services.geolocation import geo_service, EARTH_RADIUS_KM
 from app.services.cache import cache
+from app.services.ranking import ranking
+from app.services.search_docs import search_docs
+from app.services.spatial_index import provider_index
+from app.controllers.service import ServiceController
+from app.core.config import settings
 from app.core.decorators import cached
+from app.core.exceptions import LocationUnresolvedError
+from app.core.pagination import Page, paginate_async
+from app.core.logging import get_logger
+
+logger = get_logger("providers")
+
+# search documents cached per provider, to hydrate spatial index hits
+PROVIDER_CARD_TTL = 300
+
+
+def card_key(provider_id) -> str:
+    return f"provider_card:{provider_id}"
+
+
+def provider_tag(provider_id) -> str:
+    return f"provider:{provider_id}"
+
+
+# a cached search is dropped when any provider it shows changes, or when a
+# provider offering the service it filters on (* for no filter) changes
+def search_tags(arguments: Dict, results: List[Dict]) -> List[str]:
+    return [
+        f"service:{arguments.get('service') or '*'}",
+        *[provider_tag(result["provider_id"]) for result in results],
+    ]
+
+
+# great-circle distance in km from a fixed point, evaluated by the database
+def distance_km_expression(latitude_column, longitude_column, lat: float, lng: float):
+    dlat = func.radians(latitude_column - lat) / 2.0
+    dlng = func.radians(longitude_column - lng) / 2.0
+    a = func.power(func.sin(dlat), 2) + func.cos(func.radians(lat)) * func.cos(
+        func.radians(latitude_column)
+    ) * func.power(func.sin(dlng), 2)
+
+    return 2 * EARTH_RADIUS_KM * func.asin(func.sqrt(func.least(1.0, a)))
 
 
 class ProviderController:
 
     # create new provider
     @staticmethod
-    def create_provider(
-        db: Session, provider_data: ProviderCreate, user_id: str
+    async def create_provider(
+        db: AsyncSession, provider_data: ProviderCreate, user_id: str
     ) -> Provider:
         # check if provider profile already exists
-        existing_provider = (
-            db.query(Provider).filter(Provider.user_id == user_id).first()
+        existing_provider = await db.scalar(
+            select(Provider).where(Provider.user_id == user_id)
         )
         if existing_provider:
             raise HTTPException(
@@ -28,17 +71,27 @@ class ProviderController:
                 detail="Provider profile already exists",
             )
 
-        provider = Provider(**provider_data.model_dump(), user_id=user_id)
+        user = await db.scalar(select(User).where(User.id == user_id))
+        provider = Provider(
+            **provider_data.model_dump(),
+            user_id=user_id,
+            latitude=user.latitude if user else None,
+            longitude=user.longitude if user else None,
+        )
+        ProviderController.apply_coverage(provider)
+        ranking.apply_rating_score(provider)
         db.add(provider)
-        db.commit()
-        db.refresh(provider)
+        await db.commit()
+        await db.refresh(provider)
         return provider
 
-    # get provider using provider id
+    # get provider using provider id, with the user its profile shows
     @staticmethod
-    def get_provider(db: Session, provider_id: str) -> Provider:
-        provider = (
-            db.query(Provider).filter(Provider.provider_id == provider_id).first()
+    async def get_provider(db: AsyncSession, provider_id: str) -> Provider:
+        provider = await db.scalar(
+            select(Provider)
+            .options(joinedload(Provider.user))
+            .where(Provider.provider_id == provider_id)
         )
 
         if not provider:
@@ -50,8 +103,8 @@ class ProviderController:
 
     # get provider using user id
     @staticmethod
-    def get_provider_by_user(db: Session, user_id: str) -> Provider:
-        provider = db.query(Provider).filter(Provider.user_id == user_id).first()
+    async def get_provider_by_user(db: AsyncSession, user_id: str) -> Provider:
+        provider = await db.scalar(select(Provider).where(Provider.user_id == user_id))
 
         if not provider:
             raise HTTPException(
@@ -63,74 +116,174 @@ class ProviderController:
 
     # update provider profile
     @staticmethod
-    def update_provider(
-        db: Session, provider_id: str, provider_data: ProviderUpdate
+    async def update_provider(
+        db: AsyncSession, provider_id: str, provider_data: ProviderUpdate
     ) -> Provider:
-        provider = ProviderController.get_provider(db, provider_id)
+        provider = await ProviderController.get_provider(db, provider_id)
+        previous_services = list(provider.services or [])
 
         for field, value in provider_data.model_dump(exclude_unset=True).items():
             setattr(provider, field, value)
-
-        db.commit()
-        db.refresh(provider)
+        ProviderController.apply_coverage(provider)
+        await db.run_sync(search_docs.sync, provider)
+
+        await db.commit()
+        await db.refresh(provider)
+        provider_index.upsert(provider)
+        await provider_index.publish()
+        await ProviderController.invalidate_search_cache(provider, previous_services)
         return provider
 
-    # search provider
+    # drop the cached searches and card a committed provider change can affect
+    #
+    # searches showing the provider, plus searches for any service it offered
+    # or now offers and unfiltered searches, since it may newly match those
+    @staticmethod
+    async def invalidate_search_cache(provider: Provider, previous_services=()) -> int:
+        services = dict.fromkeys([*previous_services, *(provider.services or [])])
+        return await cache.invalidate_tags(
+            provider_tag(provider.provider_id),
+            "service:*",
+            *[f"service:{service}" for service in services],
+        )
+
+    # store the bounding box of the provider's service radius
+    @staticmethod
+    def apply_coverage(provider: Provider) -> None:
+        if provider.latitude is None or provider.longitude is None:
+            box = (None, None, None, None)
+        else:
+            radius = provider.service_radius
+            if radius is None:
+                radius = DEFAULT_SERVICE_RADIUS_KM
+            box = geo_service.bounding_box(provider.latitude, provider.longitude, radius)
+
+        (
+            provider.coverage_min_lat,
+            provider.coverage_max_lat,
+            provider.coverage_min_lng,
+            provider.coverage_max_lng,
+        ) = box
+
+    # search provider documents
     @staticmethod
-    def search_provider(
-        db: Session,
+    async def search_provider(
+        db: AsyncSession,
         service: Optional[str] = None,
         location: Optional[str] = None,
         min_rating: Optional[float] = None,
         available_only: bool = True,
         skip: int = 0,
         limit: int = 100,
-    ) -> List[Provider]:
-        query = db.query(Provider).join(User)
+        cursor: Optional[str] = None,
+    ) -> Page:
+        doc = ProviderSearchDoc
+        statement = select(doc.document)
 
         if service:
-            query = query.filter(Provider.services.contains([service]))
-
-        if location:
-            query = query.filter(User.location.ilike(f"%{location}%"))
+            statement = statement.where(doc.services.contains([service]))
 
         if min_rating:
-            query = query.filter(Provider.rating >= min_rating)
+            statement = statement.where(doc.rating >= min_rating)
 
         if available_only:
-            query = query.filter(Provider.availability == True)
+            statement = statement.where(doc.availability == True)
+
+        # newest first, or best location match first
+        keys = [doc.created_at, doc.provider_id]
+        term = normalize_location(location) if location else ""
+        if term:
+            await db.execute(ProviderController._similarity_threshold())
+            statement, similarity = ProviderController._match_location(statement, term)
+            keys = [similarity, doc.provider_id]
+
+        return await paginate_async(
+            db, statement, keys, cursor=cursor, limit=limit, skip=skip
+        )
 
-        query = query.filter(Provider.approved == True)
+    # all providers for admins, newest first
+    @staticmethod
+    async def get_providers(
+        db: AsyncSession, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
+    ) -> Page:
+        return await paginate_async(
+            db,
+            select(Provider),
+            [Provider.created_at, Provider.provider_id],
+            cursor=cursor,
+            limit=limit,
+            skip=skip,
+        )
 
-        return query.offset(skip).limit(limit).all()
+    # sets the transaction's word similarity threshold, run before _match_location
+    @staticmethod
+    def _similarity_threshold():
+        return select(
+            func.set_config(
+                "pg_trgm.word_similarity_threshold",
+                str(settings.LOCATION_SIMILARITY_THRESHOLD),
+                True,
+            )
+        )
+
+    # fuzzy location filter on the trigram index, with the score to sort by
+    #
+    # <% is answered from ix_search_docs_location_trgm using the transaction's
+    # word similarity threshold, so typos like "Margoa" still find "Margao"
+    @staticmethod
+    def _match_location(query, term: str):
+        column = ProviderSearchDoc.location_normalized
+        similarity = func.word_similarity(term, column, type_=Float)
+
+        return (
+            query.filter(literal(term).op("<%")(column)),
+            similarity,
+        )
 
     # approve provider
     @staticmethod
-    def approve_provider(db: Session, provider_id: str) -> Provider:
-        provider = ProviderController.get_provider(db, provider_id)
+    async def approve_provider(db: AsyncSession, provider_id: str) -> Provider:
+        provider = await ProviderController.get_provider(db, provider_id)
         provider.approved = True
-        db.commit()
-        db.refresh(provider)
+        await db.run_sync(search_docs.sync, provider)
+        await db.commit()
+        await db.refresh(provider)
+        provider_index.upsert(provider)
+        await provider_index.publish()
+        await ProviderController.invalidate_search_cache(provider)
         return provider
 
     # update provider ratings
-    def update_rating(db: Session, provider_id: str, new_rating: float):
-        provider = ProviderController.get_provider(db, provider_id)
+    @staticmethod
+    async def update_rating(db: AsyncSession, provider_id: str, new_rating: float):
+        provider = await ProviderController.get_provider(db, provider_id)
 
         # recalculate average rating
         total_rating = provider.rating * provider.rating_count + new_rating
         provider.rating_count += 1
         provider.rating = total_rating / provider.rating_count
-
-        db.commit()
-        db.refresh(provider)
+        ranking.apply_rating_score(provider)
+        await db.run_sync(search_docs.sync, provider)
+
+        await db.commit()
+        await db.refresh(provider)
+        provider_index.upsert(provider)
+        await provider_index.publish()
+        await ProviderController.invalidate_search_cache(provider)
         return provider
 
     # enhanced provider search with geolocation
+    #
+    # filter candidates, geocode the customer once, then distance filter,
+    # sort and paginate in a single pass (SQL or the spatial index)
+    #
+    # query_text is free text like "leaking geyser in bathroom", matched
+    # against each document's name, services and category keywords.
+    # sort_by is applied by the database before skip/limit, see ranking.
+    # results are the stored ProviderWithUser documents, nothing is joined
     @staticmethod
-    @cached(ttl=1800, key_prefix="provider_search")
     async def search_providers_with_location(
-        db: Session,
+        db: AsyncSession,
         service: Optional[str] = None,
         location: Optional[str] = None,
         min_rating: Optional[float] = None,
@@ -138,52 +291,257 @@ class ProviderController:
         available_only: bool = True,
         skip: int = 0,
         limit: int = 100,
-    ) -> List[Provider]:
+        query_text: Optional[str] = None,
+        sort_by: str = "distance",
+        max_price: Optional[float] = None,
+    ) -> List[Dict]:
+        filters = dict(
+            service=service,
+            min_rating=min_rating,
+            available_only=available_only,
+            skip=skip,
+            limit=limit,
+            query_text=query_text,
+            sort_by=sort_by,
+            max_price=max_price,
+        )
+        if not (location and max_distance_km):
+            return await ProviderController._search(db, None, None, **filters)
+
+        # an address the gazetteer doesn't know gets a moment for Nominatim
+        customer_coords = await geo_service.get_coordinates(
+            location, timeout=settings.GEOCODE_SEARCH_WAIT_SECONDS
+        )
+        if customer_coords:
+            return await ProviderController._search(
+                db, customer_coords, max_distance_km, **filters
+            )
 
-        query = db.query(Provider).join(User)
+        # providers from anywhere would pass for nearby ones, so nothing is
+        # returned or cached and a retry finds the lookup's answer once it lands
+        logger.warning("Could not geocode customer location", location=location)
+        raise LocationUnresolvedError()
+
+    # search_providers_with_location once the customer is placed, cached
+    # per coordinates so every spelling of an address shares an entry
+    @staticmethod
+    @cached(ttl=1800, key_prefix="provider_search", tags=search_tags, stale_ttl=600)
+    async def _search(
+        db: AsyncSession,
+        customer_coords: Optional[Tuple[float, float]],
+        max_distance_km: Optional[float],
+        service: Optional[str] = None,
+        min_rating: Optional[float] = None,
+        available_only: bool = True,
+        skip: int = 0,
+        limit: int = 100,
+        query_text: Optional[str] = None,
+        sort_by: str = "distance",
+        max_price: Optional[float] = None,
+    ) -> List[Dict]:
+        tsquery = ServiceController.text_query(query_text)
+        statement = ProviderController._candidate_query(
+            service, min_rating, available_only, tsquery, max_price
+        )
+
+        if customer_coords is None:
+            return await ProviderController._page(
+                db, statement, tsquery, sort_by, skip, limit
+            )
+
+        # the index only orders by distance and knows nothing about
+        # free text, everything else is ranked in SQL
+        if provider_index.ready and tsquery is None and sort_by == "distance":
+            results = await ProviderController._search_index(
+                db,
+                customer_coords,
+                service=service,
+                min_rating=min_rating,
+                max_price=max_price,
+                max_distance_km=max_distance_km,
+                available_only=available_only,
+                skip=skip,
+                limit=limit,
+            )
+            if results is not None:
+                return results
+
+        return await ProviderController._search_sql(
+            db,
+            statement,
+            customer_coords,
+            max_distance_km,
+            skip,
+            limit,
+            sort_by,
+            tsquery,
+        )
+
+    # documents matching the non-spatial filters
+    #
+    # every filter stays in SQL so pages are never cut short after the fact,
+    # see the provider_search_docs indexes for which combinations are covered.
+    # only approved providers have a document
+    @staticmethod
+    def _candidate_query(
+        service: Optional[str],
+        min_rating: Optional[float],
+        available_only: bool,
+        tsquery=None,
+        max_price: Optional[float] = None,
+    ):
+        doc = ProviderSearchDoc
+        statement = select(doc.document)
+
+        if tsquery is not None:
+            statement = statement.where(doc.search_vector.op("@@")(tsquery))
 
         if service:
-            query = query.filter(Provider.services.contains([service]))
+            statement = statement.where(doc.services.contains([service]))
 
         if min_rating:
-            query = query.filter(Provider.rating >= min_rating)
+            statement = statement.where(doc.rating >= min_rating)
+
+        # unpriced providers never match a price cap
+        if max_price:
+            statement = statement.where(doc.pricing > 0, doc.pricing <= max_price)
 
         if available_only:
-            query = query.filter(Provider.availability == True)
-
-        query = query.filter(Provider.approved == True)
-
-        providers = query.offset(skip).limit(limit).all()
-
-        provider_dicts = []
-        for provider in providers:
-            provider_dict = {
-                "provider_id": str(provider.provider_id),
-                "location": provider.user.location,
-                "name": provider.user.name,
-                "rating": provider.rating,
-                "services": provider.services,
-                "pricing": provider.pricing,
-                "provider_obj": provider,  # Keep reference to original object
-            }
-
-            provider_dicts.append(provider_dict)
-
-            # Apply gelocation filtering if location provided
-            if location and max_distance_km:
-                provider_dicts = await geo_service.find_nearby_providers(
-                    customer_location=location,
-                    providers=provider_dicts,
-                    max_distance_km=max_distance_km,
-                )
+            statement = statement.where(doc.availability == True)
 
-            # return original provider objects with distance info
-            result_providers = []
-            for provider_dict in provider_dicts:
-                provider_obj = provider_dict["provider_obj"]
+        return statement
 
-                if "distance_km" in provider_dict:
-                    provider_obj.distance_km = provider_dict["distance_km"]
-                result_providers.append(provider_obj)
+    # ranked ORDER BY, free text relevance puts the best text match first
+    @staticmethod
+    def _order_by(sort_by: str, tsquery=None, distance=None) -> List:
+        order = ranking.order_by(sort_by, distance)
+        if tsquery is not None and sort_by == "relevance":
+            rank = func.ts_rank(ProviderSearchDoc.search_vector, tsquery)
+            order = [rank.desc()] + order
+        return order
+
+    # one ranked page of documents without a customer location
+    @staticmethod
+    async def _page(
+        db: AsyncSession, statement, tsquery, sort_by: str, skip: int, limit: int
+    ) -> List[Dict]:
+        result = await db.execute(
+            statement.order_by(*ProviderController._order_by(sort_by, tsquery))
+            .offset(skip)
+            .limit(limit)
+        )
+        return [document for document, in result.all()]
+
+    # radius search in the database against stored coordinates
+    #
+    # a provider matches when it is within the customer's max_distance and
+    # the customer is within the provider's own service_radius
+    @staticmethod
+    async def _search_sql(
+        db: AsyncSession,
+        statement,
+        coords,
+        max_distance_km: float,
+        skip: int,
+        limit: int,
+        sort_by: str = "distance",
+        tsquery=None,
+    ) -> List[Dict]:
+        doc = ProviderSearchDoc
+        lat, lng = coords
+        min_lat, max_lat, min_lng, max_lng = geo_service.bounding_box(
+            lat, lng, max_distance_km
+        )
+        distance = distance_km_expression(doc.latitude, doc.longitude, lat, lng)
+        customer_point = func.box(func.point(lng, lat), func.point(lng, lat))
+
+        result = await db.execute(
+            statement.add_columns(distance.label("distance_km"))
+            .where(
+                doc.latitude.between(min_lat, max_lat),
+                doc.longitude.between(min_lng, max_lng),
+                coverage_box().op("@>")(customer_point),
+                distance <= max_distance_km,
+                distance <= func.coalesce(doc.service_radius, DEFAULT_SERVICE_RADIUS_KM),
+            )
+            .order_by(*ProviderController._order_by(sort_by, tsquery, distance))
+            .offset(skip)
+            .limit(limit)
+        )
+
+        return [
+            {**document, "distance_km": round(distance_km, 2)}
+            for document, distance_km in result.all()
+        ]
+
+    # answer a radius search from the in-process spatial index
+    #
+    # hits are hydrated with one MGET of cached cards, the database only
+    # fills in the misses, which are cached again in one pipeline. None when
+    # the index can't answer the page, the caller searches in SQL then
+    @staticmethod
+    async def _search_index(
+        db: AsyncSession,
+        coords,
+        service: Optional[str],
+        min_rating: Optional[float],
+        max_distance_km: float,
+        available_only: bool,
+        skip: int,
+        limit: int,
+        max_price: Optional[float] = None,
+    ) -> Optional[List[Dict]]:
+        hits = provider_index.query(
+            coords[0],
+            coords[1],
+            max_distance_km,
+            service=service,
+            min_rating=min_rating,
+            max_price=max_price,
+            available_only=available_only,
+            skip=skip,
+            limit=limit,
+        )
+        if hits is None:
+            return None
+        if not hits:
+            return []
+
+        keys = {provider_id: card_key(provider_id) for provider_id, _ in hits}
+        cards = await cache.get_many(keys.values())
+        by_id = {
+            provider_id: cards[key] for provider_id, key in keys.items() if key in cards
+        }
+
+        missing = [provider_id for provider_id in keys if provider_id not in by_id]
+        if missing:
+            result = await db.execute(
+                select(ProviderSearchDoc.provider_id, ProviderSearchDoc.document).where(
+                    ProviderSearchDoc.provider_id.in_(missing)
+                )
+            )
+            rows = result.all()
+            by_id.update(rows)
+
+            # the index is ahead of the documents, paging around the gap
+            # would shift the skip/limit window, so SQL answers this page
+            missing = [str(provider_id) for provider_id in keys if provider_id not in by_id]
+            if missing:
+                logger.warning(
+                    "Spatial index hits without a search document", missing=missing
+                )
+                return None
+
+            await cache.set_many(
+                {card_key(provider_id): document for provider_id, document in rows},
+                ttl=PROVIDER_CARD_TTL,
+                tags={
+                    card_key(provider_id): [provider_tag(provider_id)]
+                    for provider_id, _ in rows
+                },
+            )
 
-            return result_providers
+        return [
+            {**by_id[provider_id], "distance_km": round(distance_km, 2)}
+            for provider_id, distance_km in hits
+        ]
@@ -1,28 +1,29 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from fastapi import HTTPException, status
-from typing import List
+from typing import List, Optional
 
 from app.models.review import Review
 from app.models.booking import Booking, BookingStatus
 from app.schemas.review import ReviewCreate
+from app.core.pagination import Page, paginate_async
 from app.controllers.provider import ProviderController
 
 
 class ReviewController:
     # create new review
     @staticmethod
-    def create_review(
-        db: Session, review_data: ReviewCreate, customer_id: str
+    async def create_review(
+        db: AsyncSession, review_data: ReviewCreate, customer_id: str
     ) -> Review:
         # verify booking exists and is completed
-        booking = (
-            db.query(Booking)
-            .filter(
+        booking = await db.scalar(
+            select(Booking).where(
                 Booking.booking_id == review_data.booking_id,
                 Booking.customer_id == customer_id,
                 Booking.status == BookingStatus.COMPLETED,
             )
-            .first()
         )
 
         if not booking:
@@ -32,8 +33,8 @@ class ReviewController:
             )
 
         # check if review already exists
-        existing_review = (
-            db.query(Review).filter(Review.booking_id == review_data.booking_id).first()
+        existing_review = await db.scalar(
+            select(Review).where(Review.booking_id == review_data.booking_id)
         )
         if existing_review:
             raise HTTPException(
@@ -47,22 +48,37 @@ class ReviewController:
             provider_id=booking.provider_id
         )
         db.add(review)
-        db.commit()
-        db.refresh(review)
+        await db.commit()
+        await db.refresh(review)
 
         # update provider rating
-        ProviderController.update_rating(db, booking.provider_id, review.rating)
+        await ProviderController.update_rating(db, booking.provider_id, review.rating)
 
         return review
 
-    # get provider reviews
+    # get provider reviews, with the customer each one shows
     @staticmethod
-    def get_provider_reviews(db: Session, provider_id: str) -> List[Review]:
-        return db.query(Review).filter(Review.provider_id == provider_id).all()
+    async def get_provider_reviews(
+        db: AsyncSession,
+        provider_id: str,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        skip: int = 0,
+    ) -> Page:
+        return await paginate_async(
+            db,
+            select(Review)
+            .options(joinedload(Review.customer))
+            .where(Review.provider_id == provider_id),
+            [Review.created_at, Review.review_id],
+            cursor=cursor,
+            limit=limit,
+            skip=skip,
+        )
 
     # get review based on id
-    def get_review(db: Session, review_id: str) -> Review:
-        review = db.query(Review).filter(Review.review_id == review_id).first()
+    async def get_review(db: AsyncSession, review_id: str) -> Review:
+        review = await db.scalar(select(Review).where(Review.review_id == review_id))
         if not review:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Review not found"
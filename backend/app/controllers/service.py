@@ -0,0 +1,50 @@
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional
+import re
+
+from app.core.decorators import cached
+from app.models.service import ServiceCategory
+
+
+class ServiceController:
+
+    # OR together the words of free text, to_tsquery stems them and drops stopwords
+    @staticmethod
+    def text_query(text: Optional[str]):
+        words = re.findall(r"[a-z0-9]+", (text or "").lower())
+        if not words:
+            return None
+
+        return func.to_tsquery("english", " | ".join(words))
+
+    # active categories matching free text, best match first
+    # categories only change with migrations, so results are kept an hour
+    @staticmethod
+    @cached(ttl=3600, key_prefix="service_categories")
+    async def search_categories(
+        db: AsyncSession, text: str, limit: int = 5
+    ) -> List[Dict]:
+        tsquery = ServiceController.text_query(text)
+        if tsquery is None:
+            return []
+
+        rank = func.ts_rank(ServiceCategory.search_vector, tsquery)
+        result = await db.execute(
+            select(ServiceCategory, rank.label("rank"))
+            .where(
+                ServiceCategory.active == True,
+                ServiceCategory.search_vector.op("@@")(tsquery),
+            )
+            .order_by(rank.desc(), ServiceCategory.name)
+            .limit(limit)
+        )
+
+        return [
+            {
+                "name": category.name,
+                "description": category.description,
+                "rank": round(category_rank, 4),
+            }
+            for category, category_rank in result.all()
+        ]
@@ -1,18 +1,25 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
-from typing import List
+from typing import List, Optional
 
 from app.models.user import User
+from app.models.provider import Provider
+from app.controllers.provider import ProviderController
 from app.schemas.user import UserCreate, UserUpdate
+from app.core.pagination import Page, paginate_async
 from app.core.security import get_password_hash
 from app.core.validators import InputSanitizer
+from app.services.geolocation import geo_service
+from app.services.search_docs import search_docs
+from app.services.spatial_index import provider_index
 
 
 class UserController:
 
     # create new user
     @staticmethod
-    def create_user(db: Session, user_data: UserCreate) -> User:
+    async def create_user(db: AsyncSession, user_data: UserCreate) -> User:
         try:
             name = InputSanitizer.validate_name(user_data.name)
             email = InputSanitizer.validate_email(user_data.email)
@@ -22,8 +29,8 @@ class UserController:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
         # check if user already exists
-        existing_user = (
-            db.query(User).filter((User.email == email) | (User.phone == phone)).first()
+        existing_user = await db.scalar(
+            select(User).where((User.email == email) | (User.phone == phone))
         )
 
         if existing_user:
@@ -45,14 +52,14 @@ class UserController:
         )
 
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
         return user
 
     # get user by id
     @staticmethod
-    def get_user(db: Session, user_id: str) -> User:
-        user = db.query(User).filter(User.id == user_id).first()
+    async def get_user(db: AsyncSession, user_id: str) -> User:
+        user = await db.scalar(select(User).where(User.id == user_id))
 
         if not user:
             raise HTTPException(
@@ -63,8 +70,10 @@ class UserController:
 
     # update user
     @staticmethod
-    def update_user(db: Session, user_id: str, user_data: UserUpdate) -> User:
-        user = UserController.get_user(db, user_id)
+    async def update_user(
+        db: AsyncSession, user_id: str, user_data: UserUpdate
+    ) -> User:
+        user = await UserController.get_user(db, user_id)
 
         # validate and sanitize updated fields
         update_data = {}
@@ -90,42 +99,68 @@ class UserController:
 
         # check for email/phone conflicts
         if "email" in update_data or "phone" in update_data:
-            existing_user = db.query(User).filter(User.id != user_id)
+            existing_user = select(User).where(User.id != user_id)
 
             if "email" in update_data:
-                existing_user = existing_user.filter(User.email == update_data["email"])
+                existing_user = existing_user.where(User.email == update_data["email"])
             if "phone" in update_data:
-                existing_user = existing_user.filter(User.phone == update_data["phone"])
+                existing_user = existing_user.where(User.phone == update_data["phone"])
 
-            if existing_user.first():
+            if await db.scalar(existing_user):
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Email or phone already exists",
                 )
 
-        for field, value in update_data.items():
-            setattr(user, field, value)
-
-        db.commit()
-        db.refresh(user)
+        # every field here shows in the provider document, an update that
+        # changes none of them leaves the document and search caches alone
+        changed = {
+            field
+            for field, value in update_data.items()
+            if getattr(user, field) != value
+        }
+        for field in changed:
+            setattr(user, field, update_data[field])
+
+        if changed & {"location", "pincode"}:
+            await UserController.refresh_coordinates(db, user)
+        if changed:
+            await db.run_sync(search_docs.sync_user, user)
+
+        await db.commit()
+        await db.refresh(user)
+
+        if changed:
+            await UserController.reindex_provider(db, user)
         return user
 
     # delete user
     @staticmethod
-    def delete_user(db: Session, user_id: str):
-        user = UserController.get_user(db, user_id)
-        db.delete(user)
-        db.commit()
+    async def delete_user(db: AsyncSession, user_id: str):
+        user = await UserController.get_user(db, user_id)
+        await db.delete(user)
+        await db.commit()
 
     # get all users
     @staticmethod
-    def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[User]:
-        return db.query(User).offset(skip).limit(limit).all()
+    async def get_users(
+        db: AsyncSession, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
+    ) -> Page:
+        return await paginate_async(
+            db,
+            select(User),
+            [User.created_at, User.id],
+            cursor=cursor,
+            limit=limit,
+            skip=skip,
+        )
 
     # update location
     @staticmethod
-    def update_location(db: Session, user_id: str, location: str, pincode: str) -> User:
-        user = UserController.get_user(db, user_id)
+    async def update_location(
+        db: AsyncSession, user_id: str, location: str, pincode: str
+    ) -> User:
+        user = await UserController.get_user(db, user_id)
 
         try:
             location = InputSanitizer.validate_location(location)
@@ -136,6 +171,34 @@ class UserController:
 
         user.location = location
         user.pincode = pincode
-        db.commit()
-        db.refresh(user)
+        await UserController.refresh_coordinates(db, user)
+        await db.run_sync(search_docs.sync_user, user)
+
+        await db.commit()
+        await db.refresh(user)
+        await UserController.reindex_provider(db, user)
         return user
+
+    # geocode the user's location and copy it onto their provider profile
+    @staticmethod
+    async def refresh_coordinates(db: AsyncSession, user: User) -> None:
+        coords = await geo_service.geocode_user_location(user.location, user.pincode)
+        latitude, longitude = coords if coords else (None, None)
+
+        user.latitude = latitude
+        user.longitude = longitude
+
+        provider = await db.scalar(select(Provider).where(Provider.user_id == user.id))
+        if provider:
+            provider.latitude = latitude
+            provider.longitude = longitude
+            ProviderController.apply_coverage(provider)
+
+    # push a provider's new profile into the spatial index and search cache
+    @staticmethod
+    async def reindex_provider(db: AsyncSession, user: User) -> None:
+        provider = await db.scalar(select(Provider).where(Provider.user_id == user.id))
+        if provider:
+            provider_index.upsert(provider)
+            await provider_index.publish()
+            await ProviderController.invalidate_search_cache(provider)
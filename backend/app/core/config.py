@@ -1,11 +1,124 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Any, Dict, List, Optional
+
+# connection pool and timeouts per ENVIRONMENT, used for any DATABASE_*
+# pool setting left unset. production is on Render, whose proxy drops idle
+# connections, so they are recycled early and pinged before use. a
+# timeout of 0 turns that timeout off
+DATABASE_POOL_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "production": {
+        "pool_size": 5,
+        "max_overflow": 5,
+        "pool_timeout": 10.0,
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+        "statement_timeout_ms": 15_000,
+        "idle_in_transaction_timeout_ms": 30_000,
+    },
+    "staging": {
+        "pool_size": 3,
+        "max_overflow": 2,
+        "pool_timeout": 10.0,
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+        "statement_timeout_ms": 15_000,
+        "idle_in_transaction_timeout_ms": 30_000,
+    },
+    "development": {
+        "pool_size": 5,
+        "max_overflow": 10,
+        "pool_timeout": 30.0,
+        "pool_recycle": 3600,
+        "pool_pre_ping": False,
+        "statement_timeout_ms": 60_000,
+        "idle_in_transaction_timeout_ms": 0,
+    },
+    "test": {
+        "pool_size": 2,
+        "max_overflow": 2,
+        "pool_timeout": 5.0,
+        "pool_recycle": 3600,
+        "pool_pre_ping": False,
+        "statement_timeout_ms": 30_000,
+        "idle_in_transaction_timeout_ms": 30_000,
+    },
+}
 
 
 class Settings(BaseSettings):
     # database
     DATABASE_URL: str
+    # per worker and engine, unset values come from DATABASE_POOL_DEFAULTS.
+    # DATABASE_POOL_TIMEOUT is how long a request waits for a free
+    # connection. the statement and idle in transaction timeouts (ms) are
+    # set on request connections only, scripts and migrations run long
+    DATABASE_POOL_SIZE: Optional[int] = None
+    DATABASE_MAX_OVERFLOW: Optional[int] = None
+    DATABASE_POOL_TIMEOUT: Optional[float] = None
+    DATABASE_POOL_RECYCLE: Optional[int] = None
+    DATABASE_POOL_PRE_PING: Optional[bool] = None
+    DATABASE_STATEMENT_TIMEOUT_MS: Optional[int] = None
+    DATABASE_IDLE_IN_TRANSACTION_TIMEOUT_MS: Optional[int] = None
+    # read replicas for safe GET handlers, as a JSON list of URLs. a replica
+    # is taken out of rotation while it is more than
+    # DATABASE_REPLICA_MAX_LAG_SECONDS behind, checked every
+    # DATABASE_REPLICA_CHECK_INTERVAL seconds. a user who wrote reads from
+    # the primary for DATABASE_READ_YOUR_WRITES_SECONDS. locally a copy of
+    # the SQLite file works as a stand-in replica
+    DATABASE_REPLICA_URLS: List[str] = []
+    DATABASE_REPLICA_MAX_LAG_SECONDS: float = 5.0
+    DATABASE_REPLICA_CHECK_INTERVAL: float = 5.0
+    DATABASE_READ_YOUR_WRITES_SECONDS: float = 10.0
     REDIS_URL: str = "redis://localhost:6379/0"
+    # one shared pool per worker, a slow Redis fails fast instead of stalling
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_SOCKET_TIMEOUT: float = 0.2
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = 0.25
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
+    # this many timeouts or connection errors within the window open the
+    # cache circuit, calls then skip Redis until a probe after the reset
+    # timeout succeeds
+    REDIS_CIRCUIT_FAILURES: int = 5
+    REDIS_CIRCUIT_WINDOW: float = 10.0
+    REDIS_CIRCUIT_RESET_TIMEOUT: float = 5.0
+    # in-process LRU in front of Redis for these key prefixes, kept coherent
+    # across workers by invalidations published on the channel
+    CACHE_L1_NAMESPACES: List[str] = ["provider_card", "geocode", "service_categories"]
+    CACHE_L1_MAX_BYTES: int = 32 * 1024 * 1024
+    CACHE_L1_TTL: float = 60.0
+    CACHE_INVALIDATION_CHANNEL: str = "cache:invalidate"
+    # cache entry serialization, see app/services/codecs.py. payloads from
+    # CACHE_COMPRESS_MIN_BYTES up are compressed with zstd
+    CACHE_CODEC: str = "orjson"
+    CACHE_NAMESPACE_CODECS: Dict[str, str] = {}
+    CACHE_COMPRESS_MIN_BYTES: int = 1024
+    CACHE_COMPRESS_LEVEL: int = 3
+
+    # provider spatial index snapshot, shared by workers through mmap
+    SPATIAL_INDEX_PATH: Optional[str] = None
+
+    # geocoding, Nominatim is only a rate-limited fallback behind the gazetteer
+    NOMINATIM_ENABLED: bool = True
+    NOMINATIM_MIN_INTERVAL: float = 1.0
+    GEOCODE_NEGATIVE_TTL: int = 300
+    # how long a search waits on Nominatim for an address it can't place
+    GEOCODE_SEARCH_WAIT_SECONDS: float = 1.5
+    GAZETTEER_LEARNED_PATH: Optional[str] = None
+
+    # pg_trgm word similarity a location must reach in the provider listing
+    LOCATION_SIMILARITY_THRESHOLD: float = 0.5
+
+    # provider ranking, weights of the composite "relevance" sort
+    RANK_WEIGHT_DISTANCE: float = 0.4
+    RANK_WEIGHT_RATING: float = 0.35
+    RANK_WEIGHT_PRICE: float = 0.15
+    RANK_WEIGHT_EXPERIENCE: float = 0.1
+    RANK_DISTANCE_DECAY_KM: float = 5.0
+    # ratings are smoothed towards this prior, worth this many reviews
+    RANK_RATING_PRIOR: float = 3.5
+    RANK_RATING_PRIOR_COUNT: int = 10
+    RANK_PRICE_REFERENCE: float = 500.0
+    RANK_EXPERIENCE_CAP_YEARS: int = 10
 
     # security & jwt
     SECRET_KEY: str = "falback-secret-key"
@@ -43,6 +156,17 @@ class Settings(BaseSettings):
     # Monitoring
     SENTRY_DSN: Optional[str] = None
 
+    # pool settings for this environment, explicit DATABASE_* values win
+    def database_pool(self) -> Dict[str, Any]:
+        defaults = DATABASE_POOL_DEFAULTS.get(
+            self.ENVIRONMENT, DATABASE_POOL_DEFAULTS["production"]
+        )
+        pool = {}
+        for name, default in defaults.items():
+            value = getattr(self, f"DATABASE_{name.upper()}")
+            pool[name] = default if value is None else value
+        return pool
+
     class Config:
         env_file = ".env"
 
@@ -1,13 +1,174 @@
-from sqlalchemy import create_engine
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.util import await_only
 
 from app.core.config import settings
+from app.core.db_pool import PoolMetrics, timed_pool
+from app.core.db_routing import Replica, ReplicaSet, WritePins
+
+# async driver for each sync URL scheme
+ASYNC_DRIVERS = {
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+# DATABASE_URL with its async driver, asyncpg spells sslmode as ssl
+def async_database_url(url: str):
+    url = make_url(url)
+    backend = url.drivername.split("+", 1)[0]
+    if backend not in ASYNC_DRIVERS:
+        return url
+
+    url = url.set(drivername=ASYNC_DRIVERS[backend])
+    if url.drivername.endswith("asyncpg") and "sslmode" in url.query:
+        query = dict(url.query)
+        query["ssl"] = query.pop("sslmode")
+        url = url.set(query=query)
+    return url
+
+
+# create_engine arguments for the pool settings, see Settings.database_pool
+#
+# with timeouts, every new Postgres connection gets statement_timeout and
+# idle_in_transaction_session_timeout, passed the way its driver takes
+# them. SQLite (the tests) keeps SQLAlchemy's default pool
+def engine_options(
+    url, pool: Dict[str, Any], metrics: PoolMetrics, timeouts: bool = True
+) -> Dict[str, Any]:
+    url = make_url(url)
+    if url.get_backend_name() != "postgresql":
+        return {}
+
+    is_async = url.get_dialect().is_async
+    options = {
+        "poolclass": timed_pool(
+            AsyncAdaptedQueuePool if is_async else QueuePool, metrics
+        ),
+        "pool_size": pool["pool_size"],
+        "max_overflow": pool["max_overflow"],
+        "pool_timeout": pool["pool_timeout"],
+        "pool_recycle": pool["pool_recycle"],
+        "pool_pre_ping": pool["pool_pre_ping"],
+    }
+
+    server_settings = {}
+    if timeouts:
+        server_settings = {
+            "statement_timeout": str(pool["statement_timeout_ms"]),
+            "idle_in_transaction_session_timeout": str(
+                pool["idle_in_transaction_timeout_ms"]
+            ),
+        }
+    if server_settings and is_async:
+        options["connect_args"] = {"server_settings": server_settings}
+    elif server_settings:
+        options["connect_args"] = {
+            "options": " ".join(
+                f"-c {name}={value}" for name, value in server_settings.items()
+            )
+        }
+    return options
 
-engine = create_engine(settings.DATABASE_URL)
+
+# checkout waits and saturation per engine, shown on /api/health
+pool_metrics = {"requests": PoolMetrics("requests"), "scripts": PoolMetrics("scripts")}
+
+# sync engine, for migrations, scripts and startup work
+engine = create_engine(
+    settings.DATABASE_URL,
+    **engine_options(
+        settings.DATABASE_URL,
+        settings.database_pool(),
+        pool_metrics["scripts"],
+        timeouts=False,
+    ),
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# async engine, used by every request
+ASYNC_DATABASE_URL = async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    **engine_options(
+        ASYNC_DATABASE_URL, settings.database_pool(), pool_metrics["requests"]
+    ),
+)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+
+def _replica(number: int, url: str) -> Replica:
+    name = f"replica_{number}"
+    url = async_database_url(url)
+    pool_metrics[name] = PoolMetrics(name)
+    return Replica(
+        name,
+        create_async_engine(
+            url, **engine_options(url, settings.database_pool(), pool_metrics[name])
+        ),
+    )
+
+
+# read replicas for get_read_db, see DATABASE_REPLICA_URLS
+replicas = ReplicaSet(
+    [
+        _replica(number, url)
+        for number, url in enumerate(settings.DATABASE_REPLICA_URLS, 1)
+    ],
+    max_lag=settings.DATABASE_REPLICA_MAX_LAG_SECONDS,
+    check_interval=settings.DATABASE_REPLICA_CHECK_INTERVAL,
+)
+# shared with the other workers once main.py hands it the cache
+write_pins = WritePins(settings.DATABASE_READ_YOUR_WRITES_SECONDS)
+
+
+# a session that flushed or ran an insert, update or delete statement wrote
+@event.listens_for(Session, "after_flush")
+def _flushed(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _executed(state):
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info["wrote"] = True
+
+
+# a committed write pins the session's user to the primary. commit() on an
+# AsyncSession runs this in its greenlet, so the pin is awaited before
+# commit() returns, ahead of the response
+@event.listens_for(Session, "after_commit")
+def _committed(session):
+    if session.info.pop("wrote", False) and session.info.get("user"):
+        await_only(write_pins.pin(session.info["user"]))
+
+
+# rolled back writes are gone, nothing to read back
+@event.listens_for(Session, "after_rollback")
+def _rolled_back(session):
+    session.info.pop("wrote", None)
+
+
+# the signed in user a request is for, None for anonymous requests
+def request_user(request: Request) -> Optional[str]:
+    from app.core.security import verify_token
+
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    return verify_token(token)
+
 
 def get_db():
     db = SessionLocal()
@@ -15,3 +176,22 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# primary session, for writes. a request that commits a write pins its
+# user to the primary, so their next reads see the write
+async def get_async_db(request: Request):
+    async with AsyncSessionLocal() as db:
+        db.info["user"] = request_user(request)
+        yield db
+
+
+# session for safe GET handlers, on a replica in rotation. users pinned by
+# a recent write, and every read while no replica is in rotation, go to
+# the primary
+async def get_read_db(request: Request):
+    pinned = replicas.available() and await write_pins.pinned(request_user(request))
+    replica = replicas.choose(pinned)
+    sessions = replica.sessions if replica else AsyncSessionLocal
+    async with sessions() as db:
+        yield db
@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import deque
+from typing import Dict, Type
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+# a checkout slower than this had to wait for a connection to come back
+WAIT_THRESHOLD = 0.001
+
+
+def _percentile(values, share: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+# checkout waits and saturation of one engine's pool, shown on /api/health
+#
+# saturation is connections in use over pool_size + max_overflow, at 1.0
+# new requests queue for up to pool_timeout and then fail. wait
+# percentiles are over the last `recent` checkouts
+class PoolMetrics:
+    def __init__(self, name: str, recent: int = 1000):
+        self.name = name
+        self.capacity = 0
+        self.in_use = 0
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=recent)
+        self.stats = {
+            "checkouts": 0,
+            "waited": 0,
+            "timeouts": 0,
+            "peak_in_use": 0,
+            "wait_ms_max": 0.0,
+        }
+
+    def record_checkout(self, wait: float) -> None:
+        with self._lock:
+            self.in_use += 1
+            self.stats["checkouts"] += 1
+            self.stats["peak_in_use"] = max(self.stats["peak_in_use"], self.in_use)
+            self._record_wait(wait)
+
+    def record_timeout(self, wait: float) -> None:
+        with self._lock:
+            self.stats["timeouts"] += 1
+            self._record_wait(wait)
+
+    def record_checkin(self) -> None:
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+
+    def _record_wait(self, wait: float) -> None:
+        self._waits.append(wait)
+        if wait >= WAIT_THRESHOLD:
+            self.stats["waited"] += 1
+        self.stats["wait_ms_max"] = max(self.stats["wait_ms_max"], wait * 1000)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            waits = list(self._waits)
+            capacity = self.capacity
+            return {
+                "capacity": capacity,
+                "in_use": self.in_use,
+                "saturation": round(self.in_use / capacity, 4) if capacity else 0.0,
+                "peak_saturation": (
+                    round(self.stats["peak_in_use"] / capacity, 4) if capacity else 0.0
+                ),
+                "wait_ms_p50": round(_percentile(waits, 0.5) * 1000, 2),
+                "wait_ms_p99": round(_percentile(waits, 0.99) * 1000, 2),
+                **{
+                    name: round(value, 2) if isinstance(value, float) else value
+                    for name, value in self.stats.items()
+                },
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._waits.clear()
+            self.stats = dict.fromkeys(self.stats, 0)
+            self.stats["wait_ms_max"] = 0.0
+            self.stats["peak_in_use"] = self.in_use
+
+
+# a QueuePool class that reports to metrics
+#
+# a class per engine rather than an attribute, because dispose() replaces
+# the pool with a new instance of the same class
+def timed_pool(base: Type[QueuePool], metrics: PoolMetrics) -> Type[QueuePool]:
+    class TimedPool(base):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            if self._max_overflow >= 0:
+                metrics.capacity = self.size() + self._max_overflow
+
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                record = super()._do_get()
+            except PoolTimeoutError:
+                metrics.record_timeout(time.perf_counter() - started)
+                raise
+            metrics.record_checkout(time.perf_counter() - started)
+            return record
+
+        def _do_return_conn(self, record) -> None:
+            metrics.record_checkin()
+            super()._do_return_conn(record)
+
+    TimedPool.__name__ = f"Timed{base.__name__}"
+    return TimedPool
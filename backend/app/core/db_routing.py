@@ -0,0 +1,196 @@
+import asyncio
+import math
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from app.core.logging import get_logger
+
+logger = get_logger("db_routing")
+
+# seconds a streaming replica is behind. 0 once it has replayed all the
+# WAL it received, so an idle primary doesn't look like lag, and 0 on a
+# database that isn't a replica at all
+POSTGRES_LAG = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+    " END"
+)
+
+
+async def replica_lag(engine: AsyncEngine) -> float:
+    # a SQLite stand-in has no replication to measure
+    if engine.dialect.name != "postgresql":
+        return 0.0
+    async with engine.connect() as conn:
+        return float(await conn.scalar(POSTGRES_LAG))
+
+
+# one read replica and the sessions opened on it
+#
+# its sessions carry the replica's name in session.info["replica"], so
+# code that must not act on lagging data can tell them apart
+class Replica:
+    def __init__(self, name: str, engine: AsyncEngine):
+        self.name = name
+        self.engine = engine
+        self.sessions = async_sessionmaker(
+            engine,
+            class_=AsyncSession,
+            autoflush=False,
+            expire_on_commit=False,
+            info={"replica": name},
+        )
+        # out of rotation until a lag check has passed
+        self.in_rotation = False
+        self.lag: Optional[float] = None
+        self.error: Optional[str] = None
+
+
+# the read replicas of this worker, shown on /api/health
+#
+# reads go round robin over the replicas in rotation. every
+# check_interval seconds each replica's lag is measured, one that is more
+# than max_lag seconds behind or doesn't answer within check_interval is
+# out of rotation until a later check finds it caught up
+class ReplicaSet:
+    def __init__(
+        self,
+        replicas: List[Replica],
+        max_lag: float,
+        check_interval: float,
+        measure_lag: Callable[[AsyncEngine], Awaitable[float]] = replica_lag,
+    ):
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.measure_lag = measure_lag
+        self._turn = 0
+        self._checker: Optional[asyncio.Task] = None
+        self.stats = {"replica_reads": 0, "primary_reads": 0, "pinned_reads": 0}
+
+    def available(self) -> bool:
+        return any(replica.in_rotation for replica in self.replicas)
+
+    # the replica for the next read, None to read from the primary
+    def choose(self, pinned: bool = False) -> Optional[Replica]:
+        if pinned:
+            self.stats["pinned_reads"] += 1
+            return None
+
+        in_rotation = [replica for replica in self.replicas if replica.in_rotation]
+        if not in_rotation:
+            self.stats["primary_reads"] += 1
+            return None
+
+        self._turn += 1
+        self.stats["replica_reads"] += 1
+        return in_rotation[self._turn % len(in_rotation)]
+
+    async def check(self) -> None:
+        for replica in self.replicas:
+            try:
+                lag = await asyncio.wait_for(
+                    self.measure_lag(replica.engine), self.check_interval
+                )
+                error = None if lag <= self.max_lag else f"{lag:.1f}s behind"
+            except Exception as e:
+                lag, error = None, str(e) or type(e).__name__
+
+            if replica.in_rotation and error:
+                logger.warning(
+                    "Replica out of rotation", replica=replica.name, error=error
+                )
+            elif not replica.in_rotation and not error:
+                logger.info("Replica in rotation", replica=replica.name, lag=lag)
+            replica.in_rotation = error is None
+            replica.lag, replica.error = lag, error
+
+    # check the replicas until cancelled
+    async def run_checks(self) -> None:
+        while True:
+            await self.check()
+            await asyncio.sleep(self.check_interval)
+
+    # run run_checks in the background of this event loop
+    def start_checks(self) -> None:
+        if self.replicas and (self._checker is None or self._checker.done()):
+            self._checker = asyncio.get_running_loop().create_task(self.run_checks())
+
+    async def close(self) -> None:
+        if self._checker is not None:
+            self._checker.cancel()
+            try:
+                await self._checker
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._checker = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def snapshot(self) -> Dict:
+        return {
+            "replicas": {
+                replica.name: {
+                    "in_rotation": replica.in_rotation,
+                    "lag_seconds": (
+                        round(replica.lag, 2) if replica.lag is not None else None
+                    ),
+                    "error": replica.error,
+                }
+                for replica in self.replicas
+            },
+            **self.stats,
+        }
+
+    def reset(self) -> None:
+        self.stats = dict.fromkeys(self.stats, 0)
+
+
+# users who wrote in the last window seconds, their reads go to the primary
+#
+# pins are kept in this worker and in the shared cache, so the next
+# request is covered whichever worker takes it. while the cache is
+# unavailable only this worker's pins are known, so every signed in user
+# reads from the primary. the app sets shared at startup, until then pins
+# stay in this worker
+class WritePins:
+    def __init__(self, window: float, shared=None):
+        self.window = window
+        self.shared = shared
+        self._local: Dict[str, float] = {}
+
+    async def pin(self, user_id: Optional[str]) -> None:
+        if not user_id or self.window <= 0:
+            return
+
+        now = time.monotonic()
+        if len(self._local) > 1000:
+            self._local = {
+                user: until for user, until in self._local.items() if until > now
+            }
+        self._local[user_id] = now + self.window
+        if self.shared is None:
+            return
+        await self.shared.set(
+            f"db_pin:{user_id}", 1, ttl=max(1, math.ceil(self.window))
+        )
+
+    # anonymous requests are never pinned, they have no writes to read back
+    async def pinned(self, user_id: Optional[str]) -> bool:
+        if not user_id or self.window <= 0:
+            return False
+
+        until = self._local.get(user_id)
+        if until is not None:
+            if until > time.monotonic():
+                return True
+            del self._local[user_id]
+
+        if self.shared is None:
+            return False
+        if self.shared.bypassing:
+            return True
+        return await self.shared.exists(f"db_pin:{user_id}")
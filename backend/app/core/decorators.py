@@ -1,24 +1,297 @@
+import asyncio
+import hashlib
+import inspect
+import json
+import math
+import random
+import threading
+import time
+from collections import defaultdict
 from functools import wraps
-from typing import Callable
+from typing import Any, Callable, Dict, Iterable, Optional, Union
 
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.database import AsyncSessionLocal, SessionLocal
+from app.core.logging import get_logger
 from app.services.cache import cache
 
+logger = get_logger("cache")
+
+# injected dependencies that never change what a call returns
+SKIPPED_ARGS = ("db", "request", "response", "background_tasks")
+
+# how long one worker may hold the right to refresh a stale entry
+REFRESH_LOCK_TTL = 10.0
+# early expiry aggressiveness, 1.0 is the usual XFetch setting
+EARLY_EXPIRY_BETA = 1.0
+
+OUTCOMES = ("hits", "stale", "misses", "refreshes")
+
+
+# per key prefix counters, shown on /api/health
+#
+# stale counts entries served past (or just before) their soft TTL while
+# another call refreshes them, refreshes counts completed background refreshes
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: dict.fromkeys(OUTCOMES, 0))
+
+    def record(self, prefix: str, outcome: str) -> None:
+        with self._lock:
+            self._counts[prefix][outcome] += 1
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            stats = {}
+            for prefix, counts in self._counts.items():
+                served = counts["hits"] + counts["stale"]
+                total = served + counts["misses"]
+                stats[prefix] = {
+                    **counts,
+                    "hit_ratio": round(served / total, 4) if total else 0.0,
+                }
+            return stats
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+
+# instance
+cache_stats = CacheStats()
+
+# background refreshes in flight, referenced so they are not collected early
+_refresh_tasks = set()
+
+
+# a call's arguments by parameter name, defaults filled in and injected
+# dependencies dropped
+def bind_arguments(
+    func: Callable, args: tuple, kwargs: dict, skip: Iterable[str] = SKIPPED_ARGS
+) -> Dict[str, Any]:
+    bound = inspect.signature(func).bind(*args, **kwargs)
+    bound.apply_defaults()
+
+    return {
+        name: value
+        for name, value in bound.arguments.items()
+        if name not in skip and not isinstance(value, (Session, AsyncSession))
+    }
+
+
+# canonical key for a call, so f(db, "x") and f(db=other, service="x")
+# share an entry in every worker
+def make_cache_key(
+    func: Callable,
+    key_prefix: str,
+    args: tuple,
+    kwargs: dict,
+    skip: Iterable[str] = SKIPPED_ARGS,
+) -> str:
+    params = bind_arguments(func, args, kwargs, skip)
+    canonical = json.dumps(
+        jsonable_encoder(params), sort_keys=True, separators=(",", ":"), default=str
+    )
+    digest = hashlib.sha256(canonical.encode()).hexdigest()[:32]
+
+    return f"{key_prefix or func.__module__}:{func.__qualname__}:{digest}"
+
+
+# XFetch early expiry: refresh a little before the soft TTL, earlier for
+# slow computations and at random, so entries written together by a burst
+# of traffic don't all expire in the same second
+def should_refresh(entry: Dict, now: float, beta: float = EARLY_EXPIRY_BETA) -> bool:
+    jitter = -entry["delta"] * beta * math.log(1.0 - random.random())
+    return now + jitter >= entry["expires_at"]
+
+
+def _is_entry(value: Any) -> bool:
+    return isinstance(value, dict) and value.keys() == {"value", "expires_at", "delta"}
+
+
+# background refreshes outlive the request, so they get their own sessions
+def _with_fresh_sessions(args: tuple, kwargs: dict):
+    sessions = []
+
+    def swap(value):
+        if isinstance(value, AsyncSession):
+            sessions.append(AsyncSessionLocal())
+            return sessions[-1]
+        if isinstance(value, Session):
+            sessions.append(SessionLocal())
+            return sessions[-1]
+        return value
+
+    args = tuple(swap(value) for value in args)
+    kwargs = {name: swap(value) for name, value in kwargs.items()}
+    return args, kwargs, sessions
+
+
+async def _close_all(sessions) -> None:
+    for session in sessions:
+        closed = session.close()
+        if inspect.isawaitable(closed):
+            await closed
+
+
+# a call reading through a read replica session, see Replica
+def _reads_replica(args: tuple, kwargs: dict) -> bool:
+    for value in (*args, *kwargs.values()):
+        if isinstance(value, AsyncSession):
+            value = value.sync_session
+        if isinstance(value, Session) and value.info.get("replica"):
+            return True
+    return False
+
+
+# cache a function's result in Redis
+#
+# results are stored as JSON compatible DTOs (dicts, lists, scalars), never
+# ORM instances, and None is not cached. works on sync and async functions.
+# tags is a list of tags or a callable (arguments, result) -> tags, see
+# CacheService.invalidate_tags
+#
+# with stale_ttl, ttl becomes a soft TTL: the entry lives stale_ttl longer
+# in Redis and past ttl it is still served, while the one caller that takes
+# the refresh lock recomputes it in the background
+#
+# a miss on a read replica session is computed on a fresh primary session,
+# so a replica that hasn't replayed a write yet can't cache the old data
+def cached(
+    ttl: int = 3600,
+    key_prefix: str = "",
+    skip: Iterable[str] = SKIPPED_ARGS,
+    tags: Optional[Union[Iterable[str], Callable[[Dict, Any], Iterable[str]]]] = None,
+    stale_ttl: Optional[int] = None,
+):
+    skip = tuple(skip)
+    store_ttl = ttl + (stale_ttl or 0)
 
-def cached(ttl: int = 3600, key_prefix: str = ""):
     def decorator(func: Callable):
-        @wraps(func)
-        async def wrapper(*args, **kwargs):
-            # Generate cache key
-            cache_key = f"{key_prefix}:{func.__name__}:{hash(str(args) + str(kwargs))}"
+        prefix = key_prefix or func.__module__
+
+        def entry_tags(args, kwargs, dto) -> Iterable[str]:
+            if callable(tags):
+                return tags(bind_arguments(func, args, kwargs, skip), dto)
+            return tags or ()
 
-            cached_result = cache.get(cache_key)
-            if cached_result is not None:
-                return cached_result
+        def entry(dto, started: float):
+            if not stale_ttl:
+                return dto
+            now = time.time()
+            return {"value": dto, "expires_at": now + ttl, "delta": now - started}
 
-            result = await func(*args, **kwargs)
-            cache.set(cache_key, result, ttl)
+        # the value to serve and whether it should be refreshed, None on a miss
+        def lookup(value):
+            if stale_ttl and not _is_entry(value):
+                value = None
+            if value is None:
+                cache_stats.record(prefix, "misses")
+                return None, False
+            if not stale_ttl:
+                cache_stats.record(prefix, "hits")
+                return value, False
+            if should_refresh(value, time.time()):
+                cache_stats.record(prefix, "stale")
+                return value["value"], True
+            cache_stats.record(prefix, "hits")
+            return value["value"], False
+
+        if inspect.iscoroutinefunction(func):
+
+            async def compute(key, args, kwargs):
+                # a lagging replica would refill an entry a write just
+                # invalidated with the data from before the write, so
+                # shared entries are only computed on the primary
+                if _reads_replica(args, kwargs):
+                    args, kwargs, sessions = _with_fresh_sessions(args, kwargs)
+                    try:
+                        return await compute(key, args, kwargs)
+                    finally:
+                        await _close_all(sessions)
+
+                started = time.time()
+                result = await func(*args, **kwargs)
+                if result is None:
+                    return None
+                dto = jsonable_encoder(result)
+                await cache.set(
+                    key, entry(dto, started), store_ttl, tags=entry_tags(args, kwargs, dto)
+                )
+                return dto
+
+            async def refresh(key, token, args, kwargs):
+                args, kwargs, sessions = _with_fresh_sessions(args, kwargs)
+                try:
+                    await compute(key, args, kwargs)
+                    cache_stats.record(prefix, "refreshes")
+                except Exception as e:
+                    logger.warning("Cache refresh failed", key=key, error=str(e))
+                finally:
+                    await _close_all(sessions)
+                    await cache.release_lock(key, token)
+
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                key = make_cache_key(func, prefix, args, kwargs, skip)
+                value, stale = lookup(await cache.get(key))
+                if value is None:
+                    return await compute(key, args, kwargs)
+
+                if stale:
+                    token = await cache.acquire_lock(key, REFRESH_LOCK_TTL)
+                    if token:
+                        task = asyncio.get_running_loop().create_task(
+                            refresh(key, token, args, kwargs)
+                        )
+                        _refresh_tasks.add(task)
+                        task.add_done_callback(_refresh_tasks.discard)
+                return value
+
+            return async_wrapper
+
+        def compute_sync(key, args, kwargs):
+            started = time.time()
+            result = func(*args, **kwargs)
+            if result is None:
+                return None
+            dto = jsonable_encoder(result)
+            cache.set_sync(
+                key, entry(dto, started), store_ttl, tags=entry_tags(args, kwargs, dto)
+            )
+            return dto
+
+        def refresh_sync(key, token, args, kwargs):
+            args, kwargs, sessions = _with_fresh_sessions(args, kwargs)
+            try:
+                compute_sync(key, args, kwargs)
+                cache_stats.record(prefix, "refreshes")
+            except Exception as e:
+                logger.warning("Cache refresh failed", key=key, error=str(e))
+            finally:
+                for session in sessions:
+                    session.close()
+                cache.release_lock_sync(key, token)
+
+        # sync functions run outside the event loop, so the blocking client is fine
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = make_cache_key(func, prefix, args, kwargs, skip)
+            value, stale = lookup(cache.get_sync(key))
+            if value is None:
+                return compute_sync(key, args, kwargs)
 
-            return result
+            if stale:
+                token = cache.acquire_lock_sync(key, REFRESH_LOCK_TTL)
+                if token:
+                    threading.Thread(
+                        target=refresh_sync, args=(key, token, args, kwargs), daemon=True
+                    ).start()
+            return value
 
         return wrapper
 
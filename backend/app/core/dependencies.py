@@ -1,9 +1,10 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
-from app.core.database import get_db
+from app.core.database import AsyncSessionLocal, get_read_db
 from app.core.security import verify_token
 from app.models.user import User
 
@@ -11,8 +12,11 @@ security = HTTPBearer()
 
 
 # get current authenticated user from jwt token
+#
+# looked up in the read session, which GET handlers share. writes never
+# go through this user, handlers load what they change on their own session
 async def get_current_user(
-    token: str = Depends(security), db: Session = Depends(get_db)
+    token: str = Depends(security), db: AsyncSession = Depends(get_read_db)
 ) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -27,7 +31,13 @@ async def get_current_user(
     if user_id is None:
         raise credentials_exception
 
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.scalar(select(User).where(User.id == user_id))
+
+    # a replica may not have replayed a sign up from a moment ago yet
+    if user is None and db.sync_session.info.get("replica"):
+        async with AsyncSessionLocal() as primary:
+            user = await primary.scalar(select(User).where(User.id == user_id))
+
     if user is None:
         raise credentials_exception
 
@@ -48,6 +48,12 @@ class BusinessLogicError(HomeHeroException):
         super().__init__(message, status.HTTP_422_UNPROCESSABLE_ENTITY)
 
 
+# a search location that couldn't be placed on the map, yet
+class LocationUnresolvedError(HomeHeroException):
+    def __init__(self, message: str = "Could not place the search location"):
+        super().__init__(message, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
 # global exception handler
 async def global_exception_handler(request: Request, exc: Exception):
 
@@ -0,0 +1,135 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional, Sequence
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# response header carrying the cursor for the page after this one
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# skip on paginated endpoints, kept for clients that don't send cursors
+SKIP_DESCRIPTION = (
+    "Deprecated, use cursor. Offsets the first page, ignored with a cursor"
+)
+
+
+class Page(NamedTuple):
+    items: List[Any]
+    next_cursor: Optional[str]
+
+
+def _dump(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def _load(value, key):
+    if value is None:
+        return None
+    try:
+        python_type = key.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is uuid.UUID:
+        return uuid.UUID(value)
+    return python_type(value)
+
+
+# opaque token for the sort key values of the last row on a page
+def encode_cursor(values: Sequence) -> str:
+    raw = json.dumps([_dump(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: Sequence) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError("cursor does not match the sort keys")
+        return [_load(value, key) for value, key in zip(values, keys)]
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+# keyset pagination over (sort key..., primary key), all in one direction
+#
+# the keys are added as extra columns so computed sort keys (similarity,
+# distance) work too. a row whose key is NULL never compares in the
+# keyset, so columns must be NOT NULL and computed keys must not be NULL.
+# skip is only honoured without a cursor, for old clients: it offsets the
+# first page, later pages follow the cursor
+def paginate(
+    query,
+    keys: Sequence,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    descending: bool = True,
+    skip: int = 0,
+) -> Page:
+    query = _keyset(query, keys, cursor, limit, descending, skip)
+    return _page(query.all(), keys, limit)
+
+
+# paginate for a select() run on an AsyncSession
+async def paginate_async(
+    db: AsyncSession,
+    statement,
+    keys: Sequence,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    descending: bool = True,
+    skip: int = 0,
+) -> Page:
+    statement = _keyset(statement, keys, cursor, limit, descending, skip)
+    result = await db.execute(statement)
+    return _page(result.all(), keys, limit)
+
+
+# Query and Select share this part of their API
+def _keyset(query, keys, cursor, limit, descending, skip):
+    for key in keys:
+        if getattr(key.expression, "nullable", False):
+            raise ValueError(
+                f"sort key {key} is nullable, its NULL rows would be skipped"
+            )
+
+    labelled = [key.label(f"_page_key_{i}") for i, key in enumerate(keys)]
+    query = query.add_columns(*labelled)
+
+    if cursor:
+        row, last = tuple_(*keys), tuple_(*decode_cursor(cursor, keys))
+        query = query.filter(row < last if descending else row > last)
+
+    query = query.order_by(*[key.desc() if descending else key.asc() for key in keys])
+    if skip and not cursor:
+        query = query.offset(skip)
+
+    return query.limit(limit + 1)
+
+
+def _page(rows, keys, limit: int) -> Page:
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][-len(keys) :])
+
+    return Page(items=[row[0] for row in rows], next_cursor=next_cursor)
+
+
+# expose a page's cursor on the response and hand back its items
+def page_response(response: Response, page: Page) -> List[Any]:
+    if page.next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
+    return page.items
@@ -2,15 +2,11 @@ from slowapi import Limiter
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from fastapi import Request, HTTPException, status
-import redis
 from typing import Callable
 import asyncio
 
 from app.core.config import settings
 
-# initialize redis connection for rate limiting
-redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
-
 # limiter = Limiter(
 #     key_func=get_remote_address,
 #     storage_uri=settings.REDIS_URL,
@@ -3,7 +3,8 @@ from typing import Any, Union, Optional
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
 from app.models.user import User
@@ -66,13 +67,13 @@ def verify_token(token: str) -> Optional[str]:
 
 
 # authenticate user with email/phone and password
-def authenticate_user(
-    db: Session, email_or_phone: str, password: str
+async def authenticate_user(
+    db: AsyncSession, email_or_phone: str, password: str
 ) -> Optional[User]:
-    user = (
-        db.query(User)
-        .filter((User.email == email_or_phone) | (User.phone == email_or_phone))
-        .first()
+    user = await db.scalar(
+        select(User).where(
+            (User.email == email_or_phone) | (User.phone == email_or_phone)
+        )
     )
 
     if not user:
@@ -1,22 +1,29 @@
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+from datetime import datetime, timezone
 import sentry_sdk
 from sentry_sdk.integrations.sqlalchemy import SqlalchemyIntegration
 from sqlalchemy import func
 
 from app.core.config import settings
-from app.core.database import engine, Base
+from app.core.database import async_engine, engine, replicas, write_pins, Base
+from app.core.pagination import NEXT_CURSOR_HEADER
 from app.core.logging import setup_logging, LoggerMiddleware, get_logger
 from app.core.exceptions import global_exception_handler
 from app.core.rate_limiter import limiter, rate_limit_exceeded_handler
 from app.routers import auth, users, providers, services, bookings, reviews, admin
+from app.routers.providers import LOCATION_UNRESOLVED_HEADER
+from app.services.cache import cache
 from slowapi.errors import RateLimitExceeded
 
 # setup logging
 setup_logging()
 logger = get_logger("main")
 
+# read-your-writes pins are seen by every worker through the cache
+write_pins.shared = cache
+
 # setup sentry for error monitoring
 sentry_sdk.init(
     dsn=settings.SENTRY_DSN,
@@ -29,21 +36,48 @@ sentry_sdk.init(
 async def lifespan(app: FastAPI):
     # startup
     logger.info("Starting HomeHero API", environment=settings.ENVIRONMENT)
+    logger.info("Database pool", **settings.database_pool())
     Base.metadata.create_all(bind=engine)
 
     try:
-        from app.services.cache import cache
-
-        cache.set("health_check", "ok", ttl=60)
+        if not await cache.ping():
+            raise ConnectionError(f"no reply within {settings.REDIS_SOCKET_TIMEOUT}s")
+        await cache.set("health_check", "ok", ttl=60)
         logger.info("Redis connection successful")
 
     except Exception as e:
         logger.warning("⚠️ Redis connection failed", error=str(e))
 
+    # L1 serves once subscribed to invalidations, and retries if Redis is down
+    cache.start_listener()
+
+    # replicas take reads once a lag check has passed
+    replicas.start_checks()
+
+    if settings.SPATIAL_INDEX_PATH:
+        try:
+            from app.core.database import SessionLocal
+            from app.services.spatial_index import provider_index
+
+            db = SessionLocal()
+            try:
+                provider_index.load_or_build(db)
+            finally:
+                db.close()
+            logger.info("Provider spatial index ready", providers=len(provider_index))
+
+        except Exception as e:
+            logger.warning("⚠️ Provider spatial index unavailable", error=str(e))
+
     yield
+
     # Shutdown
     logger.info("Shutting down HomeHero API")
 
+    await cache.close()
+    await replicas.close()
+    await async_engine.dispose()
+
 
 app = FastAPI(
     title="HomeHero API",
@@ -71,7 +105,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "PATCH"],
     allow_headers=["*"],
-    expose_headers=["X-RateLimit-Limit", "X-RateLimit-Remaining", "X-RateLimit-Reset"],
+    expose_headers=[
+        "X-RateLimit-Limit",
+        "X-RateLimit-Remaining",
+        "X-RateLimit-Reset",
+        NEXT_CURSOR_HEADER,
+        LOCATION_UNRESOLVED_HEADER,
+        "Retry-After",
+    ],
 )
 
 # routes
@@ -111,18 +152,22 @@ async def health_check():
         "status": "healthy",
         "environment": settings.ENVIRONMENT,
         "version": "2.0.0",
-        "timestamp": func.now(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
         "services": {},
     }
 
     # Check Redis
-    # try:
-    #     from app.services.cache import cache
-    #     cache.set("health_check", "ok", ttl=10)
-    #     cached_value = cache.get("health_check")
-    #     health_status["services"]["redis"] = "healthy" if cached_value == "ok" else "unhealthy"
-    # except:
-    #     health_status["services"]["redis"] = "unhealthy"
+    # while the circuit is open the cache is bypassed and Redis isn't pinged
+    if cache.bypassing:
+        health_status["services"]["redis"] = "bypassed"
+    else:
+        health_status["services"]["redis"] = (
+            "healthy" if await cache.ping() else "unhealthy"
+        )
+    health_status["redis_circuit"] = {
+        **cache.breaker.snapshot(),
+        "bypassed_calls": cache.stats["bypassed"],
+    }
 
     # Check external services
     health_status["services"]["cloudinary"] = (
@@ -132,3 +177,21 @@ async def health_check():
     health_status["services"]["notifications"] = (
         "configured" if settings.TWILIO_ACCOUNT_SID else "not_configured"
     )
+
+    from app.services.geolocation import geo_service
+
+    health_status["geocoding"] = dict(geo_service.stats)
+
+    from app.core.decorators import cache_stats
+
+    health_status["cache"] = cache_stats.snapshot()
+    health_status["cache_tiers"] = cache.local.snapshot()
+
+    from app.core.database import pool_metrics
+
+    health_status["database_pool"] = {
+        name: metrics.snapshot() for name, metrics in pool_metrics.items()
+    }
+    health_status["database_replicas"] = replicas.snapshot()
+
+    return health_status
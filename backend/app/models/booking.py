@@ -6,6 +6,7 @@ from sqlalchemy import (
     Enum as SQLEnum,
     ForeignKey,
     Float,
+    Index,
 )
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
@@ -51,3 +52,13 @@ class Booking(Base):
     # Relationships
     customer = relationship("User", foreign_keys=[customer_id])
     provider = relationship("Provider", foreign_keys=[provider_id])
+
+    __table_args__ = (
+        # keyset pagination of a customer's or provider's bookings
+        Index("ix_bookings_customer_date", "customer_id", "date_time", "booking_id"),
+        Index("ix_bookings_provider_date", "provider_id", "date_time", "booking_id"),
+        # a provider's bookings in one status, e.g. /provider/pending
+        Index("ix_bookings_provider_status_date", "provider_id", "status", "date_time"),
+        Index("ix_bookings_status_date", "status", "date_time"),
+        Index("ix_bookings_date_time", "date_time"),
+    )
@@ -6,6 +6,7 @@ from sqlalchemy import (
     Integer,
     ForeignKey,
     DateTime,
+    Index,
 )
 from sqlalchemy.dialects.postgresql import UUID, ARRAY
 from sqlalchemy.sql import func
@@ -14,6 +15,8 @@ import uuid
 
 from app.core.database import Base
 
+DEFAULT_SERVICE_RADIUS_KM = 10.0
+
 
 class Provider(Base):
     __tablename__ = "providers"
@@ -27,12 +30,32 @@ class Provider(Base):
     availability = Column(Boolean, default=True)
     rating = Column(Float, default=0.0)
     rating_count = Column(Integer, default=0)
+    rating_score = Column(Float)  # bayesian smoothed rating, see services/ranking
     documents = Column(ARRAY(String), default=[])
     approved = Column(Boolean, default=False)
     experience_years = Column(Integer, default=0)
-    service_radius = Column(Float, default=10.0)  # km
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    service_radius = Column(Float, default=DEFAULT_SERVICE_RADIUS_KM)  # km
+    latitude = Column(Float)  # copied from the owning user's location
+    longitude = Column(Float)
+    # bounding box of the service_radius circle, kept in sync on write
+    coverage_min_lat = Column(Float)
+    coverage_max_lat = Column(Float)
+    coverage_min_lng = Column(Float)
+    coverage_max_lng = Column(Float)
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Relationships
     user = relationship("User", backref="provider_profile")
+
+    __table_args__ = (
+        Index("ix_providers_created_at_id", "created_at", "provider_id"),
+        Index(
+            "ix_providers_services",
+            "services",
+            postgresql_using="gin",
+            postgresql_where=approved == True,
+        ),
+    )
@@ -0,0 +1,93 @@
+from sqlalchemy import (
+    DDL,
+    Column,
+    String,
+    Float,
+    Boolean,
+    Integer,
+    ForeignKey,
+    DateTime,
+    Index,
+    event,
+)
+from sqlalchemy.dialects.postgresql import UUID, ARRAY, JSONB, TSVECTOR
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+# one row per approved provider with everything search filters, sorts and
+# returns, written by app.services.search_docs alongside the source rows
+class ProviderSearchDoc(Base):
+    __tablename__ = "provider_search_docs"
+
+    provider_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("providers.provider_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+    name = Column(String)
+    location = Column(String)
+    location_normalized = Column(String)  # see models.user.normalize_location
+    latitude = Column(Float)
+    longitude = Column(Float)
+    service_radius = Column(Float)
+    coverage_min_lat = Column(Float)
+    coverage_max_lat = Column(Float)
+    coverage_min_lng = Column(Float)
+    coverage_max_lng = Column(Float)
+    services = Column(ARRAY(String), default=[])
+    pricing = Column(Float)
+    rating = Column(Float)
+    rating_count = Column(Integer)
+    rating_score = Column(Float)
+    experience_years = Column(Integer)
+    availability = Column(Boolean)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    # name and services, then category keywords, then location
+    search_vector = Column(TSVECTOR)
+    # the ProviderWithUser response, served as is
+    document = Column(JSONB, nullable=False)
+    synced_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_search_docs_created_at_id", "created_at", "provider_id"),
+        Index("ix_search_docs_lat_lng", "latitude", "longitude"),
+        Index("ix_search_docs_services", "services", postgresql_using="gin"),
+        Index("ix_search_docs_vector", "search_vector", postgresql_using="gin"),
+        Index(
+            "ix_search_docs_location_trgm",
+            "location_normalized",
+            postgresql_using="gin",
+            postgresql_ops={"location_normalized": "gin_trgm_ops"},
+        ),
+        # match the rating and price sorts so top-k reads stop early
+        Index(
+            "ix_search_docs_rating_score",
+            "availability",
+            rating_score.desc().nulls_last(),
+            "provider_id",
+        ),
+        Index("ix_search_docs_pricing", "availability", "pricing", "provider_id"),
+        Index("ix_search_docs_rating", "availability", "rating"),
+    )
+
+
+# box a provider covers, as an expression Postgres can index with GiST
+def coverage_box():
+    return func.box(
+        func.point(ProviderSearchDoc.coverage_min_lng, ProviderSearchDoc.coverage_min_lat),
+        func.point(ProviderSearchDoc.coverage_max_lng, ProviderSearchDoc.coverage_max_lat),
+    )
+
+
+Index("ix_search_docs_coverage_box", coverage_box(), postgresql_using="gist")
+
+
+# create_all needs pg_trgm before it can build ix_search_docs_location_trgm
+event.listen(
+    ProviderSearchDoc.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
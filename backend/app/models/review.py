@@ -1,4 +1,4 @@
-from sqlalchemy import Column, DateTime, String, Float, Text, ForeignKey
+from sqlalchemy import Column, DateTime, String, Float, Text, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID, ARRAY
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -24,9 +24,16 @@ class Review(Base):
     rating = Column(Float, nullable=False)
     comment = Column(Text)
     images = Column(ARRAY(String), default=[])
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
 
     # Relationships
     booking = relationship("Booking")
     customer = relationship("User", foreign_keys=[customer_id])
     provider = relationship("Provider", foreign_keys=[provider_id])
+
+    __table_args__ = (
+        Index("ix_reviews_provider_created", "provider_id", "created_at", "review_id"),
+        Index("ix_reviews_customer_id", "customer_id"),
+    )
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, Text, Boolean, DateTime
-from sqlalchemy.dialects.postgresql import UUID, ARRAY
+from sqlalchemy import Column, String, Text, Boolean, DateTime, Index, event
+from sqlalchemy.dialects.postgresql import UUID, ARRAY, TSVECTOR
 from sqlalchemy.sql import func
 import uuid
 
@@ -14,4 +14,27 @@ class ServiceCategory(Base):
     description = Column(Text)
     keywords = Column(ARRAY(String), default=[])  # For AI matching
     active = Column(Boolean, default=True)
+    # weighted name, keywords and description, set on every write
+    search_vector = Column(TSVECTOR)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_service_categories_search", "search_vector", postgresql_using="gin"),
+    )
+
+
+# name outranks keywords, which outrank the description
+def search_vector_expression(name, description, keywords):
+    return (
+        func.setweight(func.to_tsvector("english", name or ""), "A")
+        .op("||")(func.setweight(func.to_tsvector("english", " ".join(keywords or [])), "B"))
+        .op("||")(func.setweight(func.to_tsvector("english", description or ""), "C"))
+    )
+
+
+@event.listens_for(ServiceCategory, "before_insert")
+@event.listens_for(ServiceCategory, "before_update")
+def _set_search_vector(mapper, connection, category):
+    category.search_vector = search_vector_expression(
+        category.name, category.description, category.keywords
+    )
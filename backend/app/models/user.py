@@ -1,7 +1,16 @@
-from sqlalchemy import Column, String, DateTime, Enum as SQLEnum, Boolean
+from sqlalchemy import (
+    Column,
+    String,
+    DateTime,
+    Enum as SQLEnum,
+    Boolean,
+    Float,
+    Index,
+)
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from enum import Enum
+import re
 import uuid
 
 from app.core.database import Base
@@ -24,7 +33,19 @@ class User(Base):
     user_type = Column(SQLEnum(UserType), nullable=False)
     location = Column(String)
     pincode = Column(String)
+    latitude = Column(Float)  # geocoded from location/pincode
+    longitude = Column(Float)
     is_active = Column(Boolean, default=True, nullable=False)
     is_verified = Column(Boolean, default=False, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    __table_args__ = (Index("ix_users_created_at_id", "created_at", "id"),)
+
+
+# lowercase a location and collapse punctuation to single spaces, applied to
+# both stored search locations and search terms
+def normalize_location(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", text.lower()).strip()
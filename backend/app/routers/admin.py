@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
-from app.core.database import get_db
+from app.core.database import get_async_db, get_read_db
+from app.core.pagination import SKIP_DESCRIPTION, page_response
 from app.core.dependencies import get_current_user
 from app.schemas.user import UserResponse
 from app.schemas.provider import ProviderResponse
@@ -32,46 +34,54 @@ def verify_admin(current_user: User = Depends(get_current_user)):
 async def approve_provider(
     provider_id: str,
     current_user: User = Depends(verify_admin),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    ProviderController.approve_provider(db, provider_id)
+    await ProviderController.approve_provider(db, provider_id)
     return {"message": "provider approved"}
 
 
 # view all bookings admin only
 @router.get("/bookings", response_model=List[BookingResponse])
 async def get_all_bookings(
-    current_user: User = Depends(verify_admin), db: Session = Depends(get_db)
+    current_user: User = Depends(verify_admin), db: AsyncSession = Depends(get_read_db)
 ):
-    return db.query(Booking).all()
+    result = await db.execute(select(Booking))
+    return result.scalars().all()
 
 
 # view all users admin only
 @router.get("/users", response_model=List[UserResponse])
 async def get_all_users(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    skip: int = Query(0, ge=0, description=SKIP_DESCRIPTION),
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Cursor from X-Next-Cursor"),
     current_user: User = Depends(verify_admin),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    return UserController.get_users(db, skip, limit)
+    return page_response(
+        response, await UserController.get_users(db, skip, limit, cursor)
+    )
 
 
 # view all providers admin only
 @router.get("/providers", response_model=List[ProviderResponse])
 async def get_all_providers(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    skip: int = Query(0, ge=0, description=SKIP_DESCRIPTION),
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Cursor from X-Next-Cursor"),
     current_user: User = Depends(verify_admin),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    return db.query(Provider).offset(skip).limit(limit).all()
+    page = await ProviderController.get_providers(db, skip, limit, cursor)
+    return page_response(response, page)
 
 
 # view all complaints
 @router.get("/complaints", response_model=List[dict])
 async def get_complaints(
-    current_user: User = Depends(verify_admin), db: Session = Depends(get_db)
+    current_user: User = Depends(verify_admin), db: AsyncSession = Depends(get_read_db)
 ):
     # TODO: Implement complaints system
     return {"message": "No complaints found"}
@@ -2,11 +2,12 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from jose import JWTError
 import jwt
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from datetime import timedelta
 
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.schemas.user import UserCreate, UserResponse
 from app.controllers.user import UserController
 from app.models.user import User
@@ -44,9 +45,11 @@ class OTPVerification(BaseModel):
 
 # register a new user (customer or provider)
 @router.post("/register", response_model=dict)
-async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register_user(
+    user_data: UserCreate, db: AsyncSession = Depends(get_async_db)
+):
     try:
-        user = UserController.create_user(db, user_data)
+        user = await UserController.create_user(db, user_data)
         return {"message": "Registered successfully", "user_id": str(user.id)}
 
     except HTTPException as e:
@@ -61,8 +64,10 @@ async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
 
 # Authenticate user and return JWT tokens
 @router.post("/login", response_model=Token)
-async def login_user(login_data: LoginRequest, db: Session = Depends(get_db)):
-    user = authenticate_user(db, login_data.email_or_phone, login_data.password)
+async def login_user(
+    login_data: LoginRequest, db: AsyncSession = Depends(get_async_db)
+):
+    user = await authenticate_user(db, login_data.email_or_phone, login_data.password)
 
     if not user:
         raise HTTPException(
@@ -92,7 +97,7 @@ async def login_user(login_data: LoginRequest, db: Session = Depends(get_db)):
 # Refresh access token using refresh token
 @router.post("/refresh", response_model=Token)
 async def refresh_access_token(
-    refresh_data: RefreshTokenRequest, db: Session = Depends(get_db)
+    refresh_data: RefreshTokenRequest, db: AsyncSession = Depends(get_async_db)
 ):
     try:
         payload = jwt.decode(
@@ -108,7 +113,7 @@ async def refresh_access_token(
                 status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token"
             )
 
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await db.scalar(select(User).where(User.id == user_id))
         if not user or not user.is_active:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -135,15 +140,17 @@ async def refresh_access_token(
 
 # Verify OTP for phone authentication
 @router.post("/verify-otp", response_model=dict)
-async def verify_otp(otp_data: OTPVerification, db: Session = Depends(get_db)):
+async def verify_otp(
+    otp_data: OTPVerification, db: AsyncSession = Depends(get_async_db)
+):
     # TODO: Implement actual OTP verification with Twilio
     # For now, accept 123456 as valid OTP
     if otp_data.otp == "123456":
         # Mark user as verified
-        user = db.query(User).filter(User.phone == otp_data.phone).first()
+        user = await db.scalar(select(User).where(User.phone == otp_data.phone))
         if user:
             user.is_verified = True
-            db.commit()
+            await db.commit()
         return {"message": "OTP verified"}
     else:
         raise HTTPException(
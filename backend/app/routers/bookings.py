@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
-from app.core.database import get_db
+from app.core.database import get_async_db, get_read_db
+from app.core.pagination import page_response
 from app.core.dependencies import (
     get_current_user,
     get_current_customer,
@@ -29,22 +30,36 @@ router = APIRouter()
 async def create_booking(
     booking_data: BookingCreate,
     current_user: User = Depends(get_current_customer),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    booking = BookingController.create_booking(db, booking_data, str(current_user.id))
+    booking = await BookingController.create_booking(
+        db, booking_data, str(current_user.id)
+    )
     return {"message": "Booking confirmed", "booking_id": str(booking.booking_id)}
 
 
 # get current user bookings
 @router.get("/my-bookings", response_model=List[BookingResponse])
 async def get_my_bookings(
-    current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Cursor from X-Next-Cursor"),
+    limit: int = Query(100, ge=1, le=100),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
 ):
     if current_user.user_type == "customer":
-        return BookingController.get_customer_bookings(db, str(current_user.id))
+        page = await BookingController.get_customer_bookings(
+            db, str(current_user.id), limit, cursor
+        )
     else:
-        provider = ProviderController.get_provider_by_user(db, str(current_user.id))
-        return BookingController.get_provider_bookings(db, str(provider.provider_id))
+        provider = await ProviderController.get_provider_by_user(
+            db, str(current_user.id)
+        )
+        page = await BookingController.get_provider_bookings(
+            db, str(provider.provider_id), limit, cursor
+        )
+
+    return page_response(response, page)
 
 
 # get booking status
@@ -52,9 +67,9 @@ async def get_my_bookings(
 async def get_booking_status(
     booking_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    booking = BookingController.get_booking(db, booking_id)
+    booking = await BookingController.get_booking(db, booking_id)
 
     # verify user has access to this booking
     if (
@@ -62,7 +77,9 @@ async def get_booking_status(
         and current_user.user_type != "admin"
     ):
         if current_user.user_type == "provider":
-            provider = ProviderController.get_provider_by_user(db, str(current_user.id))
+            provider = await ProviderController.get_provider_by_user(
+                db, str(current_user.id)
+            )
             if str(provider.provider_id) != str(booking.provider_id):
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN, detail="Access denied"
@@ -80,9 +97,9 @@ async def get_booking_status(
 async def get_booking(
     booking_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    booking = BookingController.get_booking(db, booking_id)
+    booking = await BookingController.get_booking(db, booking_id)
 
     # verify acess
     if (
@@ -90,7 +107,9 @@ async def get_booking(
         and current_user.user_type != "admin"
     ):
         if current_user.user_type == "provider":
-            provider = ProviderController.get_provider_by_user(db, str(current_user.id))
+            provider = await ProviderController.get_provider_by_user(
+                db, str(current_user.id)
+            )
             if str(provider.provider_id) != str(booking.provider_id):
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN, detail="Access denied"
@@ -108,7 +127,7 @@ async def get_booking(
 async def request_callback(
     callback_data: CallbackRequest,
     current_user: User = Depends(get_current_customer),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     # TODO: Implement callback request logic (e.g., send notification)
     return {"message": "Callback request sent"}
@@ -117,10 +136,11 @@ async def request_callback(
 # get pending bookings for current provider
 @router.get("/provider/pending", response_model=List[BookingResponse])
 async def get_pending_bookings(
-    current_user: User = Depends(get_current_provider), db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_provider),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    provider = ProviderController.get_provider_by_user(db, str(current_user.id))
-    return BookingController.get_pending_bookings(db, str(provider.provider_id))
+    provider = await ProviderController.get_provider_by_user(db, str(current_user.id))
+    return await BookingController.get_pending_bookings(db, str(provider.provider_id))
 
 
 # accept or decline booking request
@@ -129,10 +149,10 @@ async def respond_to_booking(
     booking_id: str,
     status_data: BookingStatusUpdate,
     current_user: User = Depends(get_current_provider),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    booking = BookingController.get_booking(db, booking_id)
-    provider = ProviderController.get_provider_by_user(db, str(current_user.id))
+    booking = await BookingController.get_booking(db, booking_id)
+    provider = await ProviderController.get_provider_by_user(db, str(current_user.id))
 
     # verify if booking belongs to current provider
     if str(booking.provider_id) != str(provider.provider_id):
@@ -147,7 +167,7 @@ async def respond_to_booking(
             detail="Invalid status. Only 'accepted' or 'declined' allowed",
         )
 
-    BookingController.update_booking_status(db, booking_id, status_data.status)
+    await BookingController.update_booking_status(db, booking_id, status_data.status)
     return {"message": "Booking updated"}
 
 
@@ -158,10 +178,10 @@ async def cancel_booking(
     booking_id: str,
     cancellation: BookingCancellation,
     current_user: User = Depends(get_current_customer),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     try:
-        booking = BookingController.cancel_booking(
+        booking = await BookingController.cancel_booking(
             db=db,
             booking_id=booking_id,
             user_id=str(current_user.id),
@@ -192,10 +212,10 @@ async def reshedule_booking(
     booking_id: str,
     reschedule_data: BookingReshedule,
     current_user: User = Depends(get_current_customer),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     try:
-        booking = BookingController.reschedule_booking(
+        booking = await BookingController.reschedule_booking(
             db=db,
             booking_id=booking_id,
             customer_id=str(current_user.id),
@@ -224,9 +244,9 @@ async def reshedule_booking(
 async def check_cancellation_allowed(
     booking_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    booking = BookingController.get_booking(db, booking_id)
+    booking = await BookingController.get_booking(db, booking_id)
 
     # Verify access
     if (
@@ -234,7 +254,9 @@ async def check_cancellation_allowed(
         and current_user.user_type != "admin"
     ):
         if current_user.user_type == "provider":
-            provider = ProviderController.get_provider_by_user(db, str(current_user.id))
+            provider = await ProviderController.get_provider_by_user(
+                db, str(current_user.id)
+            )
             if str(provider.provider_id) != str(booking.provider_id):
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN, detail="Access denied"
@@ -266,10 +288,10 @@ async def provider_cancel_booking(
     booking_id: str,
     cancellation: BookingCancellation,
     current_user: User = Depends(get_current_provider),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     try:
-        booking = BookingController.cancel_booking(
+        booking = await BookingController.cancel_booking(
             db=db,
             booking_id=booking_id,
             user_id=str(current_user.id),
@@ -298,11 +320,11 @@ async def complete_booking(
     request: Request,
     booking_id: str,
     current_user: User = Depends(get_current_provider),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Mark booking as completed (Provider only)"""
-    booking = BookingController.get_booking(db, booking_id)
-    provider = ProviderController.get_provider_by_user(db, str(current_user.id))
+    booking = await BookingController.get_booking(db, booking_id)
+    provider = await ProviderController.get_provider_by_user(db, str(current_user.id))
 
     # Verify this booking belongs to current provider
     if str(booking.provider_id) != str(provider.provider_id):
@@ -317,7 +339,9 @@ async def complete_booking(
             detail=f"Cannot complete booking with status: {booking.status}. Must be accepted first.",
         )
 
-    BookingController.update_booking_status(db, booking_id, BookingStatus.COMPLETED)
+    await BookingController.update_booking_status(
+        db, booking_id, BookingStatus.COMPLETED
+    )
 
     return {
         "message": "Booking marked as completed",
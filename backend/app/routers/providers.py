@@ -5,14 +5,19 @@ from fastapi import (
     Request,
     status,
     Query,
+    Response,
     UploadFile,
     File,
 )
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
+import math
 
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import get_async_db, get_read_db
+from app.core.pagination import SKIP_DESCRIPTION, page_response
 from app.core.dependencies import get_current_user, get_current_provider
+from app.core.exceptions import LocationUnresolvedError
 from app.core.rate_limiter import limiter, CustomRateLimits
 from app.core.logging import get_logger
 from app.schemas.provider import (
@@ -30,18 +35,24 @@ from app.services.ai_helper import AIHelper
 from app.services.file_upload import FileUploadService
 from app.services.cache import cache
 
-
 router = APIRouter()
 file_service = FileUploadService()
 logger = get_logger("providers")
 
+# set on a search whose location couldn't be placed yet, retry in a moment
+LOCATION_UNRESOLVED_HEADER = "X-Location-Unresolved"
+
 
 # enhanced provider search with geolocation, filtering and sorting
 @router.get("/search", response_model=List[ProviderWithUser])
 @limiter.limit(CustomRateLimits.search_endpoints())
 async def enhanced_provider_search(
     request: Request,
+    response: Response,
     service: Optional[str] = Query(None, description="Service type to filter by"),
+    q: Optional[str] = Query(
+        None, description="Free text describing the job, e.g. leaking geyser"
+    ),
     location: Optional[str] = Query(None, description="Location to search near"),
     max_distance: Optional[float] = Query(
         25.0, ge=1, le=100, description="Maximum distance in km"
@@ -49,10 +60,14 @@ async def enhanced_provider_search(
     min_rating: Optional[float] = Query(None, ge=0, le=5, description="Minimum rating"),
     max_price: Optional[float] = Query(None, ge=0, description="Maximum price"),
     available_only: bool = Query(True, description="Show only available providers"),
-    sort_by: str = Query("distance", description="Sort by: distance, rating, price"),
+    sort_by: str = Query(
+        "distance",
+        pattern="^(distance|rating|price|relevance)$",
+        description="Sort by: distance, rating, price, relevance",
+    ),
     skip: int = Query(0, ge=0, description="Number of records to skip"),
     limit: int = Query(20, ge=1, le=100, description="Number of records to return"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     try:
         providers = await ProviderController.search_providers_with_location(
@@ -64,6 +79,9 @@ async def enhanced_provider_search(
             available_only=available_only,
             skip=skip,
             limit=limit,
+            query_text=q,
+            sort_by=sort_by,
+            max_price=max_price,
         )
 
         # Handle None return value
@@ -76,18 +94,15 @@ async def enhanced_provider_search(
             logger.warning(f"Provider search returned unexpected type: {type(providers)}")
             return []
 
-        if max_price:
-            providers = [p for p in providers if p.pricing and p.pricing <= max_price]
-
-        if sort_by == "rating":
-            providers.sort(key=lambda x: x.rating or 0, reverse=True)
-        elif sort_by == "price":
-            providers.sort(key=lambda x: x.pricing or float('inf'))
-        elif sort_by == "distance" and location:
-            providers.sort(key=lambda x: getattr(x, "distance_km", float("inf")))
-
         return providers
 
+    except LocationUnresolvedError:
+        response.headers[LOCATION_UNRESOLVED_HEADER] = "1"
+        response.headers["Retry-After"] = str(
+            math.ceil(settings.GEOCODE_SEARCH_WAIT_SECONDS)
+        )
+        return []
+
     except Exception as e:
         logger.error("Provider search failed", error=str(e))
         # Return empty list instead of raising exception
@@ -101,7 +116,7 @@ async def upload_provider_portfolio(
     request: Request,
     files: List[UploadFile] = File(...),
     current_user: User = Depends(get_current_provider),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     try:
         # upload multiple images
@@ -110,14 +125,16 @@ async def upload_provider_portfolio(
         )
 
         # update provider with portfolio urls
-        provider = ProviderController.get_provider_by_user(db, str(current_user.id))
+        provider = await ProviderController.get_provider_by_user(
+            db, str(current_user.id)
+        )
         portfolio_urls = [file["url"] for file in uploaded_files]
 
         # Add existing portfolio
         existing_portfolio = provider.documents or []
         updated_portfolio = existing_portfolio + portfolio_urls
 
-        ProviderController.update_provider(
+        await ProviderController.update_provider(
             db, str(provider.provider_id), ProviderUpdate(documents=updated_portfolio)
         )
 
@@ -139,7 +156,7 @@ async def upload_provider_portfolio(
 async def create_provider_profile(
     provider_data: ProviderCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     if current_user.user_type != "provider":
         raise HTTPException(
@@ -147,33 +164,38 @@ async def create_provider_profile(
             detail="Only provider accounts can create provider profiles",
         )
 
-    return ProviderController.create_provider(db, provider_data, str(current_user.id))
+    return await ProviderController.create_provider(
+        db, provider_data, str(current_user.id)
+    )
 
 
 # Search providers by service and location
 @router.get("/", response_model=List[ProviderWithUser])
 async def search_providers(
+    response: Response,
     service: Optional[str] = Query(None, description="Service type to filter by"),
     location: Optional[str] = Query(None, description="Location to filter by"),
     min_rating: Optional[float] = Query(None, ge=0, le=5, description="Minimum rating"),
     available_only: bool = Query(True, description="Show only available providers"),
-    skip: int = Query(0, ge=0, description="Number of records to skip"),
+    skip: int = Query(0, ge=0, description=SKIP_DESCRIPTION),
     limit: int = Query(100, ge=1, le=100, description="Number of records to return"),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="Cursor from X-Next-Cursor"),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    providers = ProviderController.search_provider(
-        db, service, location, min_rating, available_only, skip, limit
+    page = await ProviderController.search_provider(
+        db, service, location, min_rating, available_only, skip, limit, cursor
     )
 
-    return providers
+    return page_response(response, page)
 
 
 # current user's provider profile
 @router.get("/me", response_model=ProviderResponse)
 async def get_my_provider_profile(
-    current_user: User = Depends(get_current_provider), db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_provider),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    return ProviderController.get_provider_by_user(db, str(current_user.id))
+    return await ProviderController.get_provider_by_user(db, str(current_user.id))
 
 
 # Update current user's provider profile
@@ -181,18 +203,20 @@ async def get_my_provider_profile(
 async def update_my_provider_profile(
     provider_data: ProviderUpdate,
     current_user: User = Depends(get_current_provider),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    provider = ProviderController.get_provider_by_user(db, str(current_user.id))
-    return ProviderController.update_provider(
+    provider = await ProviderController.get_provider_by_user(db, str(current_user.id))
+    return await ProviderController.update_provider(
         db, str(provider.provider_id), provider_data
     )
 
 
 # get provider profile using id
 @router.get("/{provider_id}", response_model=ProviderWithUser)
-async def get_provider_profile(provider_id: str, db: Session = Depends(get_db)):
-    return ProviderController.get_provider(db, provider_id)
+async def get_provider_profile(
+    provider_id: str, db: AsyncSession = Depends(get_read_db)
+):
+    return await ProviderController.get_provider(db, provider_id)
 
 
 # update service pricing
@@ -200,10 +224,10 @@ async def get_provider_profile(provider_id: str, db: Session = Depends(get_db)):
 async def update_pricing(
     pricing_data: PricingUpdate,
     current_user: User = Depends(get_current_provider),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    provider = ProviderController.get_provider_by_user(db, str(current_user.id))
-    ProviderController.update_provider(
+    provider = await ProviderController.get_provider_by_user(db, str(current_user.id))
+    await ProviderController.update_provider(
         db, str(provider.provider_id), ProviderUpdate(pricing=pricing_data.pricing)
     )
     return {"message": "Pricing updated"}
@@ -214,10 +238,10 @@ async def update_pricing(
 async def update_availability(
     availability_data: AvailabilityUpdate,
     current_user: User = Depends(get_current_provider),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    provider = ProviderController.get_provider_by_user(db, str(current_user.id))
-    ProviderController.update_provider(
+    provider = await ProviderController.get_provider_by_user(db, str(current_user.id))
+    await ProviderController.update_provider(
         db,
         str(provider.provider_id),
         ProviderUpdate(availability=availability_data.available),
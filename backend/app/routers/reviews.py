@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
-from app.core.database import get_db
+from app.core.database import get_async_db, get_read_db
+from app.core.pagination import SKIP_DESCRIPTION, page_response
 from app.core.dependencies import get_current_user, get_current_customer
 from app.schemas.review import ReviewResponse, ReviewCreate, ReviewWithCustomer
 from app.controllers.review import ReviewController
@@ -16,16 +17,26 @@ router = APIRouter()
 async def current_review(
     review_data: ReviewCreate,
     current_user: User = Depends(get_current_customer),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    ReviewController.create_review(db, review_data, str(current_user.id))
+    await ReviewController.create_review(db, review_data, str(current_user.id))
     return {"message": "Review submitted"}
 
 
 # get all reviews for a provider
 @router.get("/provider/{provider_id}", response_model=List[ReviewWithCustomer])
-async def get_provider_reviews(provider_id: str, db: Session = Depends(get_db)):
-    return ReviewController.get_provider_reviews(db, provider_id)
+async def get_provider_reviews(
+    provider_id: str,
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Cursor from X-Next-Cursor"),
+    limit: int = Query(100, ge=1, le=100),
+    skip: int = Query(0, ge=0, description=SKIP_DESCRIPTION),
+    db: AsyncSession = Depends(get_read_db),
+):
+    page = await ReviewController.get_provider_reviews(
+        db, provider_id, limit, cursor, skip
+    )
+    return page_response(response, page)
 
 
 # get review by id
@@ -33,6 +44,6 @@ async def get_provider_reviews(provider_id: str, db: Session = Depends(get_db)):
 async def get_review(
     review_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    return ReviewController.get_review(db, review_id)
+    return await ReviewController.get_review(db, review_id)
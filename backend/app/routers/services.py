@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from app.core.database import get_db
+from app.core.database import get_read_db
+from app.controllers.service import ServiceController
 from app.services.ai_helper import AIHelper
 
 router = APIRouter()
@@ -21,6 +22,16 @@ async def get_service_categories():
     return AIHelper.get_popular_services()
 
 
+# rank service categories against free text
+@router.get("/search", response_model=List[dict])
+async def search_service_categories(
+    q: str = Query(..., min_length=2, description="Describe the job"),
+    limit: int = Query(5, ge=1, le=20),
+    db: AsyncSession = Depends(get_read_db),
+):
+    return await ServiceController.search_categories(db, q, limit)
+
+
 # get service suggestions based on query
 router.get("/suggest/{query}")
 
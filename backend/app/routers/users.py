@@ -1,8 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Request
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 
-from app.core.database import get_db
+from app.core.database import get_async_db, get_read_db
 from app.core.dependencies import get_current_user
 from app.core.rate_limiter import limiter
 from app.schemas.user import UserResponse, UserUpdate, LocationUpdate
@@ -31,9 +31,9 @@ async def update_current_user(
     request: Request,
     user_data: UserUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    return UserController.update_user(db, str(current_user.id), user_data)
+    return await UserController.update_user(db, str(current_user.id), user_data)
 
 
 # upload user pfp
@@ -43,7 +43,7 @@ async def upload_user_avatar(
     request: Request,
     avatar: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     try:
         # upload to cloudinary
@@ -51,7 +51,7 @@ async def upload_user_avatar(
 
         # upload user profile with avatar url
         user_update = UserUpdate(avatar_url=result["url"])
-        UserController.update_user(db, str(current_user.id), user_update)
+        await UserController.update_user(db, str(current_user.id), user_update)
 
         return {
             "message": "Avatar uploaded successfully",
@@ -72,9 +72,9 @@ async def update_user_location(
     request: Request,
     location_data: LocationUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    UserController.update_location(
+    await UserController.update_location(
         db, str(current_user.id), location_data.location, location_data.pincode
     )
 
@@ -86,11 +86,11 @@ async def update_user_location(
 async def get_user_by_id(
     user_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     if str(current_user.id) != user_id and current_user.user_type != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Access denied"
         )
 
-    return UserController.get_user(db, user_id)
+    return await UserController.get_user(db, user_id)
@@ -41,6 +41,7 @@ class ProviderResponse(ProviderBase):
 
 class ProviderWithUser(ProviderResponse):
     user: UserResponse
+    distance_km: Optional[float] = None
 
 
 class PricingUpdate(BaseModel):
@@ -59,6 +59,8 @@ class UserUpdate(BaseModel):
 
 class UserResponse(UserBase):
     id: UUID
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
     is_active: Optional[bool] = None  # ✅ Can be None
     is_verified: Optional[bool] = None  # ✅ Can be None
     created_at: datetime
@@ -1,95 +1,601 @@
+import asyncio
+import copy
+import inspect
 import redis
+import redis.asyncio as aioredis
+from redis.asyncio.retry import Retry as AsyncRetry
+from redis.backoff import NoBackoff
+from redis.retry import Retry
 import json
-from typing import Any, Optional, Union
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
 from datetime import timedelta
-import pickle
+from functools import wraps
+import uuid
 
 from app.core.config import settings
+from app.core.logging import get_logger
+from app.services.circuit_breaker import OPEN, CircuitBreaker
+from app.services.codecs import CodecError, Serializer
+from app.services.local_cache import LocalCache
+
+logger = get_logger("cache")
+
+# a tag is a Redis sorted set of the cache keys registered under it,
+# scored by when each entry expires
+#
+# the tag scripts delete members by name, keys they aren't passed, so the
+# cache assumes a single Redis node (or every key in one cluster slot)
+TAG_PREFIX = "tag:"
+
+# KEYS[1] entry, KEYS[2..] tag sets, ARGV[1] ttl, ARGV[2] value, ARGV[3]
+# now. members that already expired are pruned on every write, so a tag
+# that is written to all the time stays as small as its live entries, and
+# tag sets live as long as their newest member, so they never leak
+SET_TAGGED_SCRIPT = """
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[1])
+local expires_at = tonumber(ARGV[3]) + tonumber(ARGV[1])
+for i = 2, #KEYS do
+    redis.call('ZREMRANGEBYSCORE', KEYS[i], '-inf', ARGV[3])
+    redis.call('ZADD', KEYS[i], expires_at, KEYS[1])
+    if redis.call('TTL', KEYS[i]) < tonumber(ARGV[1]) then
+        redis.call('EXPIRE', KEYS[i], ARGV[1])
+    end
+end
+return 1
+"""
+
+# KEYS[1] lock, ARGV[1] owner token. only the owner may release a lock
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# KEYS are tag sets, ARGV[1] the invalidation channel. deletes every member,
+# then the sets, in one call, and tells every worker which keys went away
+INVALIDATE_TAGS_SCRIPT = """
+local deleted = 0
+for i = 1, #KEYS do
+    local members = redis.call('ZRANGE', KEYS[i], 0, -1)
+    for j = 1, #members, 500 do
+        deleted = deleted + redis.call('DEL', unpack(members, j, math.min(j + 499, #members)))
+    end
+    if #members > 0 then
+        redis.call('PUBLISH', ARGV[1], cjson.encode(members))
+    end
+    redis.call('DEL', KEYS[i])
+end
+return deleted
+"""
+
+# seconds between attempts to resubscribe to the invalidation channel
+LISTENER_RETRY_INTERVAL = 5.0
+
+
+# retries are left to the circuit breaker, the client's own (3 by default,
+# with backoff) would multiply every timeout
+def _pool_options(retry) -> dict:
+    return {
+        "retry": retry,
+        "max_connections": settings.REDIS_MAX_CONNECTIONS,
+        "socket_timeout": settings.REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        "health_check_interval": settings.REDIS_HEALTH_CHECK_INTERVAL,
+    }
+
+
+def _ttl_seconds(ttl: Optional[Union[int, timedelta]], default: int) -> int:
+    if ttl is None:
+        return default
+    if isinstance(ttl, timedelta):
+        return int(ttl.total_seconds())
+    return ttl
+
+
+def _tag_keys(tags: Iterable[str]) -> List[str]:
+    return [f"{TAG_PREFIX}{tag}" for tag in dict.fromkeys(tags)]
+
+
+# errors that mean Redis is down or too slow, as opposed to a bad command
+UNAVAILABLE = (
+    redis.exceptions.ConnectionError,
+    redis.exceptions.TimeoutError,
+    OSError,
+    asyncio.TimeoutError,
+)
+
+
+# run a CacheService call through its circuit breaker
+#
+# while the circuit is open the call returns default without touching
+# Redis. unavailability counts as a failure, any other error (a codec
+# error, a bad command) only returns default, like before
+def _guarded(default: Any):
+    def decorator(method: Callable):
+        if inspect.iscoroutinefunction(method):
+
+            @wraps(method)
+            async def async_wrapper(self, *args, **kwargs):
+                if not self.breaker.allow():
+                    self.stats["bypassed"] += 1
+                    return copy.copy(default)
+                try:
+                    result = await method(self, *args, **kwargs)
+                except UNAVAILABLE:
+                    self.breaker.record_failure()
+                    return copy.copy(default)
+                except Exception:
+                    return copy.copy(default)
+                self.breaker.record_success()
+                return result
+
+            return async_wrapper
+
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not self.breaker.allow():
+                self.stats["bypassed"] += 1
+                return copy.copy(default)
+            try:
+                result = method(self, *args, **kwargs)
+            except UNAVAILABLE:
+                self.breaker.record_failure()
+                return copy.copy(default)
+            except Exception:
+                return copy.copy(default)
+            self.breaker.record_success()
+            return result
+
+        return wrapper
+
+    return decorator
+
 
 # Redis based caching service
+#
+# every call awaits redis.asyncio on one shared pool, so a slow or missing
+# Redis never blocks the event loop. the *_sync methods are for scripts
+# and sync code paths, they use a separate blocking client created on demand
+#
+# values are written by self.serializer, orjson unless a namespace picks
+# another codec in settings.CACHE_NAMESPACE_CODECS, and entries this deploy
+# can't decode are misses
+#
+# calls go through self.breaker: after REDIS_CIRCUIT_FAILURES timeouts or
+# connection errors within REDIS_CIRCUIT_WINDOW seconds every call returns
+# its miss value at once, until a probe after REDIS_CIRCUIT_RESET_TIMEOUT
+# finds Redis back
+#
+# keys in settings.CACHE_L1_NAMESPACES are also kept in a per worker LRU
+# (self.local). every write or delete of such a key is published on
+# settings.CACHE_INVALIDATION_CHANNEL in the same round trip, and every
+# worker running listen_for_invalidations drops its copy. the LRU only
+# serves while that subscription is up
 class CacheService:
     def __init__(self):
-        self.redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=False)
-        self.default_ttl = 3600 # 1 hr
-        
-    # set value in cache
-    def set(
+        self.pool = aioredis.ConnectionPool.from_url(
+            settings.REDIS_URL, **_pool_options(AsyncRetry(NoBackoff(), 0))
+        )
+        self.redis_client = aioredis.Redis(connection_pool=self.pool)
+        self._set_tagged = self.redis_client.register_script(SET_TAGGED_SCRIPT)
+        self._invalidate_tags = self.redis_client.register_script(
+            INVALIDATE_TAGS_SCRIPT
+        )
+        self._release_lock = self.redis_client.register_script(RELEASE_LOCK_SCRIPT)
+        self._sync_client = None
+        self._listener = None
+        self.default_ttl = 3600  # 1 hr
+        self.local = LocalCache(
+            settings.CACHE_L1_NAMESPACES,
+            max_bytes=settings.CACHE_L1_MAX_BYTES,
+            ttl=settings.CACHE_L1_TTL,
+        )
+        self.serializer = Serializer(
+            settings.CACHE_CODEC,
+            settings.CACHE_NAMESPACE_CODECS,
+            compress_min_bytes=settings.CACHE_COMPRESS_MIN_BYTES,
+            compress_level=settings.CACHE_COMPRESS_LEVEL,
+        )
+        self.breaker = CircuitBreaker(
+            "redis",
+            failure_threshold=settings.REDIS_CIRCUIT_FAILURES,
+            window=settings.REDIS_CIRCUIT_WINDOW,
+            reset_timeout=settings.REDIS_CIRCUIT_RESET_TIMEOUT,
+        )
+        # network calls made, a pipeline or MGET counts once, entries dropped
+        # because they were written in a format this deploy can't read, and
+        # calls skipped while the circuit was open
+        self.stats = {"round_trips": 0, "undecodable": 0, "bypassed": 0}
+
+    # whether calls are being skipped because Redis is unavailable
+    @property
+    def bypassing(self) -> bool:
+        return self.breaker.state == OPEN
+
+    # blocking client for scripts like init_db.py
+    @property
+    def sync_client(self) -> redis.Redis:
+        if self._sync_client is None:
+            self._sync_client = redis.Redis.from_url(
+                settings.REDIS_URL, **_pool_options(Retry(NoBackoff(), 0))
+            )
+            self._sync_set_tagged = self._sync_client.register_script(
+                SET_TAGGED_SCRIPT
+            )
+            self._sync_invalidate_tags = self._sync_client.register_script(
+                INVALIDATE_TAGS_SCRIPT
+            )
+            self._sync_release_lock = self._sync_client.register_script(
+                RELEASE_LOCK_SCRIPT
+            )
+        return self._sync_client
+
+    # queue an invalidation of the L1 keys among keys on a pipeline, and
+    # drop this worker's copies right away
+    def _announce(self, pipe, keys: Iterable[str]) -> int:
+        keys = [key for key in keys if self.local.caches(key)]
+        if keys:
+            self.local.discard(keys)
+            pipe.publish(settings.CACHE_INVALIDATION_CHANNEL, json.dumps(keys))
+        return len(keys)
+
+    # a decoded value, None for entries in a format this deploy can't read
+    def _decode(self, key: str, cached_value: bytes) -> Optional[Any]:
+        try:
+            return self.serializer.decode(cached_value)
+        except CodecError as e:
+            self.stats["undecodable"] += 1
+            logger.warning("Undecodable cache entry", key=key, error=str(e))
+            return None
+
+    # raw value from L1, or from Redis and kept in L1, None on a miss
+    async def _read(self, key: str) -> Optional[bytes]:
+        cached_value = self.local.get(key)
+        if cached_value is not None:
+            return cached_value
+
+        generation = self.local.generation
+        self.stats["round_trips"] += 1
+        cached_value = await self.redis_client.get(key)
+        if cached_value is None:
+            self.local.record(key, "misses")
+            return None
+
+        self.local.record(key, "l2_hits")
+        self.local.put(key, cached_value, generation=generation)
+        return cached_value
+
+    # set value in cache, registered under tags for invalidate_tags
+    @_guarded(False)
+    async def set(
         self,
-        key:str,
-        value:Any,
-        ttl: Optional[Union[int, timedelta]] = None
+        key: str,
+        value: Any,
+        ttl: Optional[Union[int, timedelta]] = None,
+        tags: Iterable[str] = (),
     ) -> bool:
-        try:
-            if ttl is None:
-                ttl = self.default_ttl
-            elif isinstance(ttl, timedelta):
-                ttl = int(ttl.total_seconds())
-                
-            serialized_value = pickle.dumps(value)
-            
-            return self.redis_client.setex(key, ttl, serialized_value)
-        except Exception:
-            return False
-        
+        # the write and its invalidation go out in one pipeline
+        if self.local.caches(key):
+            return await self._set_many({key: value}, ttl, tags={key: tags})
+
+        ttl = _ttl_seconds(ttl, self.default_ttl)
+        tag_keys = _tag_keys(tags)
+        data = self.serializer.encode(key, value)
+        self.stats["round_trips"] += 1
+        if tag_keys:
+            return bool(
+                await self._set_tagged(
+                    keys=[key, *tag_keys],
+                    args=[ttl, data, time.time()],
+                    client=self.redis_client,
+                )
+            )
+        return await self.redis_client.set(key, data, ex=ttl)
+
     # get a value from cache
-    def get(self, key:str) -> Optional[Any]:
-        try:
-            cached_value = self.redis_client.get(key)
-            if cached_value is None:
-                return None
-            
-            return pickle.loads(cached_value)
-        except Exception:
+    @_guarded(None)
+    async def get(self, key: str) -> Optional[Any]:
+        cached_value = await self._read(key)
+        if cached_value is None:
             return None
-        
+
+        return self._decode(key, cached_value)
+
     # delete a key from cache
-    def delete(self, key:str)->bool:
-        try:
-            return bool(self.redis_client.delete(key))
-        except Exception:
-            return False
-        
+    @_guarded(False)
+    async def delete(self, key: str) -> bool:
+        return bool(await self._delete_many([key]))
+
     # check if key exists in cache
-    def exists(self, key: str)-> bool:
-        try:
-            return bool(self.redis_client.exists(key))
-        except Exception:
-            return False
-    
+    @_guarded(False)
+    async def exists(self, key: str) -> bool:
+        self.stats["round_trips"] += 1
+        return bool(await self.redis_client.exists(key))
+
     # set JSON value in cache
-    def set_json(self, key:str, value:dict, ttl: Optional[int]=None)-> bool:
-        try:
-            if ttl is None:
-                ttl = self.default_ttl
-                
-            json_value = json.dumps(value)
-            return self.redis_client.setex(key, ttl, json_value)
-        except Exception:
-            return False
-        
+    @_guarded(False)
+    async def set_json(self, key: str, value: dict, ttl: Optional[int] = None) -> bool:
+        if ttl is None:
+            ttl = self.default_ttl
+
+        json_value = json.dumps(value)
+        self.stats["round_trips"] += 1
+        return await self.redis_client.set(key, json_value, ex=ttl)
+
     # get json value from cache
-    def get_json(self, key:str)->Optional[dict]:
-        try:
-            cached_value = self.redis_client.get(key)
-            if cached_value is None:
-                return None
-            
-            return json.load(cached_value.decode()) 
-        except Exception:
+    @_guarded(None)
+    async def get_json(self, key: str) -> Optional[dict]:
+        self.stats["round_trips"] += 1
+        cached_value = await self.redis_client.get(key)
+        if cached_value is None:
             return None
-        
-    
-    # invalid all keys matching pattern
-    def invalidate_pattern(self, pattern:str)->int:
-        try:
-            keys = self.redis_client.keys(pattern)
-            if keys:
-                return self.redis_client.delete(*keys)
+
+        return json.loads(cached_value)
+
+    # values for many keys in one MGET, keys that miss are left out
+    @_guarded({})
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+
+        raw = {}
+        for key in keys:
+            cached_value = self.local.get(key)
+            if cached_value is not None:
+                raw[key] = cached_value
+
+        missing = [key for key in keys if key not in raw]
+        if missing:
+            generation = self.local.generation
+            self.stats["round_trips"] += 1
+            cached_values = await self.redis_client.mget(missing)
+
+            for key, cached_value in zip(missing, cached_values):
+                if cached_value is None:
+                    self.local.record(key, "misses")
+                    continue
+                self.local.record(key, "l2_hits")
+                self.local.put(key, cached_value, generation=generation)
+                raw[key] = cached_value
+
+        found = {}
+        for key, cached_value in raw.items():
+            value = self._decode(key, cached_value)
+            if value is not None:
+                found[key] = value
+        return found
+
+    # write many values in one pipeline, ttl may map keys to their own TTL
+    # and tags maps keys to the tags they are registered under
+    @_guarded(False)
+    async def set_many(
+        self,
+        values: Dict[str, Any],
+        ttl: Optional[Union[int, timedelta, Dict[str, Union[int, timedelta]]]] = None,
+        tags: Optional[Dict[str, Iterable[str]]] = None,
+    ) -> bool:
+        return await self._set_many(values, ttl, tags)
+
+    async def _set_many(self, values, ttl=None, tags=None) -> bool:
+        if not values:
+            return True
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        for key, value in values.items():
+            key_ttl = _ttl_seconds(
+                ttl.get(key) if isinstance(ttl, dict) else ttl, self.default_ttl
+            )
+            tag_keys = _tag_keys((tags or {}).get(key, ()))
+            data = self.serializer.encode(key, value)
+            if tag_keys:
+                await self._set_tagged(
+                    keys=[key, *tag_keys],
+                    args=[key_ttl, data, time.time()],
+                    client=pipe,
+                )
+            else:
+                pipe.set(key, data, ex=key_ttl)
+        self._announce(pipe, values)
+        self.stats["round_trips"] += 1
+        return all((await pipe.execute())[: len(values)])
+
+    # delete many keys with one DEL
+    @_guarded(0)
+    async def delete_many(self, keys: Iterable[str]) -> int:
+        return await self._delete_many(keys)
+
+    async def _delete_many(self, keys: Iterable[str]) -> int:
+        keys = list(keys)
+        if not keys:
+            return 0
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.delete(*keys)
+        self._announce(pipe, keys)
+        self.stats["round_trips"] += 1
+        return (await pipe.execute())[0]
+
+    # delete every entry registered under any of the tags, in one call
+    #
+    # replaces KEYS pattern matching, which walks the whole keyspace and
+    # blocks Redis for every other client while it does
+    @_guarded(0)
+    async def invalidate_tags(self, *tags: str) -> int:
+        if not tags:
             return 0
-        except Exception:
+
+        self.stats["round_trips"] += 1
+        return await self._invalidate_tags(
+            keys=_tag_keys(tags),
+            args=[settings.CACHE_INVALIDATION_CHANNEL],
+            client=self.redis_client,
+        )
+
+    # short lived lock so one worker does a job, returns the owner token
+    # or None when someone else holds it or Redis is unreachable
+    @_guarded(None)
+    async def acquire_lock(self, name: str, ttl: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        self.stats["round_trips"] += 1
+        acquired = await self.redis_client.set(
+            f"lock:{name}", token, nx=True, px=int(ttl * 1000)
+        )
+        return token if acquired else None
+
+    # release a lock, unless it expired and someone else took it over
+    @_guarded(False)
+    async def release_lock(self, name: str, token: str) -> bool:
+        self.stats["round_trips"] += 1
+        return bool(
+            await self._release_lock(
+                keys=[f"lock:{name}"], args=[token], client=self.redis_client
+            )
+        )
+
+    # round trip to Redis within the socket timeout
+    @_guarded(False)
+    async def ping(self) -> bool:
+        self.stats["round_trips"] += 1
+        return bool(await self.redis_client.ping())
+
+    # keep L1 coherent with the other workers, runs until cancelled. L1 is
+    # cleared and off whenever the subscription is down, since
+    # invalidations published meanwhile are lost
+    async def listen_for_invalidations(self) -> None:
+        connected = True
+        while True:
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(settings.CACHE_INVALIDATION_CHANNEL)
+                self.local.clear()
+                self.local.enabled = True
+                if not connected:
+                    logger.info("Cache invalidation listener reconnected")
+                connected = True
+
+                while True:
+                    message = await pubsub.get_message(timeout=1.0)
+                    if message:
+                        self.local.discard(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if connected:
+                    logger.warning("Cache invalidation listener down", error=str(e))
+                connected = False
+            finally:
+                self.local.enabled = False
+                self.local.clear()
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+            await asyncio.sleep(LISTENER_RETRY_INTERVAL)
+
+    # run listen_for_invalidations in the background of this event loop
+    def start_listener(self) -> None:
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(
+                self.listen_for_invalidations()
+            )
+
+    # release pooled connections on shutdown
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener = None
+        await self.redis_client.aclose()
+        await self.pool.disconnect()
+
+    # blocking set, for sync callers
+    @_guarded(False)
+    def set_sync(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[Union[int, timedelta]] = None,
+        tags: Iterable[str] = (),
+    ) -> bool:
+        client = self.sync_client
+        ttl = _ttl_seconds(ttl, self.default_ttl)
+        tag_keys = _tag_keys(tags)
+        data = self.serializer.encode(key, value)
+        pipe = client.pipeline(transaction=False)
+        if tag_keys:
+            self._sync_set_tagged(
+                keys=[key, *tag_keys], args=[ttl, data, time.time()], client=pipe
+            )
+        else:
+            pipe.set(key, data, ex=ttl)
+        self._announce(pipe, [key])
+        self.stats["round_trips"] += 1
+        return bool(pipe.execute()[0])
+
+    # blocking get, for sync callers
+    @_guarded(None)
+    def get_sync(self, key: str) -> Optional[Any]:
+        cached_value = self.local.get(key)
+        if cached_value is None:
+            generation = self.local.generation
+            self.stats["round_trips"] += 1
+            cached_value = self.sync_client.get(key)
+            if cached_value is None:
+                self.local.record(key, "misses")
+                return None
+            self.local.record(key, "l2_hits")
+            self.local.put(key, cached_value, generation=generation)
+
+        return self._decode(key, cached_value)
+
+    # blocking invalidate_tags, for sync controllers after they commit
+    @_guarded(0)
+    def invalidate_tags_sync(self, *tags: str) -> int:
+        if not tags:
             return 0
 
+        client = self.sync_client
+        self.stats["round_trips"] += 1
+        return self._sync_invalidate_tags(
+            keys=_tag_keys(tags),
+            args=[settings.CACHE_INVALIDATION_CHANNEL],
+            client=client,
+        )
+
+    # blocking acquire_lock, for sync callers
+    @_guarded(None)
+    def acquire_lock_sync(self, name: str, ttl: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        client = self.sync_client
+        self.stats["round_trips"] += 1
+        acquired = client.set(f"lock:{name}", token, nx=True, px=int(ttl * 1000))
+        return token if acquired else None
+
+    # blocking release_lock, for sync callers
+    @_guarded(False)
+    def release_lock_sync(self, name: str, token: str) -> bool:
+        client = self.sync_client
+        self.stats["round_trips"] += 1
+        return bool(
+            self._sync_release_lock(keys=[f"lock:{name}"], args=[token], client=client)
+        )
+
+    # blocking delete, for sync callers
+    @_guarded(False)
+    def delete_sync(self, key: str) -> bool:
+        pipe = self.sync_client.pipeline(transaction=False)
+        pipe.delete(key)
+        self._announce(pipe, [key])
+        self.stats["round_trips"] += 1
+        return bool(pipe.execute()[0])
+
 
 # cache instance
 cache = CacheService()
-    
\ No newline at end of file
@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from app.core.logging import get_logger
+
+logger = get_logger("circuit_breaker")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+# stops calling a dependency that keeps failing
+#
+# closed: calls go through, failures are kept for window seconds and
+# failure_threshold of them open the circuit. open: calls are refused
+# straight away. after reset_timeout one call is let through as a probe
+# (half open), its success closes the circuit and its failure opens it
+# again. a probe that never reports back is replaced after another
+# reset_timeout, so the circuit can't get stuck half open
+class CircuitBreaker:
+    def __init__(
+        self, name: str, failure_threshold: int, window: float, reset_timeout: float
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self._lock = threading.Lock()
+        self._failures = deque()
+        self._retry_at = 0.0
+        self._opened_at: Optional[float] = None
+        self.stats = {"trips": 0, "rejected": 0, "probes": 0}
+
+    # whether a call may go ahead, counted as rejected if not
+    def allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+
+            now = time.monotonic()
+            if now < self._retry_at:
+                self.stats["rejected"] += 1
+                return False
+
+            self._retry_at = now + self.reset_timeout
+            self.state = HALF_OPEN
+            self.stats["probes"] += 1
+            return True
+
+    def record_success(self) -> None:
+        if self.state == CLOSED:
+            return
+
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            self.state = CLOSED
+            self._failures.clear()
+            self._opened_at = None
+            logger.info("Circuit closed", circuit=self.name)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if self.state == HALF_OPEN:
+                self._open(now)
+                return
+            if self.state == OPEN:
+                return
+
+            self._failures.append(now)
+            while self._failures and self._failures[0] <= now - self.window:
+                self._failures.popleft()
+            if len(self._failures) >= self.failure_threshold:
+                self._open(now)
+
+    def _open(self, now: float) -> None:
+        if self.state == CLOSED:
+            self.stats["trips"] += 1
+            self._opened_at = now
+            logger.warning(
+                "Circuit opened", circuit=self.name, failures=len(self._failures)
+            )
+        self.state = OPEN
+        self._failures.clear()
+        self._retry_at = now + self.reset_timeout
+
+    # state and counters, shown on /api/health
+    def snapshot(self) -> Dict:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "state": self.state,
+                "recent_failures": sum(
+                    1 for failed_at in self._failures if failed_at > now - self.window
+                ),
+                "open_for_seconds": (
+                    round(now - self._opened_at, 1) if self._opened_at is not None else 0.0
+                ),
+                **self.stats,
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.state = CLOSED
+            self._failures.clear()
+            self._retry_at = 0.0
+            self._opened_at = None
+            self.stats = dict.fromkeys(self.stats, 0)
@@ -0,0 +1,130 @@
+import struct
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+import msgpack
+import orjson
+import zstandard
+
+# every cache entry starts with this header: magic, format version, codec
+# id and flags. a worker that reads an entry it can't decode (written by
+# an older or newer deploy, or a plain pickle from before codecs) treats
+# it as a miss instead of failing or returning the wrong type
+MAGIC = b"HC"
+FORMAT_VERSION = 1
+HEADER = struct.Struct(">2sBBB")
+
+# flags
+ZSTD = 1
+
+
+class CodecError(ValueError):
+    pass
+
+
+# a serialization format, id is stored in every entry so it must never change
+class Codec(ABC):
+    name = ""
+    id = 0
+
+    @abstractmethod
+    def dumps(self, value: Any) -> bytes: ...
+
+    @abstractmethod
+    def loads(self, data: bytes) -> Any: ...
+
+
+# JSON compatible DTOs, the default. datetimes and UUIDs come back as strings
+class OrjsonCodec(Codec):
+    name = "orjson"
+    id = 1
+
+    def dumps(self, value: Any) -> bytes:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+
+# compact binary, and the only codec that keeps bytes values as bytes
+class MsgpackCodec(Codec):
+    name = "msgpack"
+    id = 2
+
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, use_bin_type=True)
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False)
+
+
+CODECS: Dict[str, Codec] = {}
+_CODECS_BY_ID: Dict[int, Codec] = {}
+
+
+def register_codec(codec: Codec) -> Codec:
+    if _CODECS_BY_ID.get(codec.id, codec).name != codec.name:
+        raise ValueError(f"codec id {codec.id} is already used")
+    CODECS[codec.name] = codec
+    _CODECS_BY_ID[codec.id] = codec
+    return codec
+
+
+register_codec(OrjsonCodec())
+register_codec(MsgpackCodec())
+
+
+# serializes cache values with a codec, compressing large payloads with zstd
+class Serializer:
+    def __init__(
+        self,
+        codec: str = "orjson",
+        namespace_codecs: Optional[Dict[str, str]] = None,
+        compress_min_bytes: int = 1024,
+        compress_level: int = 3,
+    ):
+        self.codec = CODECS[codec]
+        self.namespace_codecs = {
+            namespace: CODECS[name]
+            for namespace, name in (namespace_codecs or {}).items()
+        }
+        self.compress_min_bytes = compress_min_bytes
+        self.compress_level = compress_level
+
+    def codec_for(self, key: str) -> Codec:
+        return self.namespace_codecs.get(key.split(":", 1)[0], self.codec)
+
+    # raises CodecError for values the codec can't represent, like ORM instances
+    def encode(self, key: str, value: Any) -> bytes:
+        codec = self.codec_for(key)
+        try:
+            payload = codec.dumps(value)
+        except (TypeError, ValueError, OverflowError) as e:
+            raise CodecError(f"{codec.name} can't encode {key}: {e}") from e
+
+        flags = 0
+        if len(payload) >= self.compress_min_bytes:
+            payload = zstandard.compress(payload, self.compress_level)
+            flags |= ZSTD
+
+        return HEADER.pack(MAGIC, FORMAT_VERSION, codec.id, flags) + payload
+
+    # raises CodecError for entries this deploy doesn't understand
+    def decode(self, data: bytes) -> Any:
+        if len(data) < HEADER.size:
+            raise CodecError("entry has no header")
+
+        magic, version, codec_id, flags = HEADER.unpack_from(data)
+        codec = _CODECS_BY_ID.get(codec_id)
+        if magic != MAGIC or version != FORMAT_VERSION or codec is None:
+            raise CodecError(f"unknown entry format {magic!r} v{version} codec {codec_id}")
+        if flags & ~ZSTD:
+            raise CodecError(f"unknown entry flags {flags}")
+
+        payload = data[HEADER.size :]
+        try:
+            if flags & ZSTD:
+                payload = zstandard.decompress(payload)
+            return codec.loads(payload)
+        except Exception as e:
+            raise CodecError(f"corrupt {codec.name} entry: {e}") from e
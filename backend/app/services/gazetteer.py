@@ -0,0 +1,174 @@
+import asyncio
+import csv
+import difflib
+import os
+import re
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger("gazetteer")
+
+DATA_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "data",
+    "goa_gazetteer.csv",
+)
+
+FIELDS = ["name", "aliases", "kind", "taluka", "pincode", "lat", "lng"]
+
+# comma separated parts that say nothing about where in Goa an address is
+REGION_PARTS = {"goa", "india", "goa india", "north goa", "south goa"}
+
+# Goa pincode ranges, with the place whose centroid stands in for the range
+PINCODE_REGIONS = [
+    ((403001, 403199), "Panaji, North Goa, Goa, India", "Panaji"),
+    ((403200, 403299), "Mapusa, North Goa, Goa, India", "Mapusa"),
+    ((403300, 403399), "Bicholim, Pernem, North Goa, Goa, India", "Bicholim"),
+    ((403400, 403499), "Vasco da Gama, Mormugao, South Goa, Goa, India", "Vasco da Gama"),
+    ((403500, 403599), "Margao, Salcete, South Goa, Goa, India", "Margao"),
+    ((403600, 403699), "Quepem, Canacona, South Goa, Goa, India", "Quepem"),
+    ((403700, 403799), "Ponda, Dharbandora, Goa, India", "Ponda"),
+    ((403800, 403899), "Sanguem, Curchorem, South Goa, Goa, India", "Sanguem"),
+    ((403900, 403999), "Other Regions, Goa, India", None),
+]
+
+FUZZY_CUTOFF = 0.8
+
+
+class GazetteerEntry(NamedTuple):
+    name: str
+    kind: str
+    taluka: str
+    pincode: str
+    lat: float
+    lng: float
+
+
+# lowercase, strip punctuation and house numbers from one address part
+def normalize(text: str) -> str:
+    words = re.sub(r"[^a-z0-9]+", " ", text.lower()).split()
+    return " ".join(word for word in words if not word.isdigit())
+
+
+# offline lookup of Goa places, with Nominatim answers written back
+class Gazetteer:
+    def __init__(self, path: str = DATA_PATH, learned_path: Optional[str] = None):
+        self.learned_path = learned_path
+        self._lock = threading.Lock()
+        self._exact: Dict[str, GazetteerEntry] = {}
+        self._names: Dict[str, GazetteerEntry] = {}
+        self._pincodes: Dict[str, GazetteerEntry] = {}
+
+        self._load(path)
+        if learned_path and os.path.exists(learned_path):
+            self._load(learned_path)
+
+        self._name_keys = list(self._names)
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+    def _load(self, path: str) -> None:
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                self._add(row)
+
+    def _add(self, row: Dict[str, str]) -> GazetteerEntry:
+        entry = GazetteerEntry(
+            name=row["name"],
+            kind=row["kind"],
+            taluka=row.get("taluka") or "",
+            pincode=row.get("pincode") or "",
+            lat=float(row["lat"]),
+            lng=float(row["lng"]),
+        )
+
+        names = [entry.name] + [a for a in (row.get("aliases") or "").split("|") if a]
+        for name in names:
+            self._exact.setdefault(name.strip().lower(), entry)
+            if entry.kind != "learned":
+                self._names.setdefault(normalize(name), entry)
+
+        # the first place listed for a pincode (towns come first) represents it
+        if entry.pincode and entry.kind != "learned":
+            self._pincodes.setdefault(entry.pincode, entry)
+
+        return entry
+
+    # normalized address parts, most specific first, region noise dropped
+    @staticmethod
+    def _parts(query: str) -> List[str]:
+        parts = [normalize(part) for part in query.split(",")]
+        return [part for part in parts if part and part not in REGION_PARTS]
+
+    def lookup_pincode(self, pincode: str) -> Optional[GazetteerEntry]:
+        entry = self._pincodes.get(pincode)
+        if entry:
+            return entry
+
+        pincode_int = int(pincode)
+        for (start, end), _, anchor in PINCODE_REGIONS:
+            if start <= pincode_int <= end and anchor:
+                return self._names.get(normalize(anchor))
+
+        return None
+
+    # exact match, then normalized, then pincode, then fuzzy
+    def lookup(self, query: str) -> Optional[GazetteerEntry]:
+        if not query or not query.strip():
+            return None
+
+        entry = self._exact.get(query.strip().lower())
+        if entry:
+            return entry
+
+        parts = self._parts(query)
+        for part in parts:
+            entry = self._names.get(part)
+            if entry:
+                return entry
+
+        pincode = re.search(r"\b(403\d{3})\b", query)
+        if pincode:
+            entry = self.lookup_pincode(pincode.group(1))
+            if entry:
+                return entry
+
+        for part in parts:
+            matches = difflib.get_close_matches(
+                part, self._name_keys, n=1, cutoff=FUZZY_CUTOFF
+            )
+            if matches:
+                return self._names[matches[0]]
+
+        return None
+
+    # remember a remotely geocoded address so the next lookup stays local,
+    # the row is appended to learned_path on a worker thread
+    async def learn(self, address: str, lat: float, lng: float) -> None:
+        row = {"name": address, "kind": "learned", "lat": lat, "lng": lng}
+
+        with self._lock:
+            self._add(row)
+
+        if self.learned_path:
+            await asyncio.to_thread(self._persist, row)
+
+    def _persist(self, row: Dict) -> None:
+        with self._lock:
+            try:
+                is_new = not os.path.exists(self.learned_path)
+                with open(self.learned_path, "a", newline="", encoding="utf-8") as f:
+                    writer = csv.DictWriter(f, fieldnames=FIELDS)
+                    if is_new:
+                        writer.writeheader()
+                    writer.writerow(row)
+            except OSError as e:
+                logger.warning("Could not persist learned place", error=str(e))
+
+
+# instance
+gazetteer = Gazetteer(learned_path=settings.GAZETTEER_LEARNED_PATH)
@@ -4,48 +4,178 @@ from typing import Tuple, Optional, List, Dict
 from fastapi import HTTPException, status
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
+import math
 import re
+import time
 
+import numpy as np
+
+from app.core.config import settings
 from app.core.logging import get_logger
+from app.models.provider import DEFAULT_SERVICE_RADIUS_KM
 from app.services.cache import cache
+from app.services.gazetteer import gazetteer, PINCODE_REGIONS
 
 logger = get_logger("geolocation")
 
+EARTH_RADIUS_KM = 6371.0088
+
+
+# cached marker for addresses Nominatim could not resolve
+NEGATIVE_RESULT = "__not_found__"
+
+
+# per-process token bucket for calls to an external API
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
 
 # handle geolocation and distance calculations
 class GeolocationService:
     def __init__(self):
         self.geolocator = Nominatim(user_agent="homehero")
-        self.executor = ThreadPoolExecutor(max_workers=4)
+        # Nominatim allows one request per second, so one thread is plenty
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.bucket = TokenBucket(rate=1.0 / settings.NOMINATIM_MIN_INTERVAL)
+
+        # one future per normalized address that is being looked up remotely
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._batch: List[Tuple[str, str]] = []
+        self.stats = {
+            "coalesced": 0,
+            "batches": 0,
+            "upstream_calls": 0,
+            "negative_hits": 0,
+            "wait_timeouts": 0,
+        }
 
-        # Get coordinates (lat, lng) for an address
+    # addresses that differ only in case or spacing share cache entries
+    @staticmethod
+    def _normalize_address(address: str) -> str:
+        return " ".join(address.lower().split())
 
-    async def get_coordinates(self, address: str) -> Optional[Tuple[float, float]]:
-        # check cache first
-        cache_key = f"geocode:{address}"
-        cached_coords = cache.get(cache_key)
+    # Get coordinates (lat, lng) for an address
+    #
+    # a Nominatim lookup is awaited with wait_for_remote, for up to timeout
+    # seconds with a timeout, and otherwise runs on after returning None
+    async def get_coordinates(
+        self,
+        address: str,
+        wait_for_remote: bool = False,
+        timeout: Optional[float] = None,
+    ) -> Optional[Tuple[float, float]]:
+        if not address or not address.strip():
+            return None
+
+        # offline gazetteer answers almost every Goa address in-process
+        entry = gazetteer.lookup(address)
+        if entry:
+            return (entry.lat, entry.lng)
+
+        # answers another worker already fetched from Nominatim
+        key = self._normalize_address(address)
+        cached_coords = await cache.get(f"geocode:{key}")
+        if cached_coords == NEGATIVE_RESULT:
+            self.stats["negative_hits"] += 1
+            return None
         if cached_coords:
-            return cached_coords
+            return tuple(cached_coords)
+
+        if not settings.NOMINATIM_ENABLED:
+            return None
+
+        future = self._lookup_remote(key, address)
+
+        # writes like profile updates wait on Nominatim, searches a moment
+        if wait_for_remote:
+            return await asyncio.shield(future)
+        if timeout:
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), timeout)
+            except asyncio.TimeoutError:
+                self.stats["wait_timeouts"] += 1
+
+        return None
+
+    # join an in-flight lookup for the address or queue a new one
+    def _lookup_remote(self, key: str, address: str) -> asyncio.Future:
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._inflight[key] = future
+
+        # lookups queued during the same loop tick are resolved as one batch
+        if not self._batch:
+            loop.call_soon(self._flush_batch)
+        self._batch.append((key, address))
+
+        return future
+
+    def _flush_batch(self) -> None:
+        batch, self._batch = self._batch, []
+        self.stats["batches"] += 1
+        asyncio.get_running_loop().create_task(self._resolve_batch(batch))
+
+    async def _resolve_batch(self, batch: List[Tuple[str, str]]) -> None:
+        for key, address in batch:
+            coords = None
+            try:
+                coords = await self._geocode_remote(key, address)
+            finally:
+                future = self._inflight.pop(key, None)
+                if future is not None and not future.done():
+                    future.set_result(coords)
+
+    # rate-limited Nominatim lookup, caching hits for a day and misses briefly
+    async def _geocode_remote(
+        self, key: str, address: str
+    ) -> Optional[Tuple[float, float]]:
+        await self.bucket.acquire()
+        self.stats["upstream_calls"] += 1
 
         try:
             # run geocoding in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
+            loop = asyncio.get_running_loop()
             location = await loop.run_in_executor(
                 self.executor, self.geolocator.geocode, address
             )
 
-            if location:
-                coords = (location.latitude, location.longitude)
-                # cache for 24 hours
-                cache.set(cache_key, coords, ttl=86400)
-                return coords
-
-            return None
-
         except Exception as e:
             logger.error(f"Geocoding failed", address=address, error=str(e))
             return None
 
+        if not location:
+            await cache.set(
+                f"geocode:{key}", NEGATIVE_RESULT, ttl=settings.GEOCODE_NEGATIVE_TTL
+            )
+            return None
+
+        coords = (location.latitude, location.longitude)
+        await gazetteer.learn(address, *coords)
+        # cache for 24 hours
+        await cache.set(f"geocode:{key}", coords, ttl=86400)
+        return coords
+
     # Calculate distance between two coordinates in kilometers
     def calculate_distance(
         self, coords1: Tuple[float, float], coords2: Tuple[float, float]
@@ -57,57 +187,66 @@ class GeolocationService:
             logger.error(f"Distance calculation failed", error=str(e))
             return float("inf")
 
-    # find providers within specified distance
-    async def find_nearby_providers(
-        self,
-        customer_location: str,
-        providers: List[Dict],
-        max_distance_km: float = 25.0,
-    ) -> List[Dict]:
-        customer_coords = await self.get_coordinates(customer_location)
-        if not customer_coords:
-            logger.warning(
-                f"Could not geocode customer location", location=customer_location
-            )
-
-            return providers
-
-        nearby_providers = []
-
-        for provider in providers:
-            provider_location = provider.get("location")
-            if not provider_location:
-                continue
+    # haversine distances in km from one point to arrays of points
+    @staticmethod
+    def haversine_km(lat: float, lng: float, lats, lngs) -> np.ndarray:
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        dlat = np.radians(lats - lat) / 2.0
+        dlng = np.radians(lngs - lng) / 2.0
+        a = np.sin(dlat) ** 2 + math.cos(math.radians(lat)) * np.cos(
+            np.radians(lats)
+        ) * np.sin(dlng) ** 2
 
-            provider_coords = await self.get_coordinates(provider_location)
-            if not provider_coords:
-                continue
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(1.0, a)))
 
-            distance = self.calculate_distance(customer_coords, provider_coords)
+    # geocode a user's free-text location, falling back to the pincode
+    async def geocode_user_location(
+        self, location: Optional[str], pincode: Optional[str] = None
+    ) -> Optional[Tuple[float, float]]:
+        if location:
+            coords = await self.get_coordinates(location, wait_for_remote=True)
+            if coords:
+                return coords
 
-            if distance <= max_distance_km:
-                provider["distance_km"] = distance
-                nearby_providers.append(provider)
+        if pincode and pincode.isdigit() and len(pincode) == 6:
+            entry = gazetteer.lookup_pincode(pincode)
+            if entry:
+                return (entry.lat, entry.lng)
 
-        # sort by distance
-        nearby_providers.sort(key=lambda x: x.get("distance_km", float("inf")))
+        return None
 
-        return nearby_providers
+    # lat/lng box that fully contains a circle of radius_km around a point
+    @staticmethod
+    def bounding_box(
+        lat: float, lng: float, radius_km: float
+    ) -> Tuple[float, float, float, float]:
+        lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+        # widen longitude by the latitude's parallel, clamped near the poles
+        cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+        lng_delta = min(math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)), 180.0)
 
-    # get approximate coverage area for a provider
-    async def get_service_radius_coverage(
-        self, provider_location: str, service_radius_km: float
-    ) -> Optional[Dict]:
+        return (lat - lat_delta, lat + lat_delta, lng - lng_delta, lng + lng_delta)
 
-        coords = await self.get_coordinates(provider_location)
-        if not coords:
+    # coverage area for a provider, read from its stored coverage box
+    @staticmethod
+    def get_service_radius_coverage(provider) -> Optional[Dict]:
+        if provider.latitude is None or provider.longitude is None:
             return None
 
+        radius = provider.service_radius
+        if radius is None:
+            radius = DEFAULT_SERVICE_RADIUS_KM
+
         return {
-            "center_lat": coords[0],
-            "center_lng": coords[1],
-            "radius_km": service_radius_km,
-            "coverage_area": f"{service_radius_km} km radius from {provider_location}",
+            "center_lat": provider.latitude,
+            "center_lng": provider.longitude,
+            "radius_km": radius,
+            "min_lat": provider.coverage_min_lat,
+            "max_lat": provider.coverage_max_lat,
+            "min_lng": provider.coverage_min_lng,
+            "max_lng": provider.coverage_max_lng,
+            "coverage_area": f"{radius} km radius",
         }
 
     # create searchable location string for Goa, India
@@ -116,21 +255,8 @@ class GeolocationService:
         if not pincode or not pincode.isdigit() or len(pincode) != 6:
             return city or ""
 
-        # Goa pincode mapping
-        pincode_regions = {
-            (403001, 403199): "Panaji, North Goa, Goa, India",
-            (403200, 403299): "Mapusa, North Goa, Goa, India",
-            (403300, 403399): "Bicholim, Pernem, North Goa, Goa, India",
-            (403400, 403499): "Vasco da Gama, Mormugao, South Goa, Goa, India",
-            (403500, 403599): "Margao, Salcete, South Goa, Goa, India",
-            (403600, 403699): "Quepem, Canacona, South Goa, Goa, India",
-            (403700, 403799): "Ponda, Dharbandora, Goa, India",
-            (403800, 403899): "Sanguem, Curchorem, South Goa, Goa, India",
-            (403900, 403999): "Other Regions, Goa, India",
-        }
-
         pincode_int = int(pincode)
-        for (start, end), region in pincode_regions.items():
+        for (start, end), region, _ in PINCODE_REGIONS:
             if start <= pincode_int <= end:
                 return f"{city}, {region}" if city else region
 
@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, Optional, Tuple
+
+TIERS = ("l1_hits", "l2_hits", "misses")
+
+
+def namespace(key: str) -> str:
+    return key.split(":", 1)[0]
+
+
+# in-process LRU of raw cache values, in front of Redis
+#
+# values are kept as the bytes Redis returned, so every hit decodes a
+# private copy and callers can't mutate each other's results. the cache is
+# bounded by bytes and every entry also has a TTL, the last line of defence
+# if an invalidation is lost. it only serves while enabled, which
+# CacheService does while subscribed to the invalidation channel
+class LocalCache:
+    def __init__(self, namespaces: Iterable[str], max_bytes: int, ttl: float):
+        self.namespaces = frozenset(namespaces)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.enabled = False
+        self._lock = threading.Lock()
+        # key -> (expires at, value)
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._bytes = defaultdict(int)
+        self._counts = defaultdict(lambda: dict.fromkeys(TIERS, 0))
+        # bumped by every invalidation, see put
+        self.generation = 0
+
+    def caches(self, key: str) -> bool:
+        return namespace(key) in self.namespaces
+
+    def record(self, key: str, tier: str) -> None:
+        with self._lock:
+            self._counts[namespace(key)][tier] += 1
+
+    # a live value, counted as an L1 hit
+    def get(self, key: str) -> Optional[bytes]:
+        if not self.enabled or not self.caches(key):
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                return None
+
+            self._entries.move_to_end(key)
+            self._counts[namespace(key)]["l1_hits"] += 1
+            return entry[1]
+
+    # store a value read from or written to Redis. generation is the value
+    # of self.generation from before the read, a value read before an
+    # invalidation arrived may already be stale and is not stored
+    def put(
+        self,
+        key: str,
+        value: bytes,
+        ttl: Optional[float] = None,
+        generation: Optional[int] = None,
+    ) -> None:
+        if not self.enabled or not self.caches(key):
+            return
+        size = len(key) + len(value)
+        if size > self.max_bytes:
+            return
+
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._bytes[namespace(key)] += size
+
+            while sum(self._bytes.values()) > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def discard(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            self.generation += 1
+            for key in keys:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._bytes.clear()
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes[namespace(key)] -= len(key) + len(entry[1])
+
+    # hit rates and memory per namespace, shown on /api/health
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            entries = defaultdict(int)
+            for key in self._entries:
+                entries[namespace(key)] += 1
+
+            stats = {}
+            for name in sorted(set(self._counts) | set(entries)):
+                counts = self._counts[name]
+                total = sum(counts.values())
+                stats[name] = {
+                    **counts,
+                    "l1_hit_ratio": round(counts["l1_hits"] / total, 4) if total else 0.0,
+                    "l2_hit_ratio": round(counts["l2_hits"] / total, 4) if total else 0.0,
+                    "l1_entries": entries[name],
+                    "l1_bytes": self._bytes[name],
+                }
+            return stats
+
+    def reset(self) -> None:
+        self.clear()
+        with self._lock:
+            self._counts.clear()
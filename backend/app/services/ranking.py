@@ -0,0 +1,116 @@
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.provider import Provider
+from app.models.provider_search_doc import ProviderSearchDoc
+
+SORT_OPTIONS = ("distance", "rating", "price", "relevance")
+
+MAX_RATING = 5.0
+
+
+class RankingWeights(NamedTuple):
+    distance: float
+    rating: float
+    price: float
+    experience: float
+
+
+# composite provider ranking, evaluated by the database so sorting happens
+# before pagination and every page continues the previous one. scores are
+# stored on providers and sorted on provider_search_docs
+class RankingEngine:
+    def __init__(
+        self,
+        weights: Optional[RankingWeights] = None,
+        distance_decay_km: float = settings.RANK_DISTANCE_DECAY_KM,
+        rating_prior: float = settings.RANK_RATING_PRIOR,
+        rating_prior_count: int = settings.RANK_RATING_PRIOR_COUNT,
+        price_reference: float = settings.RANK_PRICE_REFERENCE,
+        experience_cap_years: int = settings.RANK_EXPERIENCE_CAP_YEARS,
+    ):
+        self.weights = weights or RankingWeights(
+            distance=settings.RANK_WEIGHT_DISTANCE,
+            rating=settings.RANK_WEIGHT_RATING,
+            price=settings.RANK_WEIGHT_PRICE,
+            experience=settings.RANK_WEIGHT_EXPERIENCE,
+        )
+        self.distance_decay_km = distance_decay_km
+        self.rating_prior = rating_prior
+        self.rating_prior_count = rating_prior_count
+        self.price_reference = price_reference
+        self.experience_cap_years = experience_cap_years
+
+    # average rating pulled towards the prior until enough reviews come in
+    def bayesian_rating(self, rating: Optional[float], count: Optional[int]) -> float:
+        count = count or 0
+        total = self.rating_prior * self.rating_prior_count + (rating or 0.0) * count
+        return total / (self.rating_prior_count + count)
+
+    # same as bayesian_rating, for recomputing stored scores in bulk
+    def bayesian_rating_expression(self, model=Provider):
+        count = func.coalesce(model.rating_count, 0)
+        return (
+            self.rating_prior * self.rating_prior_count
+            + func.coalesce(model.rating, 0.0) * count
+        ) / (self.rating_prior_count + count)
+
+    # store the smoothed rating that rating sorts and the composite score read
+    def apply_rating_score(self, provider: Provider) -> None:
+        provider.rating_score = self.bayesian_rating(
+            provider.rating, provider.rating_count
+        )
+
+    # recompute every stored score, after changing the rating prior
+    def rescore(self, db: Session) -> int:
+        result = db.execute(
+            update(Provider).values(rating_score=self.bayesian_rating_expression())
+        )
+        db.execute(
+            update(ProviderSearchDoc).values(
+                rating_score=self.bayesian_rating_expression(ProviderSearchDoc)
+            )
+        )
+        db.commit()
+        return result.rowcount
+
+    # weighted sum of per-signal scores, each between 0 and 1
+    def score_expression(self, distance=None):
+        weights = self.weights
+        rating = func.coalesce(ProviderSearchDoc.rating_score, self.rating_prior) / MAX_RATING
+        # cheaper is better, unpriced providers count as the reference price
+        pricing = func.coalesce(func.nullif(ProviderSearchDoc.pricing, 0.0), self.price_reference)
+        price = self.price_reference / (self.price_reference + pricing)
+        experience = func.least(
+            func.coalesce(ProviderSearchDoc.experience_years, 0), self.experience_cap_years
+        ) / float(self.experience_cap_years)
+
+        score = (
+            weights.rating * rating
+            + weights.price * price
+            + weights.experience * experience
+        )
+        if distance is not None:
+            score = score + weights.distance * func.exp(-distance / self.distance_decay_km)
+
+        return score
+
+    # ORDER BY clauses for a sort_by option, ending on the primary key
+    def order_by(self, sort_by: str, distance=None) -> List:
+        if sort_by == "distance" and distance is not None:
+            order = [distance.asc()]
+        elif sort_by == "rating":
+            order = [ProviderSearchDoc.rating_score.desc().nulls_last()]
+        elif sort_by == "price":
+            order = [ProviderSearchDoc.pricing.asc().nulls_last()]
+        else:
+            order = [self.score_expression(distance).desc()]
+
+        return order + [ProviderSearchDoc.provider_id]
+
+
+# instance
+ranking = RankingEngine()
@@ -0,0 +1,171 @@
+from typing import Dict, Iterable, List
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, joinedload
+
+from app.core.logging import get_logger
+from app.models.provider import Provider
+from app.models.provider_search_doc import ProviderSearchDoc
+from app.models.service import ServiceCategory
+from app.models.user import User, normalize_location
+from app.schemas.provider import ProviderWithUser
+
+logger = get_logger("search_docs")
+
+REBUILD_BATCH_SIZE = 500
+
+
+# name and services outrank category keywords, which outrank the location
+def search_vector_expression(name, services, keywords, location):
+    return (
+        func.setweight(func.to_tsvector("english", " ".join([name or ""] + services)), "A")
+        .op("||")(func.setweight(func.to_tsvector("english", " ".join(keywords)), "B"))
+        .op("||")(func.setweight(func.to_tsvector("english", location or ""), "C"))
+    )
+
+
+# keeps provider_search_docs in step with providers, users and reviews
+#
+# writes go through the caller's session before it commits, so a provider
+# and its search document change in the same transaction. the provider is
+# flushed and reloaded first, so columns the database fills in (created_at,
+# updated_at) are stored as they will be committed
+class SearchDocService:
+
+    # the provider_search_docs row for an approved provider
+    @staticmethod
+    def build_row(provider: Provider, keywords: Iterable[str]) -> Dict:
+        user = provider.user
+        services = list(provider.services or [])
+        document = ProviderWithUser.model_validate(provider).model_dump(
+            mode="json", exclude={"distance_km"}
+        )
+
+        return {
+            "provider_id": provider.provider_id,
+            "user_id": provider.user_id,
+            "name": user.name,
+            "location": user.location,
+            "location_normalized": normalize_location(user.location or ""),
+            "latitude": provider.latitude,
+            "longitude": provider.longitude,
+            "service_radius": provider.service_radius,
+            "coverage_min_lat": provider.coverage_min_lat,
+            "coverage_max_lat": provider.coverage_max_lat,
+            "coverage_min_lng": provider.coverage_min_lng,
+            "coverage_max_lng": provider.coverage_max_lng,
+            "services": services,
+            "pricing": provider.pricing,
+            "rating": provider.rating,
+            "rating_count": provider.rating_count,
+            "rating_score": provider.rating_score,
+            "experience_years": provider.experience_years,
+            "availability": provider.availability,
+            "created_at": provider.created_at,
+            "search_vector": search_vector_expression(
+                user.name, services, keywords, user.location
+            ),
+            "document": document,
+        }
+
+    @staticmethod
+    def _keywords(db: Session, services: List[str]) -> Dict[str, List[str]]:
+        if not services:
+            return {}
+
+        rows = (
+            db.query(ServiceCategory.name, ServiceCategory.keywords)
+            .filter(ServiceCategory.name.in_(services))
+            .all()
+        )
+        return {name: keywords or [] for name, keywords in rows}
+
+    @staticmethod
+    def _upsert(db: Session, rows: List[Dict]) -> None:
+        statement = insert(ProviderSearchDoc).values(rows)
+        columns = {
+            name: statement.excluded[name] for name in rows[0] if name != "provider_id"
+        }
+        columns["synced_at"] = func.now()
+        db.execute(
+            statement.on_conflict_do_update(index_elements=["provider_id"], set_=columns)
+        )
+
+    # write or drop a provider's document, call before committing
+    @staticmethod
+    def sync(db: Session, provider: Provider) -> None:
+        if not provider.approved:
+            db.query(ProviderSearchDoc).filter(
+                ProviderSearchDoc.provider_id == provider.provider_id
+            ).delete(synchronize_session=False)
+            return
+
+        db.flush()
+        db.refresh(provider)
+        db.refresh(provider.user)
+
+        keywords = SearchDocService._keywords(db, list(provider.services or []))
+        row = SearchDocService.build_row(
+            provider, [word for words in keywords.values() for word in words]
+        )
+        SearchDocService._upsert(db, [row])
+
+    # a user's name, contact or location shows up in their provider document
+    @staticmethod
+    def sync_user(db: Session, user: User) -> None:
+        provider = db.query(Provider).filter(Provider.user_id == user.id).first()
+        if provider:
+            SearchDocService.sync(db, provider)
+
+    # rewrite the whole table from the source rows, for recovery
+    @staticmethod
+    def rebuild(db: Session, batch_size: int = REBUILD_BATCH_SIZE) -> int:
+        keywords = {
+            name: words or []
+            for name, words in db.query(ServiceCategory.name, ServiceCategory.keywords)
+        }
+
+        db.query(ProviderSearchDoc).delete(synchronize_session=False)
+
+        query = (
+            db.query(Provider)
+            .options(joinedload(Provider.user))
+            .filter(Provider.approved == True)
+            .order_by(Provider.provider_id)
+        )
+
+        count = 0
+        last_id = None
+        while True:
+            batch = query
+            if last_id is not None:
+                batch = batch.filter(Provider.provider_id > last_id)
+            providers = batch.limit(batch_size).all()
+            if not providers:
+                break
+
+            rows = [
+                SearchDocService.build_row(
+                    provider,
+                    [
+                        word
+                        for service in provider.services or []
+                        for word in keywords.get(service, [])
+                    ],
+                )
+                for provider in providers
+            ]
+            SearchDocService._upsert(db, rows)
+
+            count += len(rows)
+            last_id = providers[-1].provider_id
+            db.expunge_all()
+
+        db.commit()
+        logger.info("Provider search documents rebuilt", providers=count)
+        return count
+
+
+# instance
+search_docs = SearchDocService()
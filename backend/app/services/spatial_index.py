@@ -0,0 +1,448 @@
+import asyncio
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows, where development runs a single worker
+    fcntl = None
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.models.provider import Provider, DEFAULT_SERVICE_RADIUS_KM
+from app.models.provider_search_doc import ProviderSearchDoc
+from app.services.geolocation import GeolocationService
+
+logger = get_logger("spatial_index")
+
+# Goa bounding box, providers outside it are clamped into the edge cells
+MIN_LAT, MAX_LAT = 14.85, 15.85
+MIN_LNG, MAX_LNG = 73.65, 74.35
+CELL_DEG = 0.02  # roughly 2 km
+
+GRID_ROWS = int(math.ceil((MAX_LAT - MIN_LAT) / CELL_DEG))
+GRID_COLS = int(math.ceil((MAX_LNG - MIN_LNG) / CELL_DEG))
+
+# how often a worker checks whether another worker rewrote the snapshot
+RELOAD_INTERVAL = 1.0
+
+RECORD_DTYPE = np.dtype(
+    [
+        ("provider_id", "V16"),
+        ("lat", "f8"),
+        ("lng", "f8"),
+        ("services", "u8"),
+        ("rating", "f8"),
+        ("pricing", "f8"),
+        ("radius", "f8"),
+        ("available", "?"),
+        ("cell", "i4"),
+    ]
+)
+
+
+def _cells(lat, lng):
+    rows = np.clip(((lat - MIN_LAT) // CELL_DEG).astype(np.int64), 0, GRID_ROWS - 1)
+    cols = np.clip(((lng - MIN_LNG) // CELL_DEG).astype(np.int64), 0, GRID_COLS - 1)
+    return rows * GRID_COLS + cols
+
+
+# one snapshot writer at a time across workers
+@contextmanager
+def _writer_lock(path: str):
+    if fcntl is None:
+        yield
+        return
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f"{path}.lock", "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+# grid index of approved providers, shared between workers via a mmap snapshot
+#
+# a snapshot is a records file plus {path}.json naming it and the service
+# bit list it was encoded with. writers replace the json in one rename, so
+# records and service bits always change together
+class ProviderSpatialIndex:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.ready = False
+        self._lock = threading.Lock()
+        # upserts not merged into the snapshot yet, None drops the provider
+        self._pending: Dict[bytes, Optional[Tuple[List[str], np.ndarray]]] = {}
+        self._reset(np.zeros(0, dtype=RECORD_DTYPE), [])
+
+    def _reset(self, base: np.ndarray, services: List[str]):
+        # base rows are sorted by cell, cell_offsets[c] is the first row of cell c
+        self._base = base
+        self._cell_offsets = np.searchsorted(
+            base["cell"], np.arange(GRID_ROWS * GRID_COLS + 1)
+        )
+        self._base_rows = {bytes(pid): i for i, pid in enumerate(base["provider_id"])}
+        self._masked = np.zeros(len(base), dtype=bool)
+        self._overlay: Dict[bytes, np.ndarray] = {}
+        self._overlay_array = np.zeros(0, dtype=RECORD_DTYPE)
+        self._service_bits = {name: bit for bit, name in enumerate(services)}
+        self._mtime = None
+        self._checked_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return int((~self._masked).sum()) + len(self._overlay_array)
+
+    # bitmask for a list of service names, registering unseen names
+    def _service_mask(
+        self, services: Optional[List[str]], bits: Optional[Dict[str, int]] = None
+    ) -> int:
+        bits = self._service_bits if bits is None else bits
+        mask = 0
+        for name in services or []:
+            if name not in bits:
+                if len(bits) >= 64:
+                    logger.warning("Service bitmask is full", service=name)
+                    continue
+                bits[name] = len(bits)
+            mask |= 1 << bits[name]
+        return mask
+
+    def _record(self, provider: Provider) -> np.ndarray:
+        record = np.zeros(1, dtype=RECORD_DTYPE)
+        record["provider_id"] = np.void(uuid.UUID(str(provider.provider_id)).bytes)
+        record["lat"] = provider.latitude
+        record["lng"] = provider.longitude
+        record["services"] = self._service_mask(provider.services)
+        record["rating"] = provider.rating or 0.0
+        record["pricing"] = provider.pricing or 0.0
+        record["radius"] = (
+            provider.service_radius
+            if provider.service_radius is not None
+            else DEFAULT_SERVICE_RADIUS_KM
+        )
+        record["available"] = bool(provider.availability)
+        record["cell"] = _cells(record["lat"], record["lng"])
+        return record
+
+    # build the index from the provider search documents
+    def build(self, db: Session) -> None:
+        providers = (
+            db.query(ProviderSearchDoc)
+            .filter(
+                ProviderSearchDoc.latitude.isnot(None),
+                ProviderSearchDoc.longitude.isnot(None),
+            )
+            .all()
+        )
+
+        with self._lock:
+            self._reset(np.zeros(0, dtype=RECORD_DTYPE), list(self._service_bits))
+            records = [self._record(provider) for provider in providers]
+            base = np.concatenate(records) if records else self._base
+            services = list(self._service_bits)
+            self._reset(np.sort(base, order=["cell"], kind="stable"), services)
+            self.ready = True
+
+        logger.info("Provider spatial index built", providers=len(providers))
+
+    # insert, update or drop a provider after a committed write
+    #
+    # applies to this worker at once, publish merges it into the snapshot
+    def upsert(self, provider: Provider) -> None:
+        if not self.ready:
+            return
+
+        key = uuid.UUID(str(provider.provider_id)).bytes
+        change = None
+
+        with self._lock:
+            if (
+                provider.approved
+                and provider.latitude is not None
+                and provider.longitude is not None
+            ):
+                change = (list(provider.services or []), self._record(provider))
+
+            self._apply(key, change)
+            self._overlay_changed()
+            if self.path:
+                self._pending[key] = change
+
+    def _apply(self, key: bytes, change) -> None:
+        row = self._base_rows.get(key)
+        if row is not None:
+            self._masked[row] = True
+
+        if change is None:
+            self._overlay.pop(key, None)
+            return
+
+        services, record = change
+        record = record.copy()
+        record["services"] = self._service_mask(services)
+        self._overlay[key] = record
+
+    def _overlay_changed(self) -> None:
+        self._overlay_array = (
+            np.concatenate(list(self._overlay.values()))
+            if self._overlay
+            else np.zeros(0, dtype=RECORD_DTYPE)
+        )
+
+    # merge this worker's upserts into the snapshot, off the event loop
+    async def publish(self) -> None:
+        if not (self.path and self._pending):
+            return
+
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.merge)
+        except Exception as e:
+            logger.warning("Provider spatial index merge failed", error=str(e))
+
+    # apply the pending upserts to the current snapshot
+    #
+    # the snapshot is re-read under the writer lock, so upserts other
+    # workers merged since this one last loaded it are kept, and new
+    # services get the next free bit of the snapshot's own list
+    def merge(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not path or not pending:
+            return
+
+        try:
+            with _writer_lock(path):
+                snapshot = self._read(path)
+                if snapshot is None:
+                    # nothing to merge into, write what this worker has
+                    with self._lock:
+                        records = self._records()
+                        services = list(self._service_bits)
+                    self._write(path, records, services, None)
+                else:
+                    base, services, previous = snapshot
+                    bits = {name: bit for bit, name in enumerate(services)}
+                    changed = np.array(list(pending), dtype="S16")
+                    kept = base[~np.isin(base["provider_id"].view("S16"), changed)]
+
+                    updates = []
+                    for change in pending.values():
+                        if change is not None:
+                            names, record = change
+                            record = record.copy()
+                            record["services"] = self._service_mask(names, bits)
+                            updates.append(record)
+
+                    records = np.concatenate([kept, *updates])
+                    self._write(path, records, list(bits), previous)
+
+        except Exception:
+            with self._lock:
+                self._pending = {**pending, **self._pending}
+            raise
+
+        self.load(path)
+
+    # write this index as the snapshot, replacing whatever is there
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        if not path:
+            return
+
+        with self._lock:
+            records = self._records()
+            services = list(self._service_bits)
+            self._pending.clear()
+
+        with _writer_lock(path):
+            snapshot = self._read(path)
+            self._write(path, records, services, snapshot[2] if snapshot else None)
+
+        self.load(path)
+
+    def _records(self) -> np.ndarray:
+        return np.concatenate([self._base[~self._masked], self._overlay_array])
+
+    # records, service names and records file of the snapshot, None if
+    # there is none (or it is from an older layout)
+    @staticmethod
+    def _read(path: str, mmap_mode: Optional[str] = None):
+        try:
+            with open(f"{path}.json") as f:
+                meta = json.load(f)
+            directory = os.path.dirname(os.path.abspath(path))
+            base = np.load(os.path.join(directory, meta["array"]), mmap_mode=mmap_mode)
+        except (OSError, KeyError, ValueError):
+            return None
+
+        if base.dtype != RECORD_DTYPE:
+            logger.warning("Ignoring snapshot with an old record layout", path=path)
+            return None
+        return base, meta["services"], meta["array"]
+
+    # called with the writer lock held
+    @staticmethod
+    def _write(
+        path: str, records: np.ndarray, services: List[str], previous: Optional[str]
+    ) -> None:
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        # a new records file every time, so readers never map a partial one
+        array = f"{os.path.basename(path)}.{uuid.uuid4().hex[:12]}.npy"
+        with open(os.path.join(directory, array), "wb") as f:
+            np.save(f, np.sort(records, order=["cell"], kind="stable"))
+
+        tmp_path = f"{path}.json.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {"array": array, "services": services, "built_at": time.time()}, f
+            )
+        os.replace(tmp_path, f"{path}.json")
+
+        # workers that still map the old file keep their pages until they reload
+        if previous:
+            try:
+                os.remove(os.path.join(directory, previous))
+            except OSError:
+                pass
+
+    # map the snapshot file read-only, the pages are shared by every worker
+    def load(self, path: Optional[str] = None) -> bool:
+        path = path or self.path
+        if not path:
+            return False
+
+        # stat first, a snapshot written while this one loads is picked up
+        # by the next _maybe_reload
+        try:
+            mtime = os.stat(f"{path}.json").st_mtime_ns
+        except OSError:
+            return False
+
+        snapshot = self._read(path, mmap_mode="r")
+        if snapshot is None:
+            return False
+        base, services, _ = snapshot
+
+        with self._lock:
+            self._reset(base, services)
+            # this worker's upserts that aren't merged yet stay visible
+            for key, change in self._pending.items():
+                self._apply(key, change)
+            self._overlay_changed()
+            self._mtime = mtime
+            self.ready = True
+
+        return True
+
+    # load the snapshot, building it from the database if none exists yet
+    def load_or_build(self, db: Session) -> None:
+        if not self.load():
+            self.build(db)
+            self.save()
+
+    # pick up a snapshot rewritten by another worker
+    def _maybe_reload(self) -> None:
+        if not self.path or time.monotonic() - self._checked_at < RELOAD_INTERVAL:
+            return
+
+        self._checked_at = time.monotonic()
+        try:
+            mtime = os.stat(f"{self.path}.json").st_mtime_ns
+        except OSError:
+            return
+
+        if mtime != self._mtime:
+            self.load()
+
+    def _candidates(self, lat: float, lng: float, radius_km: float) -> np.ndarray:
+        min_lat, max_lat, min_lng, max_lng = GeolocationService.bounding_box(
+            lat, lng, radius_km
+        )
+        first = _cells(np.array([min_lat]), np.array([min_lng]))[0]
+        last = _cells(np.array([max_lat]), np.array([max_lng]))[0]
+        first_row, first_col = divmod(int(first), GRID_COLS)
+        last_row, last_col = divmod(int(last), GRID_COLS)
+
+        # each grid row of the box is one contiguous slice of the base array
+        slices = []
+        for row in range(first_row, last_row + 1):
+            start = self._cell_offsets[row * GRID_COLS + first_col]
+            stop = self._cell_offsets[row * GRID_COLS + last_col + 1]
+            if stop > start:
+                slices.append(np.arange(start, stop))
+
+        rows = np.concatenate(slices) if slices else np.zeros(0, dtype=np.int64)
+        rows = rows[~self._masked[rows]]
+
+        return np.concatenate([self._base[rows], self._overlay_array])
+
+    # provider ids within radius_km of a point, nearest first
+    #
+    # None when the index can't answer, for a service without a bit (new
+    # since the snapshot, or past the 64 a mask holds), so ask SQL instead
+    def query(
+        self,
+        lat: float,
+        lng: float,
+        radius_km: float,
+        service: Optional[str] = None,
+        min_rating: Optional[float] = None,
+        max_price: Optional[float] = None,
+        available_only: bool = True,
+        skip: int = 0,
+        limit: int = 100,
+    ) -> Optional[List[Tuple[uuid.UUID, float]]]:
+        self._maybe_reload()
+
+        # a merge on an executor thread may swap the arrays in the meantime
+        with self._lock:
+            candidates = self._candidates(lat, lng, radius_km)
+            bit = self._service_bits.get(service)
+        keep = np.ones(len(candidates), dtype=bool)
+
+        if service:
+            if bit is None:
+                return None
+            keep &= (candidates["services"] & np.uint64(1 << bit)) != 0
+
+        if min_rating:
+            keep &= candidates["rating"] >= min_rating
+
+        if max_price:
+            keep &= (candidates["pricing"] > 0) & (candidates["pricing"] <= max_price)
+
+        if available_only:
+            keep &= candidates["available"]
+
+        candidates = candidates[keep]
+        distances = GeolocationService.haversine_km(
+            lat, lng, candidates["lat"], candidates["lng"]
+        )
+        # the customer must also be inside the provider's own service radius
+        within = (distances <= radius_km) & (distances <= candidates["radius"])
+        candidates, distances = candidates[within], distances[within]
+
+        order = np.argsort(distances, kind="stable")[skip : skip + limit]
+
+        return [
+            (uuid.UUID(bytes=bytes(candidates["provider_id"][i])), float(distances[i]))
+            for i in order
+        ]
+
+
+# instance
+provider_index = ProviderSpatialIndex(settings.SPATIAL_INDEX_PATH)
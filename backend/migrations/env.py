@@ -9,7 +9,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.core.config import settings
 from app.core.database import Base
-from app.models import user, provider, booking, review, service
+from app.models import user, provider, booking, review, service, provider_search_doc
 
 # this is the Alembic Config object
 config = context.config
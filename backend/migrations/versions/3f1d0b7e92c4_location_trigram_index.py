@@ -0,0 +1,61 @@
+"""location trigram index
+
+Revision ID: 3f1d0b7e92c4
+Revises: aa55d6379e5d
+Create Date: 2026-10-17 15:20:43.905512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '3f1d0b7e92c4'
+down_revision = 'aa55d6379e5d'
+branch_labels = None
+depends_on = None
+
+INVALID_INDEX = sa.text(
+    "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+    "WHERE c.relname = :name AND NOT i.indisvalid"
+)
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column(
+        'users',
+        sa.Column(
+            'location_normalized',
+            sa.String(),
+            sa.Computed("btrim(regexp_replace(lower(location), '[^a-z0-9]+', ' ', 'g'))", persisted=True),
+            nullable=True,
+        ),
+    )
+
+    # CONCURRENTLY can't run inside a transaction, and doesn't block writes
+    with op.get_context().autocommit_block():
+        # an interrupted concurrent build leaves an invalid index behind
+        if op.get_bind().execute(INVALID_INDEX, {'name': 'ix_users_location_trgm'}).first():
+            op.drop_index('ix_users_location_trgm', table_name='users', postgresql_concurrently=True)
+
+        op.create_index(
+            'ix_users_location_trgm',
+            'users',
+            ['location_normalized'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_ops={'location_normalized': 'gin_trgm_ops'},
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_users_location_trgm',
+            table_name='users',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.drop_column('users', 'location_normalized')
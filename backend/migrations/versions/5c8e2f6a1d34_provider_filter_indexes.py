@@ -0,0 +1,59 @@
+"""provider filter indexes
+
+Revision ID: 5c8e2f6a1d34
+Revises: d41a7c3e5b90
+Create Date: 2026-10-17 18:04:55.318802
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '5c8e2f6a1d34'
+down_revision = 'd41a7c3e5b90'
+branch_labels = None
+depends_on = None
+
+INVALID_INDEX = sa.text(
+    "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+    "WHERE c.relname = :name AND NOT i.indisvalid"
+)
+
+
+def upgrade() -> None:
+    # CONCURRENTLY can't run inside a transaction, and doesn't block writes
+    with op.get_context().autocommit_block():
+        # an interrupted concurrent build leaves an invalid index behind
+        for name in ('ix_providers_rating', 'ix_providers_services'):
+            if op.get_bind().execute(INVALID_INDEX, {'name': name}).first():
+                op.drop_index(name, table_name='providers', postgresql_concurrently=True)
+
+        op.create_index(
+            'ix_providers_rating',
+            'providers',
+            ['approved', 'availability', 'rating'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            'ix_providers_services',
+            'providers',
+            ['services'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_where=sa.text('approved = true'),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in ('ix_providers_services', 'ix_providers_rating'):
+            op.drop_index(
+                name,
+                table_name='providers',
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
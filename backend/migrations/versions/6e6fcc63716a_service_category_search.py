@@ -0,0 +1,66 @@
+"""service category search
+
+Revision ID: 6e6fcc63716a
+Revises: 3f1d0b7e92c4
+Create Date: 2026-10-17 16:02:17.650391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '6e6fcc63716a'
+down_revision = '3f1d0b7e92c4'
+branch_labels = None
+depends_on = None
+
+INVALID_INDEX = sa.text(
+    "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+    "WHERE c.relname = :name AND NOT i.indisvalid"
+)
+
+
+def upgrade() -> None:
+    op.add_column('service_categories', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+
+    # same weighting as app.models.service.search_vector_expression
+    op.execute(
+        """
+        UPDATE service_categories SET search_vector =
+            setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(array_to_string(keywords, ' '), '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(description, '')), 'C')
+        """
+    )
+
+    # CONCURRENTLY can't run inside a transaction, and doesn't block writes
+    with op.get_context().autocommit_block():
+        # an interrupted concurrent build leaves an invalid index behind
+        if op.get_bind().execute(INVALID_INDEX, {'name': 'ix_service_categories_search'}).first():
+            op.drop_index(
+                'ix_service_categories_search',
+                table_name='service_categories',
+                postgresql_concurrently=True,
+            )
+
+        op.create_index(
+            'ix_service_categories_search',
+            'service_categories',
+            ['search_vector'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_service_categories_search',
+            table_name='service_categories',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.drop_column('service_categories', 'search_vector')
@@ -0,0 +1,60 @@
+"""concurrent foreign key and filter indexes
+
+Revision ID: 7a3f9d2b6e18
+Revises: 5c8e2f6a1d34
+Create Date: 2026-10-17 18:41:09.562730
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '7a3f9d2b6e18'
+down_revision = '5c8e2f6a1d34'
+branch_labels = None
+depends_on = None
+
+# bookings.customer_id / provider_id, reviews.provider_id and providers.services
+# are already the leading columns of ix_bookings_customer_date,
+# ix_bookings_provider_date, ix_reviews_provider_created and
+# ix_providers_services
+INDEXES = [
+    ('ix_bookings_provider_status_date', 'bookings', ['provider_id', 'status', 'date_time']),
+    ('ix_bookings_status_date', 'bookings', ['status', 'date_time']),
+    ('ix_bookings_date_time', 'bookings', ['date_time']),
+    ('ix_reviews_customer_id', 'reviews', ['customer_id']),
+]
+
+INVALID_INDEX = sa.text(
+    "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+    "WHERE c.relname = :name AND NOT i.indisvalid"
+)
+
+
+def upgrade() -> None:
+    # CONCURRENTLY can't run inside a transaction, and doesn't block writes
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            # an interrupted concurrent build leaves an invalid index behind
+            if op.get_bind().execute(INVALID_INDEX, {'name': name}).first():
+                op.drop_index(name, table_name=table, postgresql_concurrently=True)
+
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
@@ -0,0 +1,57 @@
+"""keyset pagination indexes
+
+Revision ID: 9b2c4e81d07f
+Revises: 6e6fcc63716a
+Create Date: 2026-10-17 16:48:30.221764
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '9b2c4e81d07f'
+down_revision = '6e6fcc63716a'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_users_created_at_id', 'users', ['created_at', 'id']),
+    ('ix_providers_created_at_id', 'providers', ['created_at', 'provider_id']),
+    ('ix_bookings_customer_date', 'bookings', ['customer_id', 'date_time', 'booking_id']),
+    ('ix_bookings_provider_date', 'bookings', ['provider_id', 'date_time', 'booking_id']),
+    ('ix_reviews_provider_created', 'reviews', ['provider_id', 'created_at', 'review_id']),
+]
+
+INVALID_INDEX = sa.text(
+    "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+    "WHERE c.relname = :name AND NOT i.indisvalid"
+)
+
+
+def upgrade() -> None:
+    # CONCURRENTLY can't run inside a transaction, and doesn't block writes
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            # an interrupted concurrent build leaves an invalid index behind
+            if op.get_bind().execute(INVALID_INDEX, {'name': name}).first():
+                op.drop_index(name, table_name=table, postgresql_concurrently=True)
+
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
@@ -0,0 +1,64 @@
+"""provider coverage box
+
+Revision ID: aa55d6379e5d
+Revises: c855d58cc971
+Create Date: 2026-10-17 14:36:51.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'aa55d6379e5d'
+down_revision = 'c855d58cc971'
+branch_labels = None
+depends_on = None
+
+INVALID_INDEX = sa.text(
+    "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+    "WHERE c.relname = :name AND NOT i.indisvalid"
+)
+
+
+def upgrade() -> None:
+    op.add_column('providers', sa.Column('coverage_min_lat', sa.Float(), nullable=True))
+    op.add_column('providers', sa.Column('coverage_max_lat', sa.Float(), nullable=True))
+    op.add_column('providers', sa.Column('coverage_min_lng', sa.Float(), nullable=True))
+    op.add_column('providers', sa.Column('coverage_max_lng', sa.Float(), nullable=True))
+
+    # same box as GeolocationService.bounding_box for existing providers
+    op.execute(
+        """
+        UPDATE providers SET
+            coverage_min_lat = latitude - degrees(COALESCE(service_radius, 10.0) / 6371.0088),
+            coverage_max_lat = latitude + degrees(COALESCE(service_radius, 10.0) / 6371.0088),
+            coverage_min_lng = longitude - degrees(COALESCE(service_radius, 10.0) / (6371.0088 * cos(radians(latitude)))),
+            coverage_max_lng = longitude + degrees(COALESCE(service_radius, 10.0) / (6371.0088 * cos(radians(latitude))))
+        WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+        """
+    )
+
+    # CONCURRENTLY can't run inside a transaction, and doesn't block writes
+    with op.get_context().autocommit_block():
+        # an interrupted concurrent build leaves an invalid index behind
+        if op.get_bind().execute(INVALID_INDEX, {'name': 'ix_providers_coverage_box'}).first():
+            op.drop_index('ix_providers_coverage_box', table_name='providers', postgresql_concurrently=True)
+
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_providers_coverage_box ON providers USING gist "
+            "(box(point(coverage_min_lng, coverage_min_lat), point(coverage_max_lng, coverage_max_lat)))"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_providers_coverage_box',
+            table_name='providers',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.drop_column('providers', 'coverage_max_lng')
+    op.drop_column('providers', 'coverage_min_lng')
+    op.drop_column('providers', 'coverage_max_lat')
+    op.drop_column('providers', 'coverage_min_lat')
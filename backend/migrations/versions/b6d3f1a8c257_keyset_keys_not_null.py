@@ -0,0 +1,45 @@
+"""keyset sort keys not null
+
+Revision ID: b6d3f1a8c257
+Revises: e8b41f7c2a95
+Create Date: 2026-10-17 21:05:41.630298
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b6d3f1a8c257'
+down_revision = 'e8b41f7c2a95'
+branch_labels = None
+depends_on = None
+
+# keyset pagination skips rows whose sort key is NULL
+TABLES = ['users', 'providers', 'reviews', 'provider_search_docs']
+
+
+def upgrade() -> None:
+    # each statement commits on its own, so no lock is held across the
+    # validation scan
+    with op.get_context().autocommit_block():
+        op.execute("UPDATE users SET created_at = COALESCE(updated_at, now()) WHERE created_at IS NULL")
+        op.execute("UPDATE providers SET created_at = COALESCE(updated_at, now()) WHERE created_at IS NULL")
+        op.execute("UPDATE reviews SET created_at = now() WHERE created_at IS NULL")
+        op.execute(
+            "UPDATE provider_search_docs d SET created_at = p.created_at "
+            "FROM providers p WHERE p.provider_id = d.provider_id AND d.created_at IS NULL"
+        )
+
+        for table in TABLES:
+            # VALIDATE scans without blocking writes, and SET NOT NULL then
+            # trusts the validated check instead of scanning again
+            check = f'ck_{table}_created_at_not_null'
+            op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {check} CHECK (created_at IS NOT NULL) NOT VALID")
+            op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {check}")
+            op.alter_column(table, 'created_at', existing_type=sa.DateTime(timezone=True), nullable=False)
+            op.drop_constraint(check, table, type_='check')
+
+
+def downgrade() -> None:
+    for table in reversed(TABLES):
+        op.alter_column(table, 'created_at', existing_type=sa.DateTime(timezone=True), nullable=True)
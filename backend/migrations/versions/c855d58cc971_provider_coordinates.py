@@ -0,0 +1,56 @@
+"""provider coordinates
+
+Revision ID: c855d58cc971
+Revises: f372bdf920a2
+Create Date: 2026-10-17 10:12:04.118243
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c855d58cc971'
+down_revision = 'f372bdf920a2'
+branch_labels = None
+depends_on = None
+
+INVALID_INDEX = sa.text(
+    "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+    "WHERE c.relname = :name AND NOT i.indisvalid"
+)
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('users', sa.Column('longitude', sa.Float(), nullable=True))
+    op.add_column('providers', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('providers', sa.Column('longitude', sa.Float(), nullable=True))
+
+    # CONCURRENTLY can't run inside a transaction, and doesn't block writes
+    with op.get_context().autocommit_block():
+        # an interrupted concurrent build leaves an invalid index behind
+        if op.get_bind().execute(INVALID_INDEX, {'name': 'ix_providers_lat_lng'}).first():
+            op.drop_index('ix_providers_lat_lng', table_name='providers', postgresql_concurrently=True)
+
+        op.create_index(
+            'ix_providers_lat_lng',
+            'providers',
+            ['latitude', 'longitude'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_providers_lat_lng',
+            table_name='providers',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.drop_column('providers', 'longitude')
+    op.drop_column('providers', 'latitude')
+    op.drop_column('users', 'longitude')
+    op.drop_column('users', 'latitude')
@@ -0,0 +1,67 @@
+"""provider ranking
+
+Revision ID: d41a7c3e5b90
+Revises: 9b2c4e81d07f
+Create Date: 2026-10-17 17:25:12.774019
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'd41a7c3e5b90'
+down_revision = '9b2c4e81d07f'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_providers_rating_score', ['approved', 'availability', sa.text('rating_score DESC NULLS LAST'), 'provider_id']),
+    ('ix_providers_pricing', ['approved', 'availability', 'pricing', 'provider_id']),
+]
+
+INVALID_INDEX = sa.text(
+    "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+    "WHERE c.relname = :name AND NOT i.indisvalid"
+)
+
+
+def upgrade() -> None:
+    op.add_column('providers', sa.Column('rating_score', sa.Float(), nullable=True))
+
+    # default RANK_RATING_PRIOR / RANK_RATING_PRIOR_COUNT, run
+    # scripts/rescore_providers.py after changing them
+    op.execute(
+        """
+        UPDATE providers SET rating_score =
+            (3.5 * 10 + COALESCE(rating, 0) * COALESCE(rating_count, 0))
+            / (10 + COALESCE(rating_count, 0))
+        """
+    )
+
+    # CONCURRENTLY can't run inside a transaction, and doesn't block writes
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            # an interrupted concurrent build leaves an invalid index behind
+            if op.get_bind().execute(INVALID_INDEX, {'name': name}).first():
+                op.drop_index(name, table_name='providers', postgresql_concurrently=True)
+
+            op.create_index(
+                name,
+                'providers',
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name='providers',
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
+    op.drop_column('providers', 'rating_score')
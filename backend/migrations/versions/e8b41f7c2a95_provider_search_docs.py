@@ -0,0 +1,118 @@
+"""provider search documents
+
+Revision ID: e8b41f7c2a95
+Revises: 7a3f9d2b6e18
+Create Date: 2026-10-17 20:12:37.184502
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'e8b41f7c2a95'
+down_revision = '7a3f9d2b6e18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_table(
+        'provider_search_docs',
+        sa.Column('provider_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('location', sa.String(), nullable=True),
+        sa.Column('location_normalized', sa.String(), nullable=True),
+        sa.Column('latitude', sa.Float(), nullable=True),
+        sa.Column('longitude', sa.Float(), nullable=True),
+        sa.Column('service_radius', sa.Float(), nullable=True),
+        sa.Column('coverage_min_lat', sa.Float(), nullable=True),
+        sa.Column('coverage_max_lat', sa.Float(), nullable=True),
+        sa.Column('coverage_min_lng', sa.Float(), nullable=True),
+        sa.Column('coverage_max_lng', sa.Float(), nullable=True),
+        sa.Column('services', postgresql.ARRAY(sa.String()), nullable=True),
+        sa.Column('pricing', sa.Float(), nullable=True),
+        sa.Column('rating', sa.Float(), nullable=True),
+        sa.Column('rating_count', sa.Integer(), nullable=True),
+        sa.Column('rating_score', sa.Float(), nullable=True),
+        sa.Column('experience_years', sa.Integer(), nullable=True),
+        sa.Column('availability', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True),
+        sa.Column('document', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('synced_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['provider_id'], ['providers.provider_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('provider_id'),
+    )
+    op.create_index('ix_search_docs_created_at_id', 'provider_search_docs', ['created_at', 'provider_id'], unique=False)
+    op.create_index('ix_search_docs_lat_lng', 'provider_search_docs', ['latitude', 'longitude'], unique=False)
+    op.create_index('ix_search_docs_services', 'provider_search_docs', ['services'], unique=False, postgresql_using='gin')
+    op.create_index('ix_search_docs_vector', 'provider_search_docs', ['search_vector'], unique=False, postgresql_using='gin')
+    op.create_index(
+        'ix_search_docs_location_trgm',
+        'provider_search_docs',
+        ['location_normalized'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'location_normalized': 'gin_trgm_ops'},
+    )
+    op.create_index(
+        'ix_search_docs_rating_score',
+        'provider_search_docs',
+        ['availability', sa.text('rating_score DESC NULLS LAST'), 'provider_id'],
+        unique=False,
+    )
+    op.create_index('ix_search_docs_pricing', 'provider_search_docs', ['availability', 'pricing', 'provider_id'], unique=False)
+    op.create_index('ix_search_docs_rating', 'provider_search_docs', ['availability', 'rating'], unique=False)
+    op.execute(
+        "CREATE INDEX ix_search_docs_coverage_box ON provider_search_docs USING gist "
+        "(box(point(coverage_min_lng, coverage_min_lat), point(coverage_max_lng, coverage_max_lat)))"
+    )
+
+    # search reads provider_search_docs only, these served the old joins
+    op.drop_index('ix_providers_coverage_box', table_name='providers')
+    op.drop_index('ix_providers_pricing', table_name='providers')
+    op.drop_index('ix_providers_rating_score', table_name='providers')
+    op.drop_index('ix_providers_rating', table_name='providers')
+    op.drop_index('ix_providers_lat_lng', table_name='providers')
+    op.drop_index('ix_users_location_trgm', table_name='users')
+    op.drop_column('users', 'location_normalized')
+
+    # the documents are built in Python from the ProviderWithUser schema,
+    # run scripts/rebuild_search_docs.py after upgrading
+
+
+def downgrade() -> None:
+    op.add_column(
+        'users',
+        sa.Column(
+            'location_normalized',
+            sa.String(),
+            sa.Computed("btrim(regexp_replace(lower(location), '[^a-z0-9]+', ' ', 'g'))", persisted=True),
+            nullable=True,
+        ),
+    )
+    op.create_index(
+        'ix_users_location_trgm',
+        'users',
+        ['location_normalized'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'location_normalized': 'gin_trgm_ops'},
+    )
+    op.create_index('ix_providers_lat_lng', 'providers', ['latitude', 'longitude'], unique=False)
+    op.create_index('ix_providers_rating', 'providers', ['approved', 'availability', 'rating'], unique=False)
+    op.create_index(
+        'ix_providers_rating_score',
+        'providers',
+        ['approved', 'availability', sa.text('rating_score DESC NULLS LAST'), 'provider_id'],
+        unique=False,
+    )
+    op.create_index('ix_providers_pricing', 'providers', ['approved', 'availability', 'pricing', 'provider_id'], unique=False)
+    op.execute(
+        "CREATE INDEX ix_providers_coverage_box ON providers USING gist "
+        "(box(point(coverage_min_lng, coverage_min_lat), point(coverage_max_lng, coverage_max_lat)))"
+    )
+    op.drop_table('provider_search_docs')
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Geocode users that have a location but no stored coordinates
+"""
+
+import asyncio
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal
+from app.models.user import User
+from app.controllers.user import UserController
+
+
+async def backfill_coordinates():
+    db = SessionLocal()
+
+    try:
+        users = (
+            db.query(User)
+            .filter(User.location.isnot(None), User.latitude.is_(None))
+            .all()
+        )
+        print(f"📍 Geocoding {len(users)} users...")
+
+        resolved = 0
+        for user in users:
+            await UserController.refresh_coordinates(db, user)
+            if user.latitude is not None:
+                resolved += 1
+            db.commit()
+
+        print(f"✅ Stored coordinates for {resolved}/{len(users)} users")
+
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Backfill failed: {e}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(backfill_coordinates())
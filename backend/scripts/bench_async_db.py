@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Compare request latency under concurrent mixed load with a blocking
+Session inside async handlers (the old setup) and the AsyncSession on
+asyncpg, running the same statements against the configured Postgres
+database at a fixed arrival rate on one event loop, like one worker
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import os
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload
+
+from app.controllers.provider import ProviderController
+from app.core.database import AsyncSessionLocal, SessionLocal, async_engine, engine
+from app.models.booking import Booking
+from app.models.provider import Provider
+
+# share of requests per kind, roughly what the API sees
+MIX = {"profile": 0.55, "listing": 0.25, "bookings": 0.15, "report": 0.05}
+
+
+def sample_ids():
+    db = SessionLocal()
+    try:
+        providers = db.scalars(
+            select(Provider.provider_id).where(Provider.approved == True).limit(500)
+        ).all()
+        customers = db.scalars(select(Booking.customer_id).distinct().limit(500)).all()
+    finally:
+        db.close()
+    return providers, customers
+
+
+# the statement one request of a kind runs
+def statement(kind: str, providers, customers):
+    if kind == "profile":
+        return (
+            select(Provider)
+            .options(joinedload(Provider.user))
+            .where(Provider.provider_id == random.choice(providers))
+        )
+    if kind == "listing":
+        return (
+            ProviderController._candidate_query(
+                random.choice(["plumber", None]), 4.0, True
+            )
+            .order_by(*ProviderController._order_by("rating"))
+            .limit(20)
+        )
+    if kind == "bookings":
+        return (
+            select(Booking)
+            .where(Booking.customer_id == random.choice(customers or [None]))
+            .order_by(Booking.date_time.desc())
+            .limit(20)
+        )
+    # a heavier aggregate, the kind of query that stalls everything behind it
+    return (
+        select(Booking.provider_id, func.count(), func.max(Booking.date_time))
+        .group_by(Booking.provider_id)
+        .order_by(func.count().desc())
+        .limit(20)
+    )
+
+
+def blocking_request(stmt):
+    db = SessionLocal()
+    try:
+        return db.execute(stmt).all()
+    finally:
+        db.close()
+
+
+async def async_request(stmt):
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(stmt)
+        return result.all()
+
+
+# latency is measured from the scheduled arrival, so time spent waiting
+# for a blocked event loop counts against the request
+async def drive(mode: str, rps: int, seconds: float, providers, customers):
+    latencies = defaultdict(list)
+    kinds = random.choices(list(MIX), weights=MIX.values(), k=int(rps * seconds))
+
+    async def one(kind, due):
+        stmt = statement(kind, providers, customers)
+        if mode == "blocking":
+            blocking_request(stmt)
+        else:
+            await async_request(stmt)
+        latencies[kind].append(time.perf_counter() - due)
+
+    start = time.perf_counter()
+    tasks = []
+    for i, kind in enumerate(kinds):
+        due = start + i / rps
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        tasks.append(asyncio.ensure_future(one(kind, due)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    if mode == "async":
+        await async_engine.dispose()
+    return latencies, elapsed
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def report(mode, latencies, elapsed):
+    every = [value for values in latencies.values() for value in values]
+    print(
+        f"{mode:>9} {len(every) / elapsed:>7.1f} req/s "
+        f"p50 {statistics.median(every) * 1000:>8.1f}ms "
+        f"p99 {percentile(every, 0.99) * 1000:>8.1f}ms "
+        f"max {max(every) * 1000:>8.1f}ms"
+    )
+    for kind in MIX:
+        if latencies[kind]:
+            print(
+                f"{kind:>19} p50 {statistics.median(latencies[kind]) * 1000:>8.1f}ms "
+                f"p99 {percentile(latencies[kind], 0.99) * 1000:>8.1f}ms"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rps", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        print("❌ This benchmark needs DATABASE_URL to point at Postgres")
+        sys.exit(1)
+
+    providers, customers = sample_ids()
+    if not providers:
+        print("❌ No approved providers, seed some with scripts/create_dummy_data.py")
+        sys.exit(1)
+
+    print(f"⏱️  {args.rps} requests/s for {args.seconds}s, mix {MIX}")
+    for mode in ("blocking", "async"):
+        random.seed(args.seed)
+        latencies, elapsed = asyncio.run(
+            drive(mode, args.rps, args.seconds, providers, customers)
+        )
+        report(mode, latencies, elapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Compare cache codecs on typical provider search payloads: encode and
+decode time and bytes stored, for pickle (the old format) and each codec
+with and without zstd
+"""
+
+import argparse
+import pickle
+import sys
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.codecs import CODECS, Serializer
+
+SERVICES = ["plumber", "electrician", "carpenter", "painter", "cleaner"]
+TOWNS = ["Panaji", "Margao", "Mapusa", "Vasco da Gama", "Ponda"]
+
+
+# a ProviderWithUser dump, as cached per search and per card
+def provider_document(i: int) -> dict:
+    created = datetime(2025, 1, 1, tzinfo=timezone.utc).isoformat()
+    return {
+        "provider_id": str(uuid.uuid4()),
+        "user_id": str(uuid.uuid4()),
+        "services": [SERVICES[i % 5], SERVICES[(i + 2) % 5]],
+        "pricing": 300.0 + i * 25,
+        "rating": round(3.5 + (i % 15) / 10, 1),
+        "rating_count": 10 + i,
+        "experience_years": i % 12,
+        "availability": i % 3 != 0,
+        "service_radius": 10.0,
+        "latitude": 15.49 + i * 0.001,
+        "longitude": 73.82 + i * 0.001,
+        "approved": True,
+        "created_at": created,
+        "distance_km": round(i * 0.7, 2),
+        "user": {
+            "id": str(uuid.uuid4()),
+            "name": f"Bench Provider {i}",
+            "email": f"provider{i}@example.com",
+            "phone": f"98{i:08d}",
+            "location": f"{TOWNS[i % 5]}, Goa",
+            "user_type": "provider",
+            "created_at": created,
+        },
+    }
+
+
+def timed(func, value, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(value)
+    return (time.perf_counter() - start) / rounds
+
+
+def report(name, encode, decode, value, rounds):
+    data = encode(value)
+    assert decode(data) == value
+    print(
+        f"{name:>16} {len(data):>8} bytes "
+        f"encode {timed(encode, value, rounds) * 1e6:>8.1f}µs "
+        f"decode {timed(decode, data, rounds) * 1e6:>8.1f}µs"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    payloads = {
+        "card (1 provider)": provider_document(0),
+        "search (20 providers)": [provider_document(i) for i in range(20)],
+        "search (100 providers)": [provider_document(i) for i in range(100)],
+    }
+
+    for title, value in payloads.items():
+        print(f"📦 {title}")
+        report("pickle", pickle.dumps, pickle.loads, value, args.rounds)
+        for name in CODECS:
+            for compress_min_bytes, label in ((1 << 30, name), (0, f"{name}+zstd")):
+                serializer = Serializer(name, compress_min_bytes=compress_min_bytes)
+                report(
+                    label,
+                    lambda value: serializer.encode("bench", value),
+                    serializer.decode,
+                    value,
+                    args.rounds,
+                )
+        print()
+
+
+if __name__ == "__main__":
+    main()
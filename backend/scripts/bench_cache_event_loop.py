@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Measure event loop latency while 500 concurrent provider searches are
+answered from the Redis cache, with the old blocking client and the
+shared redis.asyncio pool
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import os
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.controllers.provider import ProviderController
+from app.core import decorators
+from app.core.decorators import make_cache_key
+from app.services.cache import cache
+from app.services.gazetteer import gazetteer
+
+TICK = 0.001
+SEARCH = dict(service="plumber", location="Panaji", limit=20)
+
+
+# what CacheService did before, a blocking round trip inside async code
+class BlockingCache:
+    async def get(self, key):
+        return cache.get_sync(key)
+
+    async def set(self, key, value, ttl=None):
+        return cache.set_sync(key, value, ttl)
+
+
+def fake_results(count=20):
+    return [
+        {
+            "provider_id": str(uuid.uuid4()),
+            "services": ["plumber"],
+            "pricing": 400.0,
+            "rating": 4.5,
+            "distance_km": round(i * 0.7, 2),
+            "user": {"name": f"Bench Provider {i}", "location": "Panaji, Goa"},
+        }
+        for i in range(count)
+    ]
+
+
+# how late a 1ms sleep wakes up while the searches run
+async def monitor_lag(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def run_searches(count: int):
+    search = ProviderController.search_providers_with_location
+    stop, lags = asyncio.Event(), []
+    monitor = asyncio.create_task(monitor_lag(stop, lags))
+    await asyncio.sleep(TICK * 5)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*[search(None, **SEARCH) for _ in range(count)])
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await monitor
+    assert all(len(result) == 20 for result in results)
+    return elapsed, lags
+
+
+def report(title, elapsed, lags):
+    lags = sorted(lags) or [0.0]
+    p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))]
+    print(
+        f"{title:>10} {elapsed * 1000:>9.1f}ms total "
+        f"{len(lags):>6} ticks "
+        f"lag p50 {statistics.median(lags) * 1000:>7.2f}ms "
+        f"p99 {p99 * 1000:>7.2f}ms max {lags[-1] * 1000:>7.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--searches", type=int, default=500)
+    args = parser.parse_args()
+
+    try:
+        cache.sync_client.ping()
+    except Exception as e:
+        print(f"❌ This benchmark needs REDIS_URL to point at a running Redis: {e}")
+        sys.exit(1)
+
+    # warm the entry every search will hit
+    # searches are cached by the coordinates the location geocodes to
+    panaji = gazetteer.lookup(SEARCH["location"])
+    key = make_cache_key(
+        ProviderController._search.__wrapped__,
+        "provider_search",
+        (None, (panaji.lat, panaji.lng), 25.0),
+        {"service": SEARCH["service"], "limit": SEARCH["limit"]},
+    )
+    cache.set_sync(key, fake_results(), ttl=300)
+
+    print(f"⏱️  {args.searches} concurrent cached searches")
+    try:
+        decorators.cache = BlockingCache()
+        report("blocking", *asyncio.run(run_searches(args.searches)))
+
+        decorators.cache = cache
+
+        async def run_async():
+            try:
+                return await run_searches(args.searches)
+            finally:
+                await cache.close()
+
+        report("async", *asyncio.run(run_async()))
+    finally:
+        decorators.cache = cache
+        cache.delete_sync(key)
+
+
+if __name__ == "__main__":
+    main()
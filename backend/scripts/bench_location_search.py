@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Seed 100k users into the configured Postgres database and compare the
+ILIKE and trigram plans behind /api/providers/?location=
+"""
+
+import argparse
+import csv
+import random
+import sys
+import os
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+from app.core.database import SessionLocal, engine, Base
+from app.core.security import get_password_hash
+from app.controllers.provider import ProviderController
+from app.main import app
+from app.models.provider import Provider
+from app.models.provider_search_doc import ProviderSearchDoc
+from app.models.user import User, UserType, normalize_location
+from app.services.gazetteer import DATA_PATH
+from app.services.search_docs import search_docs
+
+BENCH_DOMAIN = "bench.homehero.local"
+BATCH_SIZE = 5_000
+PROVIDER_SHARE = 0.25
+SERVICES = ["plumber", "electrician", "carpenter", "cleaner", "painter"]
+SEARCHES = ["Margao", "Margoa", "calangute", "Vasco da Gama", "Panjim"]
+
+
+def place_names():
+    with open(DATA_PATH, newline="", encoding="utf-8") as f:
+        return [(row["name"], row["taluka"]) for row in csv.DictReader(f)]
+
+
+def seed(db, count, seed_value=42):
+    rng = random.Random(seed_value)
+    places = place_names()
+    password = get_password_hash("BenchPass1")
+
+    print(f"🌱 Seeding {count} users under @{BENCH_DOMAIN}...")
+    for start in range(0, count, BATCH_SIZE):
+        users, providers = [], []
+        for i in range(start, min(start + BATCH_SIZE, count)):
+            name, taluka = rng.choice(places)
+            is_provider = rng.random() < PROVIDER_SHARE
+            user_id = uuid.uuid4()
+            users.append(
+                {
+                    "id": user_id,
+                    "name": f"Bench User {i}",
+                    "email": f"user{i}@{BENCH_DOMAIN}",
+                    "phone": f"9{i:011d}",
+                    "hashed_password": password,
+                    "user_type": UserType.PROVIDER if is_provider else UserType.CUSTOMER,
+                    "location": f"H.No {rng.randint(1, 999)}, {name}, {taluka}, Goa",
+                    "is_active": True,
+                    "is_verified": True,
+                }
+            )
+            if is_provider:
+                providers.append(
+                    {
+                        "provider_id": uuid.uuid4(),
+                        "user_id": user_id,
+                        "services": [rng.choice(SERVICES)],
+                        "pricing": float(rng.randint(200, 2000)),
+                        "availability": rng.random() > 0.2,
+                        "rating": round(rng.uniform(2.5, 5.0), 1),
+                        "rating_count": rng.randint(0, 200),
+                        "approved": True,
+                    }
+                )
+
+        db.execute(User.__table__.insert(), users)
+        if providers:
+            db.execute(Provider.__table__.insert(), providers)
+        db.commit()
+
+    search_docs.rebuild(db)
+
+    db.execute(text("ANALYZE users"))
+    db.execute(text("ANALYZE providers"))
+    db.execute(text("ANALYZE provider_search_docs"))
+    db.commit()
+
+
+def cleanup(db):
+    bench_users = db.query(User.id).filter(User.email.like(f"%@{BENCH_DOMAIN}"))
+    db.query(Provider).filter(Provider.user_id.in_(bench_users)).delete(
+        synchronize_session=False
+    )
+    db.query(User).filter(User.email.like(f"%@{BENCH_DOMAIN}")).delete(
+        synchronize_session=False
+    )
+    db.commit()
+
+
+def explain(db, query):
+    sql = query.statement.compile(
+        dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+    )
+    rows = db.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}")).all()
+    return [row[0] for row in rows]
+
+
+def old_query(db, location):
+    return (
+        db.query(Provider)
+        .join(User)
+        .filter(
+            User.location.ilike(f"%{location}%"),
+            Provider.availability == True,
+            Provider.approved == True,
+        )
+        .limit(100)
+    )
+
+
+def new_query(db, location):
+    query = db.query(ProviderSearchDoc.document).filter(
+        ProviderSearchDoc.availability == True
+    )
+    db.execute(ProviderController._similarity_threshold())
+    query, similarity = ProviderController._match_location(
+        query, normalize_location(location)
+    )
+    return query.order_by(
+        similarity.desc(), ProviderSearchDoc.provider_id.desc()
+    ).limit(100)
+
+
+def print_plan(title, lines):
+    print(f"\n--- {title}")
+    for line in lines:
+        print(f"    {line}")
+
+
+def time_endpoint(client, location, repeats=5):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        response = client.get("/api/providers/", params={"location": location})
+        timings.append(time.perf_counter() - start)
+    return min(timings), len(response.json())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded rows")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        print("❌ This benchmark needs DATABASE_URL to point at Postgres")
+        sys.exit(1)
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+
+    try:
+        cleanup(db)
+        seed(db, args.users)
+
+        for location in SEARCHES:
+            print(f"\n🔎 location={location!r}")
+            print_plan("ILIKE", explain(db, old_query(db, location)))
+            db.commit()
+            print_plan("trigram", explain(db, new_query(db, location)))
+            db.commit()
+
+        print(f"\n⏱️  GET /api/providers/ on {args.users} users (best of 5)")
+        with TestClient(app) as client:
+            for location in SEARCHES:
+                elapsed, found = time_endpoint(client, location)
+                print(f"{location:>15} {elapsed * 1000:>9.1f}ms {found:>5} providers")
+
+    finally:
+        if not args.keep:
+            cleanup(db)
+            print("\n🧹 Removed seeded rows")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Rebuild the provider spatial index snapshot from the database
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.spatial_index import provider_index
+
+
+def build_provider_index():
+    path = sys.argv[1] if len(sys.argv) > 1 else settings.SPATIAL_INDEX_PATH
+    if not path:
+        print("❌ Set SPATIAL_INDEX_PATH or pass a snapshot path")
+        return False
+
+    db = SessionLocal()
+    try:
+        provider_index.build(db)
+        provider_index.save(path)
+        print(f"✅ Indexed {len(provider_index)} providers into {path}")
+        return True
+    except Exception as e:
+        print(f"❌ Failed to build provider index: {e}")
+        return False
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    build_provider_index()
@@ -21,7 +21,7 @@ SessionLocal = sessionmaker(bind=engine)
 
 Base.metadata.create_all(bind=engine)
 
-cache.redis_client.flushdb()
+cache.sync_client.flushdb()
 
 
 def init_sample_data():
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Load test the request connection pool against the configured Postgres
+database: run 10x the pool's capacity of concurrent requests that each
+hold a connection, and check that the pool never opens more than
+pool_size + max_overflow connections, that waiting requests time out
+after pool_timeout instead of queueing forever, and that statement_timeout
+and idle_in_transaction_session_timeout are set on request connections
+"""
+
+import argparse
+import asyncio
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.core.database import (
+    ASYNC_DATABASE_URL,
+    AsyncSessionLocal,
+    async_engine,
+    pool_metrics,
+)
+
+
+# connections open to this database, other than the monitor's own
+async def open_connections(monitor) -> int:
+    result = await monitor.execute(
+        select(func.count())
+        .select_from(text("pg_stat_activity"))
+        .where(text("datname = current_database()"))
+        .where(text("pid <> pg_backend_pid()"))
+    )
+    return result.scalar()
+
+
+async def request(hold: float, outcomes: dict):
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(text("SELECT pg_sleep(:hold)"), {"hold": hold})
+        outcomes["ok"] += 1
+    except PoolTimeoutError:
+        outcomes["timeout"] += 1
+    except Exception as e:
+        outcomes["error"] += 1
+        print(f"   ⚠️  {type(e).__name__}: {e}")
+
+
+async def check_pool_limits(capacity: int, concurrency: int, hold: float) -> bool:
+    metrics = pool_metrics["requests"]
+    metrics.reset()
+    outcomes = {"ok": 0, "timeout": 0, "error": 0}
+    peak_connections = 0
+
+    # counts come over a connection of its own, outside the pool under test
+    monitor_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=NullPool)
+    async with monitor_engine.connect() as monitor:
+        baseline = await open_connections(monitor)
+        tasks = [
+            asyncio.ensure_future(request(hold, outcomes)) for _ in range(concurrency)
+        ]
+        start = time.perf_counter()
+        while not all(task.done() for task in tasks):
+            peak_connections = max(
+                peak_connections, await open_connections(monitor) - baseline
+            )
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - start
+    await monitor_engine.dispose()
+
+    stats = metrics.snapshot()
+    print(f"   {outcomes} in {elapsed:.1f}s")
+    print(
+        f"   peak in use {stats['peak_in_use']}/{stats['capacity']}, "
+        f"peak connections on the server {peak_connections}, "
+        f"wait p50 {stats['wait_ms_p50']}ms p99 {stats['wait_ms_p99']}ms "
+        f"max {stats['wait_ms_max']}ms"
+    )
+
+    held = stats["peak_in_use"] <= capacity and peak_connections <= capacity
+    served = outcomes["error"] == 0 and outcomes["ok"] > 0
+    return held and served
+
+
+async def check_statement_timeout(timeout_ms: int) -> bool:
+    if not timeout_ms:
+        print("   statement_timeout is off for this environment")
+        return True
+
+    start = time.perf_counter()
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                text("SELECT pg_sleep(:seconds)"), {"seconds": timeout_ms / 1000 + 5}
+            )
+    except DBAPIError as e:
+        elapsed = time.perf_counter() - start
+        print(f"   cancelled after {elapsed:.1f}s: {str(e.orig).splitlines()[0]}")
+        return elapsed < timeout_ms / 1000 + 2
+    print("   the query ran past statement_timeout")
+    return False
+
+
+async def check_idle_in_transaction_timeout(timeout_ms: int) -> bool:
+    if not timeout_ms:
+        print("   idle_in_transaction_session_timeout is off for this environment")
+        return True
+
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(text("SELECT 1"))
+            await asyncio.sleep(timeout_ms / 1000 + 2)
+            await db.execute(text("SELECT 1"))
+    except DBAPIError as e:
+        print(f"   terminated: {str(e.orig).splitlines()[0]}")
+        return True
+    print("   the idle transaction was left open")
+    return False
+
+
+async def run(args) -> bool:
+    pool = settings.database_pool()
+    capacity = pool["pool_size"] + pool["max_overflow"]
+    concurrency = args.factor * capacity
+    print(f"⏱️  {settings.ENVIRONMENT} pool {pool}")
+
+    results = {}
+    print(f"🔌 {concurrency} concurrent requests holding a connection for {args.hold}s")
+    results["pool limits"] = await check_pool_limits(capacity, concurrency, args.hold)
+
+    if not args.skip_timeouts:
+        print("🐢 a query running past statement_timeout")
+        results["statement timeout"] = await check_statement_timeout(
+            pool["statement_timeout_ms"]
+        )
+        print("💤 a transaction left idle")
+        results["idle in transaction timeout"] = (
+            await check_idle_in_transaction_timeout(
+                pool["idle_in_transaction_timeout_ms"]
+            )
+        )
+
+    await async_engine.dispose()
+    print()
+    for name, passed in results.items():
+        print(f"{'✅' if passed else '❌'} {name}")
+    return all(results.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--factor", type=int, default=10)
+    parser.add_argument("--hold", type=float, default=0.5)
+    parser.add_argument("--skip-timeouts", action="store_true")
+    args = parser.parse_args()
+
+    if async_engine.dialect.name != "postgresql":
+        print("❌ This load test needs DATABASE_URL to point at Postgres")
+        sys.exit(1)
+
+    if not asyncio.run(run(args)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
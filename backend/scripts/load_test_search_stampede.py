@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Drive cached provider searches at a fixed rate, expire the hot entry
+halfway through and print database queries per 100ms, to check that
+an expiring search costs one refresh instead of a stampede
+"""
+
+import argparse
+import asyncio
+import sys
+import os
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+
+from app.controllers.provider import ProviderController
+from app.core.database import AsyncSessionLocal, async_engine
+from app.core.decorators import make_cache_key
+from app.services.cache import cache
+from app.services.gazetteer import gazetteer
+
+SEARCH = dict(service="plumber", location="Panaji", limit=20)
+BUCKET = 0.1
+
+
+async def drive(rps: int, seconds: float, expire_at: float, key: str):
+    search = ProviderController.search_providers_with_location
+    queries = Counter()
+    start = time.perf_counter()
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            queries[int((time.perf_counter() - start) / BUCKET)] += 1
+
+    async def one():
+        async with AsyncSessionLocal() as db:
+            await search(db, **SEARCH)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    try:
+        requests, expired = [], False
+        for i in range(int(rps * seconds)):
+            if not expired and time.perf_counter() - start >= expire_at:
+                # push the soft TTL into the past, as if 1800s had gone by
+                entry = await cache.get(key)
+                entry["expires_at"] = time.time() - 1
+                await cache.set(key, entry, ttl=60)
+                expired = True
+            requests.append(asyncio.ensure_future(one()))
+            await asyncio.sleep(max(0.0, start + (i + 1) / rps - time.perf_counter()))
+        await asyncio.gather(*requests)
+        await asyncio.sleep(1)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+        await cache.close()
+
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rps", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=4.0)
+    args = parser.parse_args()
+
+    try:
+        cache.sync_client.ping()
+    except Exception as e:
+        print(f"❌ This load test needs REDIS_URL to point at a running Redis: {e}")
+        sys.exit(1)
+
+    # searches are cached by the coordinates the location geocodes to
+    panaji = gazetteer.lookup(SEARCH["location"])
+    key = make_cache_key(
+        ProviderController._search.__wrapped__,
+        "provider_search",
+        (None, (panaji.lat, panaji.lng), 25.0),
+        {"service": SEARCH["service"], "limit": SEARCH["limit"]},
+    )
+    cache.delete_sync(key)
+
+    # fill the entry before the clock starts
+    async def warm():
+        async with AsyncSessionLocal() as db:
+            await ProviderController.search_providers_with_location(db, **SEARCH)
+        await async_engine.dispose()
+
+    asyncio.run(warm())
+
+    print(f"🔥 {args.rps} searches/s for {args.seconds}s, entry expires at {args.seconds / 2}s")
+    queries = asyncio.run(drive(args.rps, args.seconds, args.seconds / 2, key))
+
+    for bucket in range(int(args.seconds / BUCKET) + 10):
+        print(f"{bucket * BUCKET:>6.1f}s {'#' * queries[bucket]} {queries[bucket] or ''}")
+    print(f"✅ {sum(queries.values())} queries for {int(args.rps * args.seconds)} searches")
+    cache.delete_sync(key)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Rebuild provider_search_docs from providers, users and service categories
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal
+from app.services.search_docs import search_docs
+
+
+def rebuild_search_docs():
+    db = SessionLocal()
+
+    try:
+        print("🔄 Rebuilding provider search documents...")
+        count = search_docs.rebuild(db)
+        print(f"✅ Wrote {count} provider search documents")
+        return True
+
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Rebuild failed: {e}")
+        return False
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    rebuild_search_docs()
@@ -96,6 +96,77 @@ def add_missing_columns_manually():
         return False
 
 
+def verify_indexes():
+    """Check that every index declared on the models exists and is valid"""
+    print("🔍 Verifying database indexes...")
+    try:
+        from app.core.database import engine, Base
+        from sqlalchemy import inspect, text
+
+        inspector = inspect(engine)
+        missing = []
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {index["name"] for index in inspector.get_indexes(table.name)}
+            missing.extend(
+                index.name for index in table.indexes if index.name not in existing
+            )
+
+        # CREATE INDEX CONCURRENTLY leaves an invalid index behind if it fails
+        with engine.connect() as connection:
+            invalid = [
+                row[0]
+                for row in connection.execute(text("""
+                    SELECT c.relname
+                    FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+                    WHERE NOT i.indisvalid
+                """))
+            ]
+
+        for name in missing:
+            print(f"⚠️  Missing index: {name}")
+        for name in invalid:
+            print(f"⚠️  Invalid index, rerun migrations to rebuild it: {name}")
+
+        if missing or invalid:
+            return False
+
+        print("✅ All indexes present!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Could not verify indexes: {e}")
+        return False
+
+
+def sync_search_docs():
+    """Build provider search documents when the table is empty"""
+    try:
+        from app.core.database import SessionLocal
+        from app.models.provider import Provider
+        from app.models.provider_search_doc import ProviderSearchDoc
+        from app.services.search_docs import search_docs
+
+        db = SessionLocal()
+        try:
+            if db.query(ProviderSearchDoc).first():
+                return True
+            if not db.query(Provider).filter(Provider.approved == True).first():
+                return True
+
+            print("🔄 Building provider search documents...")
+            count = search_docs.rebuild(db)
+            print(f"✅ Wrote {count} provider search documents")
+            return True
+        finally:
+            db.close()
+
+    except Exception as e:
+        print(f"❌ Could not build provider search documents: {e}")
+        return False
+
+
 def initialize_render_db():
     """Initialize database for Render deployment"""
     print("🚀 Initializing HomeHero database on Render...")
@@ -120,6 +191,8 @@ def initialize_render_db():
         # Create all tables (this will create new tables but won't modify existing ones)
         print("📋 Creating database tables...")
         Base.metadata.create_all(bind=engine)
+
+        verify_indexes()
         
         # Check if data already exists
         from app.core.database import SessionLocal
@@ -135,6 +208,7 @@ def initialize_render_db():
             success = create_dummy_data()
             
             if success:
+                sync_search_docs()
                 print("✅ Database initialization completed!")
                 return True
             else:
@@ -142,6 +216,7 @@ def initialize_render_db():
                 return False
         else:
             print(f"📊 Database already has {existing_users} users - skipping dummy data creation")
+            sync_search_docs()
             return True
             
     except Exception as e:
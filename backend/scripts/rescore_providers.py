@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Recompute stored provider rating scores after changing the rating prior
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal
+from app.services.ranking import ranking
+
+
+def rescore_providers():
+    db = SessionLocal()
+
+    try:
+        print(
+            f"⭐ Rescoring providers, prior {ranking.rating_prior} "
+            f"worth {ranking.rating_prior_count} reviews..."
+        )
+        updated = ranking.rescore(db)
+        print(f"✅ Rescored {updated} providers")
+
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Rescore failed: {e}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    rescore_providers()
@@ -0,0 +1,666 @@
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+import pytest
+import redis
+
+from app.core import decorators
+from app.core.decorators import cache_stats, cached, make_cache_key
+from app.models.provider import Provider
+from sqlalchemy.orm import Session
+
+
+class DictCache:
+    def __init__(self):
+        self.data = {}
+        self.tags = {}
+        self.deadlines = {}
+
+    async def get(self, key):
+        return self.get_sync(key)
+
+    async def set(self, key, value, ttl=None, tags=()):
+        return self.set_sync(key, value, ttl, tags)
+
+    def get_sync(self, key):
+        if self.deadlines.get(key, float("inf")) < time.monotonic():
+            return None
+        return self.data.get(key)
+
+    def set_sync(self, key, value, ttl=None, tags=()):
+        self.data[key] = value
+        self.tags[key] = list(tags)
+        if ttl:
+            self.deadlines[key] = time.monotonic() + ttl
+        return True
+
+    async def acquire_lock(self, name, ttl):
+        return self.acquire_lock_sync(name, ttl)
+
+    async def release_lock(self, name, token):
+        return self.release_lock_sync(name, token)
+
+    def acquire_lock_sync(self, name, ttl):
+        if f"lock:{name}" in self.data:
+            return None
+        self.data[f"lock:{name}"] = "token"
+        return "token"
+
+    def release_lock_sync(self, name, token):
+        return self.data.pop(f"lock:{name}", None) is not None
+
+
+class FakeSession(Session):
+    pass
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = DictCache()
+    monkeypatch.setattr(decorators, "cache", store)
+    cache_stats.reset()
+    return store
+
+
+def search(db, service=None, limit=20):
+    return [service, limit]
+
+
+def test_key_ignores_db_and_argument_style():
+    first = make_cache_key(search, "test", (FakeSession(), "plumber"), {})
+    second = make_cache_key(search, "test", (), {"db": FakeSession(), "service": "plumber", "limit": 20})
+
+    assert first == second
+    assert first.startswith("test:search:")
+    assert first != make_cache_key(search, "test", (None, "plumber", 10), {})
+
+
+def test_key_is_the_same_in_every_process():
+    code = (
+        "from app.core.decorators import make_cache_key\n"
+        "def search(db, service=None, limit=20): pass\n"
+        "print(make_cache_key(search, 'test', (object(), 'plumber'), {}))\n"
+    )
+    keys = {
+        subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            text=True,
+            env={**os.environ, "PYTHONHASHSEED": seed},
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ).stdout.strip()
+        for seed in ("1", "2")
+    }
+
+    assert len(keys) == 1
+    assert keys != {""}
+
+
+def test_sync_and_async_functions_hit_after_first_call(store):
+    calls = []
+
+    @cached(ttl=60, key_prefix="sync_test")
+    def lookup(db, name):
+        calls.append(name)
+        return {"name": name}
+
+    @cached(ttl=60, key_prefix="async_test")
+    async def alookup(db, name):
+        calls.append(name)
+        return {"name": name}
+
+    assert lookup(FakeSession(), "a") == lookup(FakeSession(), "a") == {"name": "a"}
+    assert asyncio.run(alookup(FakeSession(), "b")) == {"name": "b"}
+    assert asyncio.run(alookup(FakeSession(), "b")) == {"name": "b"}
+
+    assert calls == ["a", "b"]
+    expected = {"hits": 1, "stale": 0, "misses": 1, "refreshes": 0, "hit_ratio": 0.5}
+    assert cache_stats.snapshot() == {"sync_test": expected, "async_test": expected}
+
+
+def test_orm_results_are_stored_as_plain_data(store):
+    provider_id = uuid.uuid4()
+
+    @cached(key_prefix="orm_test")
+    def load(db):
+        return [Provider(provider_id=provider_id, services=["plumber"])]
+
+    result = load(FakeSession())
+
+    stored = next(iter(store.data.values()))
+    assert stored == result
+    assert isinstance(stored[0], dict)
+    assert stored[0]["provider_id"] == str(provider_id)
+
+
+def test_none_is_not_cached(store):
+    @cached(key_prefix="none_test")
+    def nothing(db):
+        return None
+
+    assert nothing(FakeSession()) is None
+    assert store.data == {}
+
+
+def test_misses_on_a_replica_are_computed_on_the_primary(store, monkeypatch):
+    primary = []
+
+    def new_session():
+        primary.append(FakeSession())
+        return primary[-1]
+
+    monkeypatch.setattr(decorators, "SessionLocal", new_session)
+
+    @cached(ttl=60, key_prefix="replica_test")
+    async def read(db, service):
+        return db.info.get("replica", "primary")
+
+    # a replica that hasn't replayed the last write must not refill its entry
+    replica = FakeSession(info={"replica": "replica_1"})
+    assert asyncio.run(read(replica, "plumber")) == "primary"
+    assert list(store.data.values()) == ["primary"]
+    assert len(primary) == 1
+
+    # hits are still served to replica readers without touching the primary
+    assert asyncio.run(read(replica, "plumber")) == "primary"
+    assert len(primary) == 1
+
+
+def test_cache_calls_fail_fast_without_redis(monkeypatch):
+    from app.services.cache import CacheService
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "REDIS_URL", "redis://127.0.0.1:1/0")
+    service = CacheService()
+
+    async def run():
+        try:
+            return (
+                await service.get("missing"),
+                await service.set("key", {"a": 1}),
+                await service.ping(),
+            )
+        finally:
+            await service.close()
+
+    assert asyncio.run(run()) == (None, False, False)
+    assert service.get_sync("missing") is None
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def set(self, key, value, ex=None):
+        self.commands.append(("set", key, ex, value))
+
+    def delete(self, *keys):
+        self.commands.append(("delete", keys))
+
+    def publish(self, channel, message):
+        self.commands.append(("publish", channel, message))
+
+    async def execute(self):
+        self.redis.calls += 1
+        results = []
+        for name, *args in self.commands:
+            if name == "set":
+                key, ttl, value = args
+                self.redis.data[key] = value
+                self.redis.ttls[key] = ttl
+                results.append(True)
+            elif name == "delete":
+                results.append(sum(self.redis.data.pop(key, None) is not None for key in args[0]))
+            else:
+                self.redis.published.append(args)
+                results.append(0)
+        return results
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+        self.published = []
+        self.calls = 0
+
+    async def get(self, key):
+        self.calls += 1
+        return self.data.get(key)
+
+    async def mget(self, keys):
+        self.calls += 1
+        return [self.data.get(key) for key in keys]
+
+    async def delete(self, *keys):
+        self.calls += 1
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self)
+
+    async def aclose(self):
+        pass
+
+
+# delivers everything published after subscribe
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.seen = None
+
+    async def subscribe(self, channel):
+        self.seen = len(self.redis.published)
+
+    async def get_message(self, timeout=None):
+        if self.seen < len(self.redis.published):
+            channel, message = self.redis.published[self.seen]
+            self.seen += 1
+            return {"type": "message", "channel": channel, "data": message}
+        await asyncio.sleep(0.001)
+        return None
+
+    async def aclose(self):
+        pass
+
+
+def test_bulk_calls_are_one_round_trip_each():
+    from app.services.cache import CacheService
+
+    service = CacheService()
+    service.redis_client = FakeRedis()
+    values = {f"provider_card:{i}": {"rank": i} for i in range(100)}
+
+    async def run():
+        assert await service.set_many(values, ttl={"provider_card:0": 5})
+        found = await service.get_many(list(values) + ["missing"])
+        deleted = await service.delete_many(values)
+        return found, deleted
+
+    found, deleted = asyncio.run(run())
+
+    assert found == values
+    assert deleted == 100
+    assert service.redis_client.ttls["provider_card:0"] == 5
+    assert service.redis_client.ttls["provider_card:1"] == service.default_ttl
+    assert service.redis_client.calls == service.stats["round_trips"] == 3
+
+
+def test_entries_are_registered_under_their_tags(store):
+    @cached(key_prefix="tag_test", tags=lambda arguments, result: [f"name:{arguments['name']}"])
+    def lookup(db, name):
+        return {"name": name}
+
+    @cached(key_prefix="static_tag_test", tags=["static"])
+    async def alookup(db):
+        return 1
+
+    lookup(FakeSession(), "a")
+    asyncio.run(alookup(FakeSession()))
+
+    assert sorted(store.tags.values()) == [["name:a"], ["static"]]
+
+
+class ScriptRecorder:
+    def __init__(self, result=1):
+        self.calls = []
+        self.result = result
+
+    async def __call__(self, keys=None, args=None, client=None):
+        self.calls.append((keys, args))
+        return self.result
+
+
+def test_tagged_writes_and_invalidation_are_single_scripts():
+    from app.services.cache import CacheService
+
+    service = CacheService()
+    service._set_tagged = ScriptRecorder()
+    service._invalidate_tags = ScriptRecorder(result=7)
+
+    async def run():
+        await service.set("entry", {"a": 1}, ttl=60, tags=["service:*", "provider:1", "service:*"])
+        return await service.invalidate_tags("provider:1", "service:*")
+
+    assert asyncio.run(run()) == 7
+
+    keys, args = service._set_tagged.calls[0]
+    assert keys == ["entry", "tag:service:*", "tag:provider:1"]
+    # members are scored by when they expire, so dead ones can be pruned
+    assert args[0] == 60
+    assert abs(args[2] - time.time()) < 5
+    assert service._invalidate_tags.calls == [
+        (["tag:provider:1", "tag:service:*"], ["cache:invalidate"])
+    ]
+    assert not hasattr(service, "invalidate_pattern")
+
+
+def test_expired_entry_is_served_stale_while_one_call_refreshes(store, monkeypatch):
+    sessions = []
+
+    def new_session():
+        sessions.append(FakeSession())
+        return sessions[-1]
+
+    monkeypatch.setattr(decorators, "SessionLocal", new_session)
+    computed = []
+
+    @cached(ttl=60, key_prefix="swr_test", stale_ttl=60)
+    async def search(db, service):
+        computed.append(db)
+        await asyncio.sleep(0.01)
+        return [service, len(computed)]
+
+    async def run():
+        first = await search(FakeSession(), "plumber")
+        key = next(key for key in store.data if key.startswith("swr_test:"))
+        store.data[key]["expires_at"] = time.time() - 1
+
+        # every concurrent caller gets the old value, one refresh runs
+        stale = await asyncio.gather(*[search(FakeSession(), "plumber") for _ in range(200)])
+        await asyncio.gather(*decorators._refresh_tasks)
+        return first, stale, await search(FakeSession(), "plumber")
+
+    first, stale, fresh = asyncio.run(run())
+
+    assert first == ["plumber", 1]
+    assert all(result == first for result in stale)
+    assert fresh == ["plumber", 2]
+    assert len(computed) == 2
+    # the refresh ran on its own session, not the finished request's
+    assert computed[1] is sessions[0]
+    assert cache_stats.snapshot()["swr_test"]["refreshes"] == 1
+
+
+def test_sync_refresh_runs_in_a_background_thread(store):
+    done = threading.Event()
+    threads = []
+
+    @cached(ttl=60, key_prefix="swr_sync_test", stale_ttl=60)
+    def lookup(db):
+        threads.append(threading.current_thread())
+        if len(threads) > 1:
+            done.set()
+        return len(threads)
+
+    assert lookup(FakeSession()) == 1
+    key = next(key for key in store.data if key.startswith("swr_sync_test:"))
+    store.data[key]["expires_at"] = time.time() - 1
+
+    assert lookup(FakeSession()) == 1
+    assert done.wait(5)
+    assert threads[1] is not threads[0]
+
+
+def test_early_expiry_spreads_refreshes_before_the_soft_ttl(monkeypatch):
+    now = 1000.0
+    entry = {"value": 1, "expires_at": now + 1, "delta": 0.5}
+
+    # a fast computation far from expiry is never refreshed early
+    assert not decorators.should_refresh({**entry, "expires_at": now + 600}, now)
+
+    monkeypatch.setattr(decorators.random, "random", lambda: 0.0)
+    assert not decorators.should_refresh(entry, now)
+    monkeypatch.setattr(decorators.random, "random", lambda: 0.99)
+    assert decorators.should_refresh(entry, now)
+
+
+# 200 requests a second for 1.5 seconds against a search that takes 50ms,
+# like a join on a busy database. the entry expires after 1 second
+def hot_key_load(stale_ttl):
+    queries = []
+
+    @cached(ttl=1, key_prefix="load_test", stale_ttl=stale_ttl)
+    async def search(db, service):
+        queries.append(time.monotonic())
+        await asyncio.sleep(0.05)
+        return [service]
+
+    async def run():
+        await search(FakeSession(), "plumber")
+        start = time.monotonic()
+        requests = []
+        for i in range(300):
+            requests.append(asyncio.ensure_future(search(FakeSession(), "plumber")))
+            await asyncio.sleep(max(0.0, start + (i + 1) / 200 - time.monotonic()))
+        results = await asyncio.gather(*requests)
+        await asyncio.gather(*decorators._refresh_tasks)
+        return results
+
+    results = asyncio.run(run())
+    assert all(result == ["plumber"] for result in results)
+    return len(queries)
+
+
+def test_hot_key_expiry_under_200_rps_keeps_queries_flat(store, monkeypatch):
+    monkeypatch.setattr(decorators, "SessionLocal", FakeSession)
+
+    # hard expiry: every request arriving during the recompute misses too
+    assert hot_key_load(stale_ttl=None) > 5
+
+    # soft expiry: the initial fill plus a single refresh
+    store.data.clear()
+    assert hot_key_load(stale_ttl=30) == 2
+
+
+def test_local_cache_is_bounded_by_bytes_and_ttl(monkeypatch):
+    from app.services import local_cache
+    from app.services.local_cache import LocalCache
+
+    local = LocalCache(["card"], max_bytes=100, ttl=60)
+    local.enabled = True
+    for i in range(5):
+        local.put(f"card:{i}", b"x" * 30)
+
+    # 36 bytes an entry, so only the two newest fit
+    assert [local.get(f"card:{i}") for i in range(5)] == [None] * 3 + [b"x" * 30] * 2
+    assert local.snapshot()["card"]["l1_bytes"] == 72
+
+    local.put("search:1", b"x")
+    assert local.get("search:1") is None
+
+    # a value read before an invalidation arrived is not kept
+    generation = local.generation
+    local.discard(["card:9"])
+    local.put("card:9", b"old", generation=generation)
+    assert local.get("card:9") is None
+
+    now = time.monotonic()
+    monkeypatch.setattr(local_cache.time, "monotonic", lambda: now + 61)
+    assert local.get("card:4") is None
+
+    local.enabled = False
+    local.put("card:5", b"y")
+    assert local.get("card:5") is None
+
+
+def test_local_cache_serves_repeat_reads_and_follows_other_workers_writes():
+    from app.services.cache import CacheService
+
+    redis = FakeRedis()
+    first, second = CacheService(), CacheService()
+    for worker in (first, second):
+        worker.redis_client = redis
+
+    async def run():
+        for worker in (first, second):
+            worker.start_listener()
+        await asyncio.sleep(0.01)
+        try:
+            await first.set("provider_card:1", {"rating": 4.0})
+            calls = redis.calls
+            reads = [await second.get("provider_card:1") for _ in range(3)]
+            read_calls = redis.calls - calls
+
+            await first.set("provider_card:1", {"rating": 4.5})
+            await asyncio.sleep(0.01)
+            return reads, read_calls, await second.get("provider_card:1")
+        finally:
+            for worker in (first, second):
+                await worker.close()
+
+    reads, read_calls, after = asyncio.run(run())
+
+    assert reads == [{"rating": 4.0}] * 3
+    assert read_calls == 1
+    assert after == {"rating": 4.5}
+    stats = second.local.snapshot()["provider_card"]
+    assert (stats["l1_hits"], stats["l2_hits"], stats["misses"]) == (2, 2, 0)
+    assert stats["l1_hit_ratio"] == 0.5
+    # the subscription is gone, so L1 no longer serves
+    assert not second.local.enabled
+
+
+def test_codecs_round_trip_with_a_versioned_header():
+    from app.services.codecs import HEADER, MAGIC, ZSTD, Serializer
+
+    results = [{"provider_id": str(uuid.uuid4()), "rating": 4.5, "services": ["plumber"]}] * 50
+    serializer = Serializer("orjson", {"geocode": "msgpack"}, compress_min_bytes=1024)
+
+    for key, value in [
+        ("provider_search:a", results),
+        ("provider_card:1", results[0]),
+        ("geocode:panaji", [15.49, 73.82]),
+        ("geocode:bytes", b"\x00raw"),
+    ]:
+        data = serializer.encode(key, value)
+        assert serializer.decode(data) == value
+        magic, version, codec_id, flags = HEADER.unpack_from(data)
+        assert (magic, version) == (MAGIC, 1)
+        assert codec_id == serializer.codec_for(key).id
+        assert bool(flags & ZSTD) == (key == "provider_search:a")
+
+
+def test_a_codec_must_implement_dumps_and_loads():
+    from app.services.codecs import Codec, register_codec
+
+    class HalfCodec(Codec):
+        name = "half"
+        id = 99
+
+        def dumps(self, value):
+            return b""
+
+    with pytest.raises(TypeError):
+        register_codec(HalfCodec())
+
+
+def test_entries_from_other_deploys_are_misses():
+    import pickle
+
+    from app.services.cache import CacheService
+    from app.services.codecs import CodecError, HEADER, MAGIC
+
+    service = CacheService()
+    service.redis_client = FakeRedis()
+    service.redis_client.data = {
+        "provider_card:pickled": pickle.dumps({"rating": 4.0}),
+        "provider_card:newer": HEADER.pack(MAGIC, 2, 1, 0) + b"{}",
+        "provider_card:unknown_codec": HEADER.pack(MAGIC, 1, 99, 0) + b"{}",
+        "provider_card:ok": service.serializer.encode("provider_card:ok", {"rating": 4.5}),
+    }
+
+    async def run():
+        return (
+            await service.get("provider_card:pickled"),
+            await service.get_many(service.redis_client.data),
+            await service.set("provider_card:orm", Provider()),
+        )
+
+    single, found, orm_written = asyncio.run(run())
+
+    assert single is None
+    assert found == {"provider_card:ok": {"rating": 4.5}}
+    assert service.stats["undecodable"] == 4
+    # ORM instances are refused instead of pickled
+    assert orm_written is False
+    with pytest.raises(CodecError):
+        service.serializer.encode("provider_card:orm", Provider())
+
+
+def test_get_json_reads_what_set_json_wrote():
+    from app.services.cache import CacheService
+
+    service = CacheService()
+    service.redis_client = FakeRedis()
+    service.redis_client.data["settings"] = b'{"radius": 10}'
+
+    assert asyncio.run(service.get_json("settings")) == {"radius": 10}
+
+
+def test_circuit_opens_on_repeated_failures_and_probes_before_closing(monkeypatch):
+    from app.services import circuit_breaker
+    from app.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+    clock = [100.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: clock[0])
+    breaker = CircuitBreaker("test", failure_threshold=3, window=10, reset_timeout=5)
+
+    # failures older than the window don't count
+    breaker.record_failure()
+    clock[0] += 11
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    clock[0] += 5
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # one probe at a time
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    clock[0] += 5
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+    snapshot = breaker.snapshot()
+    assert (snapshot["trips"], snapshot["probes"], snapshot["rejected"]) == (1, 2, 2)
+
+
+class DownRedis(FakeRedis):
+    async def get(self, key):
+        self.calls += 1
+        raise redis.exceptions.TimeoutError("Timeout reading from socket")
+
+
+def test_cache_is_bypassed_while_redis_is_down():
+    from app.services.cache import CacheService
+
+    service = CacheService()
+    service.redis_client = DownRedis()
+    threshold = service.breaker.failure_threshold
+
+    async def run():
+        results = [await service.get(f"provider_card:{i}") for i in range(threshold + 100)]
+        health = service.breaker.snapshot()
+        # a value no codec can write is not a Redis failure
+        service.breaker.reset()
+        await service.set("provider_card:orm", Provider())
+        return results, health
+
+    start = time.perf_counter()
+    results, health = asyncio.run(run())
+
+    assert results == [None] * (threshold + 100)
+    assert service.redis_client.calls == threshold
+    assert service.stats["bypassed"] == 100
+    assert (health["state"], health["trips"], health["rejected"]) == ("open", 1, 100)
+    assert service.breaker.state == "closed"
+    assert time.perf_counter() - start < 1
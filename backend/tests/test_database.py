@@ -0,0 +1,294 @@
+import asyncio
+import threading
+import time
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import (
+    Column,
+    MetaData,
+    String,
+    Table,
+    create_engine,
+    insert,
+    select,
+    text,
+)
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool, QueuePool
+
+from app.core import database
+from app.core.config import DATABASE_POOL_DEFAULTS, Settings
+from app.core.database import (
+    async_database_url,
+    engine_options,
+    get_async_db,
+    get_read_db,
+)
+from app.core.db_pool import PoolMetrics, timed_pool
+from app.core.db_routing import Replica, ReplicaSet, WritePins
+from app.core.security import create_access_token
+
+
+def test_async_url_picks_the_async_driver():
+    assert (
+        async_database_url("postgresql://app:secret@db:5432/homehero").drivername
+        == "postgresql+asyncpg"
+    )
+    assert async_database_url("postgres://db/homehero").drivername == (
+        "postgresql+asyncpg"
+    )
+    assert async_database_url("postgresql+psycopg2://db/homehero").drivername == (
+        "postgresql+asyncpg"
+    )
+    assert (
+        str(async_database_url("sqlite:///./test.db"))
+        == "sqlite+aiosqlite:///./test.db"
+    )
+
+
+def test_async_url_translates_sslmode_for_asyncpg():
+    url = async_database_url("postgresql://db/homehero?sslmode=require")
+
+    assert dict(url.query) == {"ssl": "require"}
+    assert url.password is None
+    assert url.database == "homehero"
+
+
+def make_settings(**values):
+    return Settings(DATABASE_URL="sqlite://", _env_file=None, **values)
+
+
+def test_pool_settings_follow_the_environment():
+    development = make_settings(ENVIRONMENT="development").database_pool()
+    assert development == DATABASE_POOL_DEFAULTS["development"]
+
+    pool = make_settings(ENVIRONMENT="staging", DATABASE_POOL_SIZE=20).database_pool()
+    assert pool["pool_size"] == 20
+    assert pool["max_overflow"] == DATABASE_POOL_DEFAULTS["staging"]["max_overflow"]
+
+    unknown = make_settings(ENVIRONMENT="preview").database_pool()
+    assert unknown == DATABASE_POOL_DEFAULTS["production"]
+
+
+def test_timeouts_are_passed_the_way_each_driver_takes_them():
+    pool = DATABASE_POOL_DEFAULTS["production"]
+    metrics = PoolMetrics("test")
+
+    options = engine_options("postgresql://db/homehero", pool, metrics)
+    assert options["pool_size"] == 5 and options["pool_pre_ping"] is True
+    assert options["connect_args"] == {
+        "options": "-c statement_timeout=15000 "
+        "-c idle_in_transaction_session_timeout=30000"
+    }
+
+    options = engine_options("postgresql+asyncpg://db/homehero", pool, metrics)
+    assert options["connect_args"]["server_settings"]["statement_timeout"] == "15000"
+
+    options = engine_options("postgresql://db/homehero", pool, metrics, timeouts=False)
+    assert "connect_args" not in options
+    assert engine_options("sqlite://", pool, metrics) == {}
+
+
+def test_pool_limits_hold_at_10x_concurrency(tmp_path):
+    metrics = PoolMetrics("test")
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=timed_pool(QueuePool, metrics),
+        pool_size=2,
+        max_overflow=1,
+        pool_timeout=0.2,
+    )
+    outcomes = []
+
+    def request():
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+                time.sleep(0.05)
+            outcomes.append("ok")
+        except PoolTimeoutError:
+            outcomes.append("timeout")
+
+    threads = [threading.Thread(target=request) for _ in range(30)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+
+    stats = metrics.snapshot()
+    assert stats["capacity"] == 3
+    assert stats["peak_in_use"] == 3
+    assert stats["peak_saturation"] == 1.0
+    assert stats["in_use"] == 0
+    # the 3 connections serve about 12 requests in the 200ms wait
+    assert outcomes.count("timeout") == stats["timeouts"] > 0
+    assert stats["checkouts"] == outcomes.count("ok")
+    assert stats["waited"] > 0 and stats["wait_ms_max"] >= 50
+
+
+# the shared cache WritePins keeps pins in, without Redis
+class SharedPins:
+    def __init__(self):
+        self.keys = set()
+        self.bypassing = False
+
+    async def set(self, key, value, ttl=None):
+        self.keys.add(key)
+        return True
+
+    async def exists(self, key):
+        return key in self.keys
+
+
+notes = Table("notes", MetaData(), Column("written_to", String))
+
+
+def sqlite_file(path, written_to):
+    engine = create_engine(f"sqlite:///{path}")
+    notes.create(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(notes).values(written_to=written_to))
+    engine.dispose()
+    return create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+
+
+# two SQLite files stand in for the primary and a replica that hasn't
+# caught up, so every read shows which one it went to
+def test_reads_go_to_replicas_and_writers_read_their_writes(tmp_path, monkeypatch):
+    primary = sqlite_file(tmp_path / "primary.db", "primary")
+    replicas = ReplicaSet(
+        [Replica("replica_1", sqlite_file(tmp_path / "replica.db", "replica"))],
+        max_lag=5.0,
+        check_interval=5.0,
+    )
+    monkeypatch.setattr(
+        database,
+        "AsyncSessionLocal",
+        async_sessionmaker(primary, expire_on_commit=False),
+    )
+    monkeypatch.setattr(database, "replicas", replicas)
+    monkeypatch.setattr(database, "write_pins", WritePins(10.0, SharedPins()))
+
+    app = FastAPI()
+
+    @app.get("/notes")
+    async def read_notes(db=Depends(get_read_db)):
+        return (await db.scalars(select(notes.c.written_to))).all()
+
+    @app.post("/notes")
+    async def write_note(db=Depends(get_async_db)):
+        await db.execute(insert(notes).values(written_to="primary"))
+        await db.commit()
+        return {}
+
+    client = TestClient(app)
+    alice = {"Authorization": f"Bearer {create_access_token('alice')}"}
+    bob = {"Authorization": f"Bearer {create_access_token('bob')}"}
+
+    # out of rotation until a lag check has passed
+    assert client.get("/notes", headers=alice).json() == ["primary"]
+    asyncio.run(replicas.check())
+    assert client.get("/notes", headers=alice).json() == ["replica"]
+
+    assert client.post("/notes", headers=alice).status_code == 200
+    assert client.get("/notes", headers=alice).json() == ["primary", "primary"]
+    assert client.get("/notes", headers=bob).json() == ["replica"]
+    assert client.get("/notes").json() == ["replica"]
+
+    assert replicas.snapshot()["pinned_reads"] == 1
+    assert replicas.snapshot()["replica_reads"] == 3
+
+
+# the pin is awaited inside commit(), before the response goes out, and
+# only a committed write pins
+def test_only_committed_writes_pin_and_before_the_handler_returns(
+    tmp_path, monkeypatch
+):
+    primary = sqlite_file(tmp_path / "primary.db", "primary")
+    pins = WritePins(10.0, SharedPins())
+    monkeypatch.setattr(
+        database,
+        "AsyncSessionLocal",
+        async_sessionmaker(primary, expire_on_commit=False),
+    )
+    monkeypatch.setattr(database, "write_pins", pins)
+
+    app = FastAPI()
+
+    @app.post("/notes")
+    async def write_note(commit: bool, db=Depends(get_async_db)):
+        await db.execute(insert(notes).values(written_to="primary"))
+        if commit:
+            await db.commit()
+        else:
+            await db.rollback()
+            await db.commit()
+        return {"pinned": await pins.pinned("alice")}
+
+    client = TestClient(app)
+    alice = {"Authorization": f"Bearer {create_access_token('alice')}"}
+
+    response = client.post("/notes", params={"commit": False}, headers=alice)
+    assert response.json() == {"pinned": False}
+    response = client.post("/notes", params={"commit": True}, headers=alice)
+    assert response.json() == {"pinned": True}
+
+
+def test_lagging_replicas_leave_rotation():
+    lags = {"replica_1": 0.5, "replica_2": 0.5}
+    replicas = ReplicaSet(
+        [Replica(name, create_async_engine("sqlite+aiosqlite://")) for name in lags],
+        max_lag=5.0,
+        check_interval=1.0,
+    )
+    names = {replica.engine: replica.name for replica in replicas.replicas}
+
+    async def measure_lag(engine):
+        lag = lags[names[engine]]
+        if lag is None:
+            raise ConnectionError("replica unreachable")
+        return lag
+
+    replicas.measure_lag = measure_lag
+
+    asyncio.run(replicas.check())
+    assert {replicas.choose().name for _ in range(4)} == {"replica_1", "replica_2"}
+
+    lags.update(replica_1=30.0, replica_2=None)
+    asyncio.run(replicas.check())
+    assert replicas.choose() is None
+    snapshot = replicas.snapshot()["replicas"]
+    assert snapshot["replica_1"] == {
+        "in_rotation": False,
+        "lag_seconds": 30.0,
+        "error": "30.0s behind",
+    }
+    assert snapshot["replica_2"]["error"] == "replica unreachable"
+
+    lags.update(replica_1=1.0)
+    asyncio.run(replicas.check())
+    assert {replicas.choose().name for _ in range(4)} == {"replica_1"}
+
+
+def test_write_pins_are_shared_and_expire():
+    shared = SharedPins()
+    this_worker, other_worker = WritePins(0.05, shared), WritePins(0.05, shared)
+
+    asyncio.run(this_worker.pin("alice"))
+    assert asyncio.run(this_worker.pinned("alice"))
+    assert asyncio.run(other_worker.pinned("alice"))
+    assert not asyncio.run(other_worker.pinned("bob"))
+    assert not asyncio.run(other_worker.pinned(None))
+
+    # Redis expires the shared pin, this worker's copy runs out on its own
+    shared.keys.clear()
+    time.sleep(0.06)
+    assert not asyncio.run(this_worker.pinned("alice"))
+
+    # with the cache down nobody can tell who wrote, signed in users stay on the primary
+    shared.bypassing = True
+    assert asyncio.run(other_worker.pinned("bob"))
+    assert not asyncio.run(other_worker.pinned(None))
@@ -0,0 +1,137 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from geopy.distance import geodesic
+
+from app.services.gazetteer import Gazetteer, gazetteer
+from app.services import geolocation
+from app.services.geolocation import GeolocationService, TokenBucket, geo_service
+
+
+def test_bounding_box_contains_radius():
+    lat, lng = 15.4909, 73.8278  # Panaji
+    min_lat, max_lat, min_lng, max_lng = GeolocationService.bounding_box(lat, lng, 10)
+
+    # every edge midpoint of the box is at least 10 km away
+    for corner in [(min_lat, lng), (max_lat, lng), (lat, min_lng), (lat, max_lng)]:
+        assert geodesic((lat, lng), corner).kilometers >= 9.95
+
+
+def test_gazetteer_lookup_order():
+    assert gazetteer.lookup("Panjim").name == "Panaji"
+    assert gazetteer.lookup("Baga, North Goa, India").name == "Baga"
+    assert gazetteer.lookup("House 12, Some unknown lane, 403516").name == "Calangute"
+    assert gazetteer.lookup("Margoa, Goa").name == "Margao"
+    assert gazetteer.lookup("Timbuktu") is None
+
+
+class DictCache:
+    def __init__(self):
+        self.values = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ttl=None):
+        self.values[key] = value
+        return True
+
+
+@pytest.fixture
+def remote(monkeypatch):
+    calls = []
+
+    def fake_geocode(address):
+        calls.append(address)
+        time.sleep(0.01)
+        if "vaddo" in address.lower():
+            return SimpleNamespace(latitude=15.1, longitude=74.1)
+        return None
+
+    monkeypatch.setattr(geolocation, "cache", DictCache())
+    monkeypatch.setattr(geo_service.geolocator, "geocode", fake_geocode)
+    monkeypatch.setattr(geo_service, "bucket", TokenBucket(rate=1000, capacity=10))
+    monkeypatch.setattr(geo_service, "stats", dict.fromkeys(geo_service.stats, 0))
+    return calls
+
+
+def test_get_coordinates_stays_local_and_learns(remote):
+    async def run():
+        assert await geo_service.get_coordinates("Calangute, Goa") == (15.5439, 73.7553)
+        assert await geo_service.get_coordinates("Nowhere Vaddo") is None
+        await asyncio.sleep(0.05)
+        return await geo_service.get_coordinates("Nowhere Vaddo")
+
+    assert asyncio.run(run()) == (15.1, 74.1)
+    assert remote == ["Nowhere Vaddo"]
+
+
+# the CSV is appended off the event loop and read back on the next start
+def test_learned_places_persist(tmp_path):
+    path = tmp_path / "learned.csv"
+    learner = Gazetteer(learned_path=str(path))
+
+    asyncio.run(learner.learn("Nowhere Vaddo", 15.1, 74.1))
+
+    assert learner.lookup("Nowhere Vaddo").lat == 15.1
+    reloaded = Gazetteer(learned_path=str(path))
+    assert (reloaded.lookup("Nowhere Vaddo").lat, len(reloaded)) == (15.1, len(learner))
+
+
+def test_searches_wait_a_moment_for_nominatim(remote):
+    async def run():
+        slow = await geo_service.get_coordinates("Slow Vaddo", timeout=0.001)
+        await asyncio.sleep(0.05)
+        return slow, await geo_service.get_coordinates("Other Vaddo", timeout=1)
+
+    assert asyncio.run(run()) == (None, (15.1, 74.1))
+    assert geo_service.stats["wait_timeouts"] == 1
+
+    # the lookup that timed out still finished and was cached
+    assert asyncio.run(geo_service.get_coordinates("Slow Vaddo")) == (15.1, 74.1)
+    assert remote == ["Slow Vaddo", "Other Vaddo"]
+
+
+def test_concurrent_lookups_share_one_upstream_call(remote):
+    async def run():
+        lookups = [
+            geo_service.get_coordinates(address, wait_for_remote=True)
+            for address in ["Bogus Street 1", "bogus street  1", "BOGUS STREET 1"]
+        ]
+        return await asyncio.gather(*lookups)
+
+    assert asyncio.run(run()) == [None, None, None]
+    assert len(remote) == 1
+    assert geo_service.stats["coalesced"] == 2
+    assert geo_service.stats["batches"] == 1
+
+    # the miss is cached, so a repeat does not go upstream
+    assert asyncio.run(geo_service.get_coordinates("Bogus Street 1", True)) is None
+    assert len(remote) == 1
+    assert geo_service.stats["negative_hits"] == 1
+
+
+def test_geocode_user_location_falls_back_to_pincode(monkeypatch):
+    async def fake_get_coordinates(address, wait_for_remote=False):
+        return None
+
+    monkeypatch.setattr(geo_service, "get_coordinates", fake_get_coordinates)
+
+    coords = asyncio.run(geo_service.geocode_user_location("Unknown lane", "403516"))
+
+    assert coords == (15.5439, 73.7553)
+
+
+def test_token_bucket_spaces_out_calls():
+    bucket = TokenBucket(rate=20)
+
+    async def run():
+        start = time.monotonic()
+        for _ in range(3):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) >= 0.09
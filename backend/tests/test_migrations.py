@@ -0,0 +1,46 @@
+import os
+
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+
+from app.core.database import Base
+from app.models import (  # noqa: F401
+    booking,
+    provider,
+    provider_search_doc,
+    review,
+    service,
+    user,
+)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def scripts():
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    return ScriptDirectory.from_config(config)
+
+
+def test_single_migration_head():
+    assert len(scripts().get_heads()) == 1
+
+
+def test_every_model_index_has_a_migration():
+    sources = ""
+    for revision in scripts().walk_revisions():
+        with open(revision.path, encoding="utf-8") as f:
+            sources += f.read()
+
+    declared = {
+        index.name
+        for table in Base.metadata.tables.values()
+        for index in table.indexes
+    }
+    # created either through op.create_index('name', ...) or raw SQL
+    missing = [
+        name
+        for name in declared
+        if f"'{name}'" not in sources and f" {name} " not in sources
+    ]
+    assert sorted(missing) == []
@@ -0,0 +1,143 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import Column, DateTime, Integer, create_engine, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from app.core.pagination import (
+    decode_cursor,
+    encode_cursor,
+    paginate,
+    paginate_async,
+)
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = "items"
+
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+
+    start = datetime(2026, 1, 1)
+    # pairs of rows share a timestamp so the primary key has to break ties
+    session.add_all(
+        Item(id=i, created_at=start + timedelta(minutes=i // 2)) for i in range(25)
+    )
+    session.commit()
+    yield session
+    session.close()
+
+
+def walk(db, limit, descending=True):
+    keys = [Item.created_at, Item.id]
+    pages, cursor = [], None
+    while True:
+        page = paginate(
+            db.query(Item), keys, cursor=cursor, limit=limit, descending=descending
+        )
+        pages.append([item.id for item in page.items])
+        if not page.next_cursor:
+            return pages
+        cursor = page.next_cursor
+
+
+def test_cursor_walks_every_row_once(db):
+    pages = walk(db, limit=10)
+
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert sum(pages, []) == list(range(24, -1, -1))
+    assert sum(walk(db, limit=7, descending=False), []) == list(range(25))
+
+
+def test_cursor_is_stable_when_rows_are_added(db):
+    keys = [Item.created_at, Item.id]
+    first = paginate(db.query(Item), keys, limit=10)
+
+    # a new row at the head would shift an offset page, not a keyset one
+    db.add(Item(id=100, created_at=datetime(2027, 1, 1)))
+    db.commit()
+
+    second = paginate(db.query(Item), keys, cursor=first.next_cursor, limit=10)
+    assert [item.id for item in second.items] == list(range(14, 4, -1))
+
+
+def test_skip_still_works_without_cursor(db):
+    page = paginate(db.query(Item), [Item.created_at, Item.id], limit=5, skip=20)
+
+    assert [item.id for item in page.items] == [4, 3, 2, 1, 0]
+    assert page.next_cursor is None
+
+
+def test_skip_only_offsets_the_first_page(db):
+    first = paginate(db.query(Item), [Item.created_at, Item.id], limit=5, skip=5)
+    second = paginate(
+        db.query(Item),
+        [Item.created_at, Item.id],
+        cursor=first.next_cursor,
+        limit=5,
+        skip=5,
+    )
+
+    assert [item.id for item in first.items] == [19, 18, 17, 16, 15]
+    assert [item.id for item in second.items] == [14, 13, 12, 11, 10]
+
+
+# NULL keys never compare in the keyset, their rows would drop out of later pages
+def test_nullable_sort_keys_are_refused(db):
+    with pytest.raises(ValueError):
+        paginate(db.query(Item), [Item.updated_at, Item.id], limit=5)
+
+
+def test_bad_cursor_is_rejected():
+    keys = [Item.created_at, Item.id]
+    values = [datetime(2026, 1, 1, tzinfo=timezone.utc), 3]
+    assert decode_cursor(encode_cursor(values), keys) == values
+
+    for cursor in ["not-a-cursor", encode_cursor([1])]:
+        with pytest.raises(HTTPException) as exc:
+            decode_cursor(cursor, keys)
+        assert exc.value.status_code == 400
+
+
+def test_async_pages_match_sync_pages(db, tmp_path):
+    url = f"sqlite+aiosqlite:///{tmp_path / 'items.db'}"
+    keys = [Item.created_at, Item.id]
+
+    async def walk_async():
+        engine = create_async_engine(url)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session = async_sessionmaker(engine)()
+        session.add_all(
+            Item(id=item.id, created_at=item.created_at) for item in db.query(Item)
+        )
+        await session.commit()
+
+        pages, cursor = [], None
+        while True:
+            page = await paginate_async(
+                session, select(Item), keys, cursor=cursor, limit=10
+            )
+            pages.append([item.id for item in page.items])
+            if not page.next_cursor:
+                break
+            cursor = page.next_cursor
+
+        await session.close()
+        await engine.dispose()
+        return pages
+
+    assert asyncio.run(walk_async()) == walk(db, limit=10)
@@ -1,5 +1,20 @@
+import asyncio
+import uuid
+
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+from app.controllers import provider as provider_controller
+from app.controllers.provider import ProviderController
+from app.core import decorators
+from app.core.config import settings
+from app.core.exceptions import LocationUnresolvedError
+from app.main import app
+from app.models.provider import Provider
+from app.routers.providers import LOCATION_UNRESOLVED_HEADER
+from app.services.geolocation import geo_service
+from app.services.spatial_index import ProviderSpatialIndex
 
 def test_search_providers_empty(client: TestClient):
     response = client.get("/api/providers/")
@@ -23,3 +38,390 @@ def test_ai_suggestions(client: TestClient):
     assert "suggested_service" in data
     assert data["query"] == "water leak"
     
+
+
+class RecordingResult:
+    def __init__(self, session, statement):
+        self.session = session
+        self.statement = statement
+
+    def all(self):
+        self.session.round_trips += 1
+        self.session.queries.append(self.statement)
+        return self.session.rows
+
+
+# AsyncSession stand-in, queries are the statements whose rows were read
+class RecordingSession:
+    def __init__(self, rows):
+        self.rows = rows
+        self.round_trips = 0
+        self.queries = []
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        return RecordingResult(self, statement)
+
+
+class MissCache:
+    async def get(self, key):
+        return None
+
+    async def set(self, key, value, ttl=None, tags=()):
+        return False
+
+
+# bulk half of CacheService, counting network round trips
+class CardCache:
+    def __init__(self):
+        self.data = {}
+        self.tags = {}
+        self.invalidated = []
+        self.stats = {"round_trips": 0}
+
+    async def get_many(self, keys):
+        self.stats["round_trips"] += 1
+        return {key: self.data[key] for key in keys if key in self.data}
+
+    async def set_many(self, values, ttl=None, tags=None):
+        self.stats["round_trips"] += 1
+        self.data.update(values)
+        self.tags.update(tags or {})
+        return True
+
+    async def invalidate_tags(self, *tags):
+        self.invalidated.append(tags)
+        return 0
+
+
+def make_provider(lat, lng):
+    return Provider(
+        provider_id=uuid.uuid4(),
+        latitude=lat,
+        longitude=lng,
+        services=["plumber"],
+        rating=4.5,
+        pricing=400.0,
+        availability=True,
+        approved=True,
+    )
+
+
+@pytest.fixture
+def geocoder(monkeypatch):
+    calls = []
+
+    async def fake_get_coordinates(address, wait_for_remote=False, timeout=None):
+        calls.append(address)
+        return (15.4909, 73.8278)
+
+    monkeypatch.setattr(decorators, "cache", MissCache())
+    monkeypatch.setattr(provider_controller, "cache", CardCache())
+    monkeypatch.setattr(geo_service, "get_coordinates", fake_get_coordinates)
+    return calls
+
+
+def document(provider):
+    return {"provider_id": str(provider.provider_id), "services": provider.services}
+
+
+def search(db, **kwargs):
+    return asyncio.run(
+        ProviderController.search_providers_with_location(db, **kwargs)
+    )
+
+
+# the statement only, test_query_plans pages through real rows on Postgres
+def test_location_search_sql_is_one_query(monkeypatch, geocoder):
+    monkeypatch.setattr(provider_controller, "provider_index", ProviderSpatialIndex())
+    providers = [make_provider(15.49 + i * 0.01, 73.83) for i in range(10)]
+    db = RecordingSession([(document(p), i * 1.1) for i, p in enumerate(providers)])
+
+    results = search(db, service="plumber", location="Panaji", skip=20, limit=10)
+
+    assert geocoder == ["Panaji"]
+    assert db.round_trips == 1
+    assert results[1]["distance_km"] == 1.1
+    assert results[1]["provider_id"] == str(providers[1].provider_id)
+
+    # distance filter and ordering come before pagination
+    sql = compile_pg(db.queries[0])
+    assert sql.index("WHERE") < sql.index("ORDER BY") < sql.index("LIMIT 10 OFFSET 20")
+
+
+# providers from anywhere would pass for nearby ones, and caching the
+# miss would hide the lookup's answer for the whole TTL
+def test_searches_that_could_not_be_geocoded_are_not_cached(monkeypatch):
+    stored, waits = [], []
+
+    class StoringCache(MissCache):
+        async def set(self, key, value, ttl=None, tags=()):
+            stored.append(key)
+            return True
+
+    async def fake_get_coordinates(address, wait_for_remote=False, timeout=None):
+        waits.append(timeout)
+        return None if address == "Nowhere Vaddo" else (15.4909, 73.8278)
+
+    monkeypatch.setattr(decorators, "cache", StoringCache())
+    monkeypatch.setattr(geo_service, "get_coordinates", fake_get_coordinates)
+    monkeypatch.setattr(provider_controller, "provider_index", ProviderSpatialIndex())
+
+    db = RecordingSession([])
+    with pytest.raises(LocationUnresolvedError):
+        search(db, service="plumber", location="Nowhere Vaddo")
+    assert db.statements == []
+    assert stored == []
+    assert waits == [settings.GEOCODE_SEARCH_WAIT_SECONDS]
+
+    search(RecordingSession([]), service="plumber", location="Panaji")
+    assert len(stored) == 1
+
+
+def test_unresolved_search_location_is_flagged(monkeypatch):
+    async def unresolved(db, **filters):
+        raise LocationUnresolvedError()
+
+    monkeypatch.setattr(
+        ProviderController, "search_providers_with_location", unresolved
+    )
+
+    response = TestClient(app).get("/api/providers/search?location=Nowhere%20Vaddo")
+
+    assert response.status_code == 200
+    assert response.json() == []
+    assert response.headers[LOCATION_UNRESOLVED_HEADER] == "1"
+    retry_after = float(response.headers["Retry-After"])
+    assert retry_after >= settings.GEOCODE_SEARCH_WAIT_SECONDS
+
+
+def test_location_search_index_is_one_query(monkeypatch, geocoder):
+    providers = [make_provider(15.49 + i * 0.01, 73.83) for i in range(50)]
+    index = ProviderSpatialIndex()
+    index.ready = True
+    for provider in providers:
+        index.upsert(provider)
+    monkeypatch.setattr(provider_controller, "provider_index", index)
+    db = RecordingSession([(p.provider_id, document(p)) for p in providers])
+
+    results = search(db, location="Panaji", max_distance_km=25, limit=10)
+
+    assert geocoder == ["Panaji"]
+    assert db.round_trips == 1
+    distances = [result["distance_km"] for result in results]
+    assert distances == sorted(distances)
+    assert len(results) == 10
+
+
+def test_index_search_hydrates_100_providers_in_one_round_trip(monkeypatch, geocoder):
+    providers = [make_provider(15.49 + i * 0.0005, 73.83) for i in range(100)]
+    index = ProviderSpatialIndex()
+    index.ready = True
+    for provider in providers:
+        index.upsert(provider)
+    monkeypatch.setattr(provider_controller, "provider_index", index)
+    cards = provider_controller.cache
+
+    # cold: one MGET, one query for the misses, one pipelined write
+    db = RecordingSession([(p.provider_id, document(p)) for p in providers])
+    first = search(db, location="Panaji", max_distance_km=25, limit=100)
+    assert len(first) == 100
+    assert db.round_trips == 1
+    assert cards.stats["round_trips"] == 2
+    key = f"provider_card:{providers[0].provider_id}"
+    assert cards.tags[key] == [f"provider:{providers[0].provider_id}"]
+
+    # warm: Redis once, the database never
+    cards.stats["round_trips"] = 0
+    db = RecordingSession([])
+    assert search(db, location="Panaji", max_distance_km=25, limit=100) == first
+    assert cards.stats["round_trips"] == 1
+    assert db.round_trips == 0
+
+
+# answers each execute with the next batch of rows
+class ScriptedSession(RecordingSession):
+    def __init__(self, *batches):
+        super().__init__([])
+        self.batches = list(batches)
+
+    async def execute(self, statement):
+        self.rows = self.batches.pop(0)
+        return await super().execute(statement)
+
+
+def index_of(providers):
+    index = ProviderSpatialIndex()
+    index.ready = True
+    for provider in providers:
+        index.upsert(provider)
+    return index
+
+
+def test_index_search_without_a_service_bit_falls_back_to_sql(monkeypatch, geocoder):
+    providers = [make_provider(15.49 + i * 0.01, 73.83) for i in range(3)]
+    monkeypatch.setattr(provider_controller, "provider_index", index_of(providers))
+    db = RecordingSession([(document(p), i * 1.1) for i, p in enumerate(providers)])
+
+    results = search(db, service="roofer", location="Panaji", limit=10)
+
+    assert db.round_trips == 1
+    assert "LIMIT 10" in compile_pg(db.queries[0])
+    assert [result["provider_id"] for result in results] == [
+        str(p.provider_id) for p in providers
+    ]
+
+
+# a page short of its missing document would shift every later page
+def test_index_search_with_a_missing_document_falls_back_to_sql(monkeypatch, geocoder):
+    providers = [make_provider(15.49 + i * 0.01, 73.83) for i in range(3)]
+    monkeypatch.setattr(provider_controller, "provider_index", index_of(providers))
+    cards = provider_controller.cache
+    db = ScriptedSession(
+        [(p.provider_id, document(p)) for p in providers[:2]],
+        [(document(p), i * 1.1) for i, p in enumerate(providers)],
+    )
+
+    results = search(db, location="Panaji", max_distance_km=25, limit=10)
+
+    assert db.round_trips == 2
+    assert len(results) == 3
+    assert cards.data == {}
+
+
+def test_search_entries_are_tagged_with_their_providers():
+    results = [{"provider_id": "a"}, {"provider_id": "b"}]
+
+    assert provider_controller.search_tags({"service": "plumber"}, results) == [
+        "service:plumber",
+        "provider:a",
+        "provider:b",
+    ]
+    assert provider_controller.search_tags({"service": None}, []) == ["service:*"]
+
+
+def test_provider_changes_invalidate_matching_searches(geocoder):
+    cards = provider_controller.cache
+    provider = make_provider(15.49, 73.83)
+    provider.services = ["plumber", "electrician"]
+
+    asyncio.run(
+        ProviderController.invalidate_search_cache(provider, ["carpenter", "plumber"])
+    )
+
+    assert cards.invalidated == [
+        (
+            f"provider:{provider.provider_id}",
+            "service:*",
+            "service:carpenter",
+            "service:plumber",
+            "service:electrician",
+        )
+    ]
+
+
+def test_search_without_location_skips_geocoder(geocoder):
+    db = RecordingSession([])
+
+    search(db, service="plumber")
+
+    assert geocoder == []
+    assert db.round_trips == 1
+
+
+def test_apply_coverage_matches_service_radius():
+    provider = make_provider(15.4909, 73.8278)
+    provider.service_radius = 5.0
+    ProviderController.apply_coverage(provider)
+
+    coverage = geo_service.get_service_radius_coverage(provider)
+    assert coverage["radius_km"] == 5.0
+    assert coverage["min_lat"] < 15.4909 - 0.04 < coverage["max_lat"]
+    assert coverage["min_lng"] < 73.8278 + 0.04 < coverage["max_lng"]
+
+    provider.latitude = provider.longitude = None
+    ProviderController.apply_coverage(provider)
+    assert geo_service.get_service_radius_coverage(provider) is None
+
+
+def compile_pg(expression):
+    return str(
+        expression.compile(
+            dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+        )
+    ).replace("%%", "%")
+
+
+def filters(statement):
+    return [compile_pg(clause) for clause in statement._where_criteria]
+
+
+def order(statement):
+    return [compile_pg(clause) for clause in statement._order_by_clauses]
+
+
+def test_location_listing_uses_trigram_index():
+    db = RecordingSession([])
+
+    asyncio.run(ProviderController.search_provider(db, location="  Margoa, GOA! "))
+
+    where = filters(db.queries[0])
+    assert "'margoa goa' <% provider_search_docs.location_normalized" in where
+    assert not any("ILIKE" in sql.upper() for sql in where)
+
+    assert order(db.queries[0])[0] == (
+        "word_similarity('margoa goa', provider_search_docs.location_normalized) DESC"
+    )
+    assert "pg_trgm.word_similarity_threshold" in compile_pg(db.statements[0])
+
+
+def test_free_text_search_matches_search_documents(monkeypatch, geocoder):
+    index = ProviderSpatialIndex()
+    index.ready = True
+    monkeypatch.setattr(provider_controller, "provider_index", index)
+    db = RecordingSession([])
+
+    search(db, query_text="Leaking geyser in bathroom!", sort_by="relevance")
+    search(db, query_text="leaking geyser", location="Panaji")
+
+    # one query against provider_search_docs, nothing joined
+    assert db.round_trips == 2
+    for query in db.queries:
+        assert "JOIN" not in str(query.compile(dialect=postgresql.dialect()))
+        compiled = query._where_criteria[0].compile(dialect=postgresql.dialect())
+        assert str(compiled).startswith("provider_search_docs.search_vector @@ to_tsquery")
+
+    assert "leaking | geyser" in compiled.params.values()
+    rank = db.queries[0]._order_by_clauses[0].compile(dialect=postgresql.dialect())
+    assert str(rank).startswith("ts_rank(provider_search_docs.search_vector")
+
+
+def test_rating_sort_is_applied_before_pagination(monkeypatch, geocoder):
+    index = ProviderSpatialIndex()
+    index.ready = True
+    monkeypatch.setattr(provider_controller, "provider_index", index)
+    db = RecordingSession([])
+
+    search(db, location="Panaji", sort_by="rating", skip=20, limit=10)
+
+    # ranked in SQL even with the index ready, and ordered before paging
+    assert db.round_trips == 1
+    sql = compile_pg(db.queries[0])
+    assert sql.index("ORDER BY") < sql.index("LIMIT 10 OFFSET 20")
+    assert order(db.queries[0]) == [
+        "provider_search_docs.rating_score DESC NULLS LAST",
+        "provider_search_docs.provider_id",
+    ]
+
+
+def test_max_price_is_filtered_before_pagination(geocoder):
+    db = RecordingSession([])
+
+    search(db, max_price=300, skip=20, limit=10)
+
+    where = filters(db.queries[0])
+    assert "provider_search_docs.pricing > 0" in where
+    assert "provider_search_docs.pricing <= 300" in where
+    sql = compile_pg(db.queries[0])
+    assert sql.index("WHERE") < sql.index("LIMIT 10 OFFSET 20")
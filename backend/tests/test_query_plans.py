@@ -0,0 +1,201 @@
+import asyncio
+import os
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.controllers import provider as provider_controller
+from app.controllers.provider import ProviderController
+from app.core import decorators
+from app.core.database import Base, async_database_url
+from app.services.geolocation import geo_service
+from app.services.search_docs import search_docs
+from app.services.spatial_index import ProviderSpatialIndex
+
+# these plans only mean something on Postgres, point this at a scratch database
+POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+SCHEMA = "plan_test"
+PROVIDERS = 100_000
+
+pytestmark = pytest.mark.skipif(
+    not POSTGRES_URL, reason="TEST_POSTGRES_URL is not set"
+)
+
+SEED_USERS = """
+INSERT INTO users (id, name, email, phone, hashed_password, user_type, location,
+                   is_active, is_verified)
+SELECT md5('user' || i)::uuid, 'Provider ' || i, 'provider' || i || '@plans.test',
+       lpad(i::text, 10, '9'), 'x', 'PROVIDER', 'Panaji, Goa', true, true
+FROM generate_series(1, :count) AS i
+"""
+
+# 90% approved, 80% available, five services, spread over Goa
+SEED_PROVIDERS = """
+INSERT INTO providers (provider_id, user_id, services, pricing, availability,
+                       rating, rating_count, rating_score, approved,
+                       experience_years, service_radius, latitude, longitude,
+                       created_at)
+SELECT md5('provider' || i)::uuid, md5('user' || i)::uuid,
+       ARRAY[(ARRAY['plumber', 'electrician', 'carpenter', 'cleaner', 'painter'])[1 + i % 5]],
+       100 + (i * 7919) % 1900, i % 5 <> 0,
+       (i * 104729 % 500) / 100.0, i % 50, 3.5 + (i % 150) / 100.0, i % 10 <> 0,
+       i % 20, 10.0,
+       14.9 + (i * 6151 % 90000) / 100000.0, 73.7 + (i * 3571 % 60000) / 100000.0,
+       now() - i * interval '1 minute'
+FROM generate_series(1, :count) AS i
+"""
+
+SEED_COVERAGE = """
+UPDATE providers SET
+    coverage_min_lat = latitude - degrees(service_radius / 6371.0088),
+    coverage_max_lat = latitude + degrees(service_radius / 6371.0088),
+    coverage_min_lng = longitude - degrees(service_radius / (6371.0088 * cos(radians(latitude)))),
+    coverage_max_lng = longitude + degrees(service_radius / (6371.0088 * cos(radians(latitude))))
+"""
+
+
+class MissCache:
+    async def get(self, key):
+        return None
+
+    async def set(self, key, value, ttl=None, tags=()):
+        return False
+
+
+@pytest.fixture(scope="module")
+def plan_engine():
+    engine = create_engine(POSTGRES_URL)
+
+    @event.listens_for(engine, "connect")
+    def use_schema(dbapi_connection, connection_record):
+        with dbapi_connection.cursor() as cursor:
+            cursor.execute(f"SET search_path TO {SCHEMA}, public")
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    engine.dispose()
+
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text(SEED_USERS), {"count": PROVIDERS})
+        conn.execute(text(SEED_PROVIDERS), {"count": PROVIDERS})
+        conn.execute(text(SEED_COVERAGE))
+    db = sessionmaker(bind=engine)()
+    try:
+        search_docs.rebuild(db, batch_size=5000)
+    finally:
+        db.close()
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT").execute(
+            text("VACUUM ANALYZE providers, users, provider_search_docs")
+        )
+
+    yield engine
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+    engine.dispose()
+
+
+@pytest.fixture
+def search_engine(plan_engine, monkeypatch):
+    async def fake_get_coordinates(address, wait_for_remote=False, timeout=None):
+        return (15.4909, 73.8278)
+
+    monkeypatch.setattr(decorators, "cache", MissCache())
+    monkeypatch.setattr(geo_service, "get_coordinates", fake_get_coordinates)
+    monkeypatch.setattr(provider_controller, "provider_index", ProviderSpatialIndex())
+
+    # the async engine requests use, on the seeded schema
+    return create_async_engine(
+        async_database_url(POSTGRES_URL),
+        connect_args={"server_settings": {"search_path": f"{SCHEMA}, public"}},
+    )
+
+
+# run a search and EXPLAIN the last SELECT it sent
+async def explain_search(engine, filters):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        async with AsyncSession(engine) as db:
+            await ProviderController.search_providers_with_location(
+                db, limit=20, **filters
+            )
+            statement, parameters = statements[-1]
+            conn = await db.connection()
+            result = await conn.exec_driver_sql(
+                f"EXPLAIN (FORMAT JSON) {statement}", parameters
+            )
+            return result.scalar()
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+        await engine.dispose()
+
+
+async def run_search(engine, **filters):
+    try:
+        async with AsyncSession(engine) as db:
+            return await ProviderController.search_providers_with_location(
+                db, **filters
+            )
+    finally:
+        await engine.dispose()
+
+
+def test_location_search_pages_through_the_ordered_matches(search_engine):
+    filters = dict(service="plumber", location="Panaji", max_distance_km=10)
+
+    matches = asyncio.run(run_search(search_engine, limit=100, **filters))
+    page = asyncio.run(run_search(search_engine, skip=20, limit=10, **filters))
+
+    assert len(matches) == 100
+    distances = [match["distance_km"] for match in matches]
+    assert distances == sorted(distances)
+    assert max(distances) <= 10
+    assert all("plumber" in match["services"] for match in matches)
+    assert len(page) == 10
+    assert page == matches[20:30]
+
+
+def scanned_relations(plan, scan_type):
+    found = []
+    if plan.get("Node Type") == scan_type:
+        found.append(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        found.extend(scanned_relations(child, scan_type))
+    return found
+
+
+def relations(plan):
+    found = {plan["Relation Name"]} if "Relation Name" in plan else set()
+    for child in plan.get("Plans", []):
+        found |= relations(child)
+    return found
+
+
+SEARCHES = [
+    dict(service="plumber", min_rating=4.5, sort_by="rating"),
+    dict(max_price=300, sort_by="price"),
+    dict(min_rating=4.9),
+    dict(service="carpenter", location="Panaji", max_distance_km=5),
+    dict(location="Panaji", max_distance_km=3, max_price=500, sort_by="distance"),
+]
+
+
+@pytest.mark.parametrize("filters", SEARCHES)
+def test_provider_search_never_scans_search_docs(search_engine, filters):
+    plan = asyncio.run(explain_search(search_engine, filters))
+
+    scanned = scanned_relations(plan[0]["Plan"], "Seq Scan")
+    assert "provider_search_docs" not in scanned
+    # search never touches the source tables
+    assert not {"providers", "users"} & relations(plan[0]["Plan"])
@@ -0,0 +1,60 @@
+from sqlalchemy.dialects import postgresql
+
+from app.models.provider import Provider
+from app.models.provider_search_doc import ProviderSearchDoc
+from app.services.ranking import RankingEngine, RankingWeights
+
+
+def engine():
+    return RankingEngine(
+        weights=RankingWeights(distance=0.4, rating=0.35, price=0.15, experience=0.1),
+        rating_prior=3.5,
+        rating_prior_count=10,
+    )
+
+
+def compile_pg(clauses):
+    return [str(clause.compile(dialect=postgresql.dialect())) for clause in clauses]
+
+
+def test_bayesian_rating_needs_reviews_to_beat_the_prior():
+    ranking = engine()
+
+    assert ranking.bayesian_rating(None, None) == 3.5
+    # one perfect review barely moves a new provider
+    assert ranking.bayesian_rating(5.0, 1) < 3.7
+    # a long track record at 4.8 outranks a single 5.0
+    assert ranking.bayesian_rating(4.8, 200) > ranking.bayesian_rating(5.0, 1)
+
+    provider = Provider(rating=4.8, rating_count=200)
+    ranking.apply_rating_score(provider)
+    assert provider.rating_score == ranking.bayesian_rating(4.8, 200)
+
+
+def test_every_sort_ends_on_the_primary_key():
+    ranking = engine()
+
+    for sort_by in ("distance", "rating", "price", "relevance"):
+        order = compile_pg(ranking.order_by(sort_by, ProviderSearchDoc.latitude))
+        assert order[-1] == "provider_search_docs.provider_id"
+
+    assert compile_pg(ranking.order_by("rating")) == [
+        "provider_search_docs.rating_score DESC NULLS LAST",
+        "provider_search_docs.provider_id",
+    ]
+    assert compile_pg(ranking.order_by("price"))[0] == "provider_search_docs.pricing ASC NULLS LAST"
+
+
+def test_relevance_only_weighs_distance_with_a_location():
+    ranking = engine()
+
+    without = compile_pg(ranking.order_by("relevance"))[0]
+    # distance sort without a location falls back to relevance
+    assert compile_pg(ranking.order_by("distance")) == compile_pg(
+        ranking.order_by("relevance")
+    )
+    assert "exp(" not in without
+    assert "provider_search_docs.experience_years" in without
+
+    distance = ProviderSearchDoc.latitude * 1.0
+    assert "exp(" in compile_pg(ranking.order_by("relevance", distance))[0]
@@ -0,0 +1,124 @@
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy.dialects import postgresql
+
+from app.models.provider import Provider
+from app.models.user import User
+from app.schemas.provider import ProviderWithUser
+from app.services.search_docs import SearchDocService
+
+
+class RecordingQuery:
+    def __init__(self, session):
+        self.session = session
+        self.calls = []
+
+    def __getattr__(self, name):
+        def chain(*args, **kwargs):
+            self.calls.append((name, args))
+            return self
+
+        return chain
+
+    def all(self):
+        return self.session.rows
+
+
+class RecordingSession:
+    def __init__(self, rows=None):
+        self.rows = rows or []
+        self.queries = []
+        self.statements = []
+        self.calls = []
+
+    def flush(self):
+        self.calls.append("flush")
+
+    def refresh(self, instance):
+        self.calls.append(("refresh", type(instance).__name__))
+
+    def query(self, *entities):
+        query = RecordingQuery(self)
+        self.queries.append(query)
+        return query
+
+    def execute(self, statement):
+        self.calls.append("execute")
+        self.statements.append(statement)
+
+
+def make_provider(approved=True):
+    user = User(
+        id=uuid.uuid4(),
+        name="Ravi Naik",
+        email="ravi@example.com",
+        phone="9876543210",
+        user_type="provider",
+        location="Margao, Goa",
+        pincode="403601",
+        is_active=True,
+        is_verified=True,
+        created_at=datetime(2026, 1, 1, tzinfo=timezone.utc),
+    )
+    return Provider(
+        provider_id=uuid.uuid4(),
+        user_id=user.id,
+        user=user,
+        services=["plumber"],
+        pricing=400.0,
+        availability=True,
+        experience_years=5,
+        service_radius=10.0,
+        rating=4.5,
+        rating_count=12,
+        rating_score=4.0,
+        approved=approved,
+        documents=[],
+        latitude=15.28,
+        longitude=73.96,
+        created_at=datetime(2026, 1, 2, tzinfo=timezone.utc),
+    )
+
+
+def test_build_row_serves_the_response_schema():
+    provider = make_provider()
+
+    row = SearchDocService.build_row(provider, ["geyser", "tap"])
+
+    assert row["location_normalized"] == "margao goa"
+    assert row["rating_score"] == 4.0
+    # the stored document is exactly what the search endpoints return
+    document = ProviderWithUser.model_validate(row["document"])
+    assert document.user.name == "Ravi Naik"
+    assert "distance_km" not in row["document"]
+
+    vector = str(row["search_vector"].compile(dialect=postgresql.dialect()))
+    assert vector.count("setweight(") == 3
+
+
+def test_sync_deletes_documents_of_unapproved_providers():
+    db = RecordingSession()
+
+    SearchDocService.sync(db, make_provider(approved=False))
+
+    assert [name for name, _ in db.queries[0].calls][-1] == "delete"
+    assert db.statements == []
+
+
+def test_sync_upserts_approved_providers_with_category_keywords():
+    db = RecordingSession(rows=[("plumber", ["geyser", "leak"])])
+
+    SearchDocService.sync(db, make_provider())
+
+    sql = str(db.statements[0].compile(dialect=postgresql.dialect()))
+    assert sql.startswith("INSERT INTO provider_search_docs")
+    assert "ON CONFLICT (provider_id) DO UPDATE" in sql
+    assert "synced_at = now()" in sql
+    # built from the flushed rows, with created_at and updated_at as stored
+    assert db.calls == [
+        "flush",
+        ("refresh", "Provider"),
+        ("refresh", "User"),
+        "execute",
+    ]
@@ -0,0 +1,146 @@
+import asyncio
+import random
+import uuid
+
+from geopy.distance import great_circle
+
+from app.models.provider import Provider
+from app.services.spatial_index import ProviderSpatialIndex
+
+
+def make_provider(lat, lng, services, rating=4.0, availability=True, radius=None):
+    return Provider(
+        provider_id=uuid.uuid4(),
+        latitude=lat,
+        longitude=lng,
+        services=services,
+        rating=rating,
+        pricing=500.0,
+        availability=availability,
+        service_radius=radius,
+        approved=True,
+    )
+
+
+def make_index(path, providers):
+    index = ProviderSpatialIndex(str(path))
+    index.ready = True
+    for provider in providers:
+        index.upsert(provider)
+    index.merge()
+    return index
+
+
+def test_query_matches_brute_force(tmp_path):
+    random.seed(7)
+    providers = [
+        make_provider(
+            random.uniform(14.9, 15.8),
+            random.uniform(73.7, 74.3),
+            [random.choice(["plumber", "electrician", "carpenter"])],
+            availability=random.random() > 0.2,
+        )
+        for _ in range(300)
+    ]
+    index = make_index(tmp_path / "providers.npy", providers)
+
+    origin = (15.4909, 73.8278)
+    hits = index.query(*origin, 10, service="plumber", limit=1000)
+
+    expected = sorted(
+        (
+            (p.provider_id, great_circle(origin, (p.latitude, p.longitude)).km)
+            for p in providers
+            if "plumber" in p.services and p.availability
+        ),
+        key=lambda hit: hit[1],
+    )
+    expected = [hit for hit in expected if hit[1] <= 10]
+
+    assert [pid for pid, _ in hits] == [pid for pid, _ in expected]
+
+
+def test_snapshot_is_shared_and_updates_apply(tmp_path):
+    path = tmp_path / "providers.npy"
+    provider = make_provider(15.49, 73.83, ["plumber"])
+    writer = make_index(path, [provider])
+
+    reader = ProviderSpatialIndex(str(path))
+    assert reader.load()
+    assert [pid for pid, _ in reader.query(15.49, 73.83, 5)] == [provider.provider_id]
+
+    provider.availability = False
+    writer.upsert(provider)
+    asyncio.run(writer.publish())
+    reader.load()
+    assert reader.query(15.49, 73.83, 5) == []
+    assert len(reader) == 1
+
+
+def test_query_respects_provider_service_radius(tmp_path):
+    # about 5.5 km north of the customer
+    near = make_provider(15.54, 73.83, ["plumber"], radius=8)
+    short = make_provider(15.54, 73.831, ["plumber"], radius=3)
+    index = make_index(tmp_path / "providers.npy", [near, short])
+
+    hits = index.query(15.49, 73.83, 25)
+    assert [pid for pid, _ in hits] == [near.provider_id]
+
+    # the customer's own max distance still caps the provider's radius
+    assert index.query(15.49, 73.83, 5) == []
+
+
+# two workers that haven't seen each other's writes, merging in turn
+def test_merges_keep_other_workers_upserts_and_service_bits(tmp_path):
+    path = tmp_path / "providers.npy"
+    plumber = make_provider(15.49, 73.83, ["plumber"])
+    make_index(path, [plumber])
+
+    first, second = ProviderSpatialIndex(str(path)), ProviderSpatialIndex(str(path))
+    assert first.load() and second.load()
+
+    painter = make_provider(15.491, 73.83, ["painter"])
+    gardener = make_provider(15.492, 73.83, ["gardener"])
+    first.upsert(painter)
+    second.upsert(gardener)
+    # both gave their new service the same free bit
+    assert first._service_bits["painter"] == second._service_bits["gardener"]
+
+    first.merge()
+    second.merge()
+
+    reader = ProviderSpatialIndex(str(path))
+    assert reader.load()
+    assert len(reader) == 3
+    for provider in [plumber, painter, gardener]:
+        hits = reader.query(15.49, 73.83, 5, service=provider.services[0])
+        assert [pid for pid, _ in hits] == [provider.provider_id]
+
+    # one records file, named by the json that is swapped in a single rename
+    assert len(list(tmp_path.glob("providers.npy.*.npy"))) == 1
+
+
+def test_unmerged_upserts_survive_a_reload(tmp_path):
+    path = tmp_path / "providers.npy"
+    make_index(path, [make_provider(15.49, 73.83, ["plumber"])])
+    index = ProviderSpatialIndex(str(path))
+    assert index.load()
+
+    electrician = make_provider(15.491, 73.83, ["electrician"])
+    index.upsert(electrician)
+    assert index.load()
+
+    hits = index.query(15.49, 73.83, 5, service="electrician")
+    assert [pid for pid, _ in hits] == [electrician.provider_id]
+
+
+# a mask holds 64 services, the 65th has no bit and SQL has to answer it
+def test_query_without_a_service_bit_defers_to_sql(tmp_path):
+    providers = [make_provider(15.49, 73.83, [f"service-{i}"]) for i in range(65)]
+    index = make_index(tmp_path / "providers.npy", providers)
+
+    assert index.query(15.49, 73.83, 5, service="service-0") == [
+        (providers[0].provider_id, 0.0)
+    ]
+    assert index.query(15.49, 73.83, 5, service="service-64") is None
+    assert index.query(15.49, 73.83, 5, service="roofer") is None
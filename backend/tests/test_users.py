@@ -1,6 +1,12 @@
+import asyncio
+
 import pytest
 from fastapi.testclient import TestClient
 
+from app.controllers.user import UserController
+from app.models.user import User
+from app.schemas.user import UserUpdate
+
 
 def test_create_user(client: TestClient):
     response = client.post(
@@ -50,3 +56,41 @@ def test_get_services(client: TestClient):
     data = response.json()
     assert isinstance(data, list)
     assert len(data) > 0
+
+
+# AsyncSession stand-in that records what update_user does with it
+class UpdateSession:
+    def __init__(self):
+        self.calls = []
+
+    async def run_sync(self, fn, *args):
+        self.calls.append(fn.__name__)
+
+    async def commit(self):
+        self.calls.append("commit")
+
+    async def refresh(self, instance):
+        self.calls.append("refresh")
+
+
+def test_update_user_syncs_the_search_document_only_on_changes(monkeypatch):
+    user = User(name="Asha Naik", email="asha@example.com", location="Panaji")
+    reindexed = []
+
+    async def get_user(db, user_id):
+        return user
+
+    async def reindex_provider(db, user):
+        reindexed.append(user.name)
+
+    monkeypatch.setattr(UserController, "get_user", get_user)
+    monkeypatch.setattr(UserController, "reindex_provider", reindex_provider)
+
+    def update(**values):
+        db = UpdateSession()
+        asyncio.run(UserController.update_user(db, "id", UserUpdate(**values)))
+        return db.calls
+
+    assert update(name="Asha Naik") == ["commit", "refresh"]
+    assert update(name="Asha Kamat") == ["sync_user", "commit", "refresh"]
+    assert reindexed == ["Asha Kamat"]